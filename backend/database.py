@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import sessionmaker, Session
 from typing import Generator
 import os
@@ -40,10 +40,86 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+def incremental_vacuum_enabled() -> bool:
+    """Whether retention can release pages (always True off SQLite)."""
+    if not DATABASE_URL.startswith("sqlite"):
+        return True
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2  # 2 = INCREMENTAL
+
+
+def enable_incremental_vacuum():
+    """
+    Switch SQLite to auto_vacuum=INCREMENTAL so retention can release pages.
+
+    The mode only applies to an existing file after a full VACUUM, which
+    rewrites the whole database and blocks writers while it runs; run it as
+    maintenance (python init_db.py --enable-incremental-vacuum), not at
+    startup. Afterwards the setting is stored in the database.
+    """
+    if incremental_vacuum_enabled():
+        return
+
+    with engine.connect() as conn:
+        logger.info("Enabling SQLite incremental auto-vacuum (one-time VACUUM)...")
+        conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+
+
+def check_incremental_vacuum():
+    """
+    Enable incremental auto-vacuum on a new database, or log how to for an
+    existing one (the conversion is too slow to run on startup).
+    """
+    if incremental_vacuum_enabled():
+        return
+
+    if inspect(engine).get_table_names():
+        logger.warning(
+            "SQLite auto_vacuum is not INCREMENTAL, so retention cannot return freed pages "
+            "to the OS; run `python init_db.py --enable-incremental-vacuum` during maintenance"
+        )
+        return
+
+    # Nothing to rewrite yet, so the VACUUM is instant
+    enable_incremental_vacuum()
+
+
+def add_missing_columns(table):
+    """
+    Add nullable columns that a model has but its existing table lacks.
+
+    Only covers the simple case (ALTER TABLE ... ADD COLUMN with no default
+    or constraints); anything more involved needs a real migration.
+    """
+    existing = {column["name"] for column in inspect(engine).get_columns(table.name)}
+    missing = [column for column in table.columns if column.name not in existing]
+    if not missing:
+        return
+
+    with engine.begin() as conn:
+        for column in missing:
+            if not column.nullable:
+                logger.warning(f"Cannot add non-nullable column {table.name}.{column.name}; skipping")
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            logger.info(f"Adding column {table.name}.{column.name}")
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+
+
 def init_db():
-    """Initialize database - create all tables"""
+    """Initialize database - create all tables and any missing columns/indexes"""
     from models import Base
+    check_incremental_vacuum()
     Base.metadata.create_all(bind=engine)
+
+    # create_all skips tables that already exist, so columns and indexes
+    # added to an existing table have to be created on their own
+    for table in Base.metadata.sorted_tables:
+        add_missing_columns(table)
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
     logger.info("Database tables created successfully!")
 
 
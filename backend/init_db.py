@@ -9,11 +9,15 @@ Usage:
     python init_db.py              # Just create tables
     python init_db.py --seed       # Create tables and add test data
     python init_db.py --reset      # Drop all tables and recreate
+    python init_db.py --backfill-rollups  # Rebuild 1m/1h/1d rollups from raw history
+    python init_db.py --enable-incremental-vacuum  # One-time SQLite VACUUM (maintenance)
 """
 
 import argparse
-from database import init_db, drop_db, SessionLocal
+from database import init_db, drop_db, enable_incremental_vacuum, SessionLocal
 from models import User, PinnedMarket, MarketHistory, Alert
+from services.data_versions import bump_versions
+from services.rollups import update_rollups
 from datetime import datetime, timedelta, timezone
 
 
@@ -78,6 +82,17 @@ def seed_test_data():
             ])
 
         db.add_all(history_entries)
+        update_rollups(db, [
+            {
+                "market_id": entry.market_id,
+                "ts": entry.ts,
+                "implied_prob": entry.implied_prob,
+                "price": entry.price,
+                "volume": entry.volume,
+            }
+            for entry in history_entries
+        ])
+        bump_versions(db, [entry.market_id for entry in history_entries], datetime.now(timezone.utc))
         db.commit()
 
         print(f"✓ Created {len(history_entries)} market history entries")
@@ -109,6 +124,22 @@ def seed_test_data():
         db.close()
 
 
+def backfill_rollups():
+    """Rebuild the history rollup tables from raw market history"""
+    from services.rollups import backfill_rollups as rebuild_rollups
+
+    db = SessionLocal()
+
+    try:
+        processed = rebuild_rollups(db)
+        print(f"✓ Rolled up {processed} market history entries")
+    except Exception as e:
+        print(f"❌ Error backfilling rollups: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
 def main():
     parser = argparse.ArgumentParser(description="Initialize the database")
     parser.add_argument(
@@ -121,6 +152,16 @@ def main():
         action="store_true",
         help="Drop all tables and recreate (WARNING: deletes all data!)"
     )
+    parser.add_argument(
+        "--backfill-rollups",
+        action="store_true",
+        help="Rebuild the 1m/1h/1d history rollups from existing raw history"
+    )
+    parser.add_argument(
+        "--enable-incremental-vacuum",
+        action="store_true",
+        help="Switch an existing SQLite database to incremental auto-vacuum (runs a full VACUUM)"
+    )
 
     args = parser.parse_args()
 
@@ -132,10 +173,18 @@ def main():
     print("Creating database tables...")
     init_db()
 
+    if args.enable_incremental_vacuum:
+        print("\nEnabling incremental auto-vacuum (this can take a while)...")
+        enable_incremental_vacuum()
+
     if args.seed:
         print("\nSeeding test data...")
         seed_test_data()
 
+    if args.backfill_rollups:
+        print("\nBackfilling history rollups...")
+        backfill_rollups()
+
     print("\n✅ Database initialization complete!")
     print(f"\nDatabase file: polymarket_analytics.db")
 
@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from dotenv import load_dotenv
 import os
 import asyncio
@@ -41,6 +42,26 @@ app.add_middleware(
 )
 
 
+class StreamAwareGZipMiddleware(GZipMiddleware):
+    """Gzip responses for clients that accept it, except event streams (gzip would buffer their messages)"""
+
+    STREAMING_PATHS = {"/api/alerts/stream"}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.STREAMING_PATHS:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Compress JSON responses (history payloads in particular) above GZIP_MIN_SIZE bytes
+app.add_middleware(
+    StreamAwareGZipMiddleware,
+    minimum_size=int(os.getenv("GZIP_MIN_SIZE", "1000")),
+    compresslevel=int(os.getenv("GZIP_LEVEL", "6")),
+)
+
+
 # Background task reference
 background_tasks = set()
 
@@ -87,6 +108,11 @@ async def root():
 async def shutdown_event():
     """Cleanup resources on shutdown"""
     logger.info("Shutting down application...")
+    # Stop the worker (and any insight generation it has in flight)
+    for task in list(background_tasks):
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+
     # Close HTTP client in Polymarket service
     from services.polymarket import get_polymarket_service
     polymarket = get_polymarket_service()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
@@ -64,10 +64,115 @@ class MarketHistory(Base):
     market_title = Column(String, nullable=True)
 
     __table_args__ = (
+        # Every hot query filters by market and orders/filters by time
+        Index("ix_market_history_market_id_ts", "market_id", "ts"),
         {"sqlite_autoincrement": True},
     )
 
 
+class MarketHistoryRollup(Base):
+    """Per-market OHLC rollups of market history (1m / 1h / 1d buckets)"""
+    __tablename__ = "market_history_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    market_id = Column(String, nullable=False)
+    resolution = Column(String, nullable=False)  # "1m", "1h" or "1d"
+    bucket_start = Column(DateTime, nullable=False)  # UTC start of the bucket
+
+    # OHLC of implied probability (0-100)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+
+    price = Column(Float, nullable=False)  # Price at close
+    volume = Column(Float, default=0.0)  # Trading volume at close
+    count = Column(Integer, nullable=False, default=0)  # Raw snapshots in the bucket
+
+    __table_args__ = (
+        # One row per bucket; also serves range reads per market/resolution
+        UniqueConstraint("market_id", "resolution", "bucket_start", name="uq_market_history_rollups_bucket"),
+        {"sqlite_autoincrement": True},
+    )
+
+
+class MarketDataVersion(Base):
+    """Per-market data version, bumped whenever snapshots are written (see services/data_versions.py)"""
+    __tablename__ = "market_data_versions"
+
+    market_id = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)  # Time of the latest bump
+
+
+class Insight(Base):
+    """Claude-generated insight for one market move, shared by every alert it triggered"""
+    __tablename__ = "insights"
+
+    id = Column(Integer, primary_key=True, index=True)
+    market_id = Column(String, nullable=False)
+    ts = Column(DateTime, default=utc_now)
+
+    # The move being explained
+    market_title = Column(String, nullable=True)
+    old_prob = Column(Float, nullable=False)
+    new_prob = Column(Float, nullable=False)
+    change_pct = Column(Float, nullable=False)  # Signed change
+    window_minutes = Column(Integer, nullable=False)
+
+    # Insight text (not personalized); null until generated
+    text = Column(Text, nullable=True)
+
+    # Relationships
+    alerts = relationship("Alert", back_populates="insight")
+
+    __table_args__ = (
+        {"sqlite_autoincrement": True},
+    )
+
+
+class InsightCacheEntry(Base):
+    """Insight text reusable for similar moves of a market (see services/insight_cache.py)"""
+    __tablename__ = "insight_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String, unique=True, nullable=False)  # market:direction:delta bucket:prob bucket
+    market_id = Column(String, nullable=False)
+    text = Column(Text, nullable=False)
+
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    last_used_at = Column(DateTime, nullable=False, index=True)  # LRU eviction order
+    hits = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        {"sqlite_autoincrement": True},
+    )
+
+
+class MarketTrend(Base):
+    """Per-market statistics over recent moves, updated as moves are detected (see services/trends.py)"""
+    __tablename__ = "market_trends"
+
+    market_id = Column(String, primary_key=True)
+    moves = Column(Integer, nullable=False, default=0)  # Moves detected since tracking began
+
+    # Over the last TREND_WINDOW moves
+    recent_changes = Column(String, nullable=True)  # Signed changes, comma-separated, oldest first
+    up_count = Column(Integer, nullable=False, default=0)
+    down_count = Column(Integer, nullable=False, default=0)
+    min_change = Column(Float, nullable=True)
+    max_change = Column(Float, nullable=True)
+
+
+class AlertCounter(Base):
+    """Per-user unread alert count, kept in step with alert writes (see services/unread.py)"""
+    __tablename__ = "alert_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0)
+
+
 class Alert(Base):
     """Alerts triggered by significant market changes"""
     __tablename__ = "alerts"
@@ -84,7 +189,9 @@ class Alert(Base):
     # Market metadata
     market_title = Column(String, nullable=True)  # Market title for display
 
-    # Claude-generated insight
+    # Claude-generated insight, shared with the other alerts for the same move
+    insight_id = Column(Integer, ForeignKey("insights.id"), nullable=True, index=True)
+    # Per-alert insight text (alerts created before insights were shared)
     insight_text = Column(Text, nullable=True)
 
     # User interaction
@@ -92,7 +199,14 @@ class Alert(Base):
 
     # Relationships
     user = relationship("User", back_populates="alerts")
+    insight = relationship("Insight", back_populates="alerts")
 
     __table_args__ = (
+        # Alert list / unread count per user, newest first
+        Index("ix_alerts_user_id_seen_ts", "user_id", "seen", "ts"),
+        # Keyset pagination per user on (ts, id)
+        Index("ix_alerts_user_id_ts_id", "user_id", "ts", "id"),
+        # Recent alerts per market (trend analysis)
+        Index("ix_alerts_market_id_ts", "market_id", "ts"),
         {"sqlite_autoincrement": True},
     )
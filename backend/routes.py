@@ -2,16 +2,21 @@
 API Routes for Polymarket Analytics
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import Optional
+from sqlalchemy import and_, desc, func, or_
+from collections import defaultdict
+from typing import Literal, Optional, Tuple
 from datetime import datetime, timedelta, timezone
+import asyncio
+import base64
 import httpx
+import json
 import logging
 
 from database import get_db
-from models import User, PinnedMarket, MarketHistory, Alert
+from models import User, PinnedMarket, MarketHistory, MarketHistoryRollup, Alert, Insight
 
 logger = logging.getLogger(__name__)
 from schemas import (
@@ -27,7 +32,14 @@ from schemas import (
     StatusResponse,
 )
 from services.polymarket import get_polymarket_service
+from services.data_versions import etag_matches, get_versions, make_etag, time_bucket
+from services.insight import personalize_insight
+from services import unread
+from services.alert_events import alert_event_stream, get_alert_broker, publish_unread
+from services.price_hub import PriceSubscriber, get_price_hub, make_tick
 from services.worker import get_worker
+from services.downsample import DEFAULT_MAX_POINTS, lttb_indices, ohlc_buckets, parse_resolution, to_columns, to_epoch
+from services.rollups import RAW_WINDOW_HOURS, ROLLUP_RESOLUTIONS, pick_rollup_resolution, rebucket, source_rollup
 
 router = APIRouter(prefix="/api", tags=["api"])
 
@@ -55,6 +67,34 @@ def get_user(user_id: int, db: Session) -> User:
     return user
 
 
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Tag a response with an ETag and answer conditional requests.
+
+    Args:
+        request: Incoming request (its If-None-Match header is checked)
+        response: Response whose headers receive the ETag
+        etag: Current ETag of the resource
+
+    Returns:
+        A 304 response if the client's copy is current, otherwise None
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def columnar_response(content: dict, response: Response) -> ORJSONResponse:
+    """
+    Serialize a columnar payload straight to JSON (no response model), keeping
+    the headers set on the endpoint's response (e.g. its ETag).
+    """
+    content["format"] = "columnar"
+    return ORJSONResponse(content, headers=dict(response.headers))
+
+
 # ========== PIN ENDPOINTS ==========
 
 @router.post("/pin", response_model=StatusResponse)
@@ -144,9 +184,8 @@ async def pin_market(req: PinRequest, db: Session = Depends(get_db)):
                         "volume": current_snapshot.get("volume", 0)
                     }
 
-                # Create the initial alert
-                await worker.create_alert(
-                    user_id=req.userId,
+                # Create the initial alert, for the pinning user only
+                await worker.create_alerts(
                     market_id=market_id,
                     market_title=market_title,
                     old_prob=old_prob,
@@ -154,7 +193,8 @@ async def pin_market(req: PinRequest, db: Session = Depends(get_db)):
                     change_pct=change_pct,
                     old_snapshot=old_snapshot,
                     new_snapshot=current_snapshot,
-                    db=db
+                    db=db,
+                    user_ids=[req.userId]
                 )
 
                 logger.info(f"Created initial alert for user {req.userId} on market {market_id}")
@@ -205,11 +245,20 @@ async def unpin_market(req: UnpinRequest, db: Session = Depends(get_db)):
 
 @router.get("/pinned", response_model=PinnedMarketsResponse)
 async def get_pinned_markets(
+    request: Request,
+    response: Response,
     userId: int = Query(..., description="User ID to get pinned markets for"),
+    format: Literal["rows", "columnar"] = Query("rows", description="History as a list of points (rows) or parallel arrays (columnar)"),
     db: Session = Depends(get_db)
 ):
     """
     Get all pinned markets for a user with their latest data.
+
+    The ETag covers the user's pins, the data versions of their markets and
+    the current poll interval (the 24h window slides), so a matching If-None-Match gets a 304 before any history is read.
+
+    With format=columnar each item's history is a set of parallel arrays
+    (epoch-ms ts, prob, price, volume), serialized without response models.
     """
     # Check if user exists
     user = get_user(userId, db)
@@ -222,39 +271,74 @@ async def get_pinned_markets(
         .all()
     )
 
-    # For each pinned market, get the latest market data and recent history
-    items = []
-    for pin in pinned:
-        latest_history = (
+    market_ids = list({pin.market_id for pin in pinned})
+    versions = get_versions(db, market_ids)
+    etag = make_etag(
+        "pinned",
+        userId,
+        format,
+        time_bucket(),
+        [(pin.id, pin.market_id, pin.is_event, pin.event_title, versions[pin.market_id]) for pin in pinned]
+    )
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
+    # Load latest rows and 24h history for all pinned markets at once
+    # (constant number of queries regardless of how many markets are pinned)
+    latest_by_market = {}
+    history_by_market = defaultdict(list)
+
+    if market_ids:
+        latest_ts = (
+            db.query(
+                MarketHistory.market_id,
+                func.max(MarketHistory.ts).label("ts")
+            )
+            .filter(MarketHistory.market_id.in_(market_ids))
+            .group_by(MarketHistory.market_id)
+            .subquery()
+        )
+        latest_rows = (
             db.query(MarketHistory)
-            .filter(MarketHistory.market_id == pin.market_id)
-            .order_by(desc(MarketHistory.ts))
-            .first()
+            .join(
+                latest_ts,
+                and_(
+                    MarketHistory.market_id == latest_ts.c.market_id,
+                    MarketHistory.ts == latest_ts.c.ts
+                )
+            )
+            .all()
         )
+        for row in latest_rows:
+            latest_by_market.setdefault(row.market_id, row)
 
-        # Get last 24 hours of history for sparkline and change calculation
+        # Get last 24 hours of history for sparkline and change calculation,
+        # as plain rows rather than ORM objects
         since = datetime.now(timezone.utc) - timedelta(hours=24)
-        history_records = (
-            db.query(MarketHistory)
+        history_rows = (
+            db.query(
+                MarketHistory.market_id,
+                MarketHistory.ts,
+                MarketHistory.implied_prob,
+                MarketHistory.price,
+                MarketHistory.volume,
+                MarketHistory.market_title
+            )
             .filter(
-                MarketHistory.market_id == pin.market_id,
+                MarketHistory.market_id.in_(market_ids),
                 MarketHistory.ts >= since
             )
-            .order_by(MarketHistory.ts)
+            .order_by(MarketHistory.market_id, MarketHistory.ts)
             .all()
         )
+        for row in history_rows:
+            history_by_market[row.market_id].append(row)
 
-        # Convert to MarketSnapshot objects
-        history_snapshots = [
-            MarketSnapshot(
-                ts=h.ts,
-                implied_prob=h.implied_prob,
-                price=h.price,
-                volume=h.volume,
-                market_title=h.market_title
-            )
-            for h in history_records
-        ]
+    items = []
+    for pin in pinned:
+        latest_history = latest_by_market.get(pin.market_id)
+        history_records = history_by_market.get(pin.market_id, [])
 
         # Calculate change percentage from first to last data point
         change_pct = 0.0
@@ -266,7 +350,7 @@ async def get_pinned_markets(
         # For events, use event_title instead of market_title
         display_title = pin.event_title if pin.is_event else (latest_history.market_title if latest_history else None)
 
-        item = PinnedMarketWithLatest(
+        item = dict(
             id=pin.id,
             user_id=pin.user_id,
             market_id=pin.market_id,
@@ -275,13 +359,32 @@ async def get_pinned_markets(
             latest_price=latest_history.price if latest_history else None,
             latest_volume=latest_history.volume if latest_history else None,
             market_title=display_title,
-            history=history_snapshots,
             change_pct=change_pct,
             is_event=pin.is_event,
             event_id=pin.event_id,
             event_title=pin.event_title,
         )
-        items.append(item)
+
+        if format == "columnar":
+            item["history"] = to_columns([row[1:5] for row in history_records])
+            items.append(item)
+            continue
+
+        # Convert to MarketSnapshot objects
+        item["history"] = [
+            MarketSnapshot(
+                ts=h.ts,
+                implied_prob=h.implied_prob,
+                price=h.price,
+                volume=h.volume,
+                market_title=h.market_title
+            )
+            for h in history_records
+        ]
+        items.append(PinnedMarketWithLatest(**item))
+
+    if format == "columnar":
+        return columnar_response({"items": items, "total": len(items)}, response)
 
     return PinnedMarketsResponse(
         items=items,
@@ -293,14 +396,68 @@ async def get_pinned_markets(
 
 @router.get("/market/{market_id}", response_model=MarketDetail)
 async def get_market_detail(
+    request: Request,
+    response: Response,
     market_id: str,
     hours: int = Query(24, description="Number of hours of history to fetch"),
+    max_points: Optional[int] = Query(
+        None,
+        ge=3,
+        description=f"Downsample history to at most this many points with LTTB (default cap: {DEFAULT_MAX_POINTS})"
+    ),
+    resolution: Optional[str] = Query(
+        None,
+        description="Aggregate history into OHLC time buckets of this size, e.g. 5m, 1h, 1d"
+    ),
+    format: Literal["rows", "columnar"] = Query("rows", description="History as a list of points (rows) or parallel arrays (columnar)"),
     db: Session = Depends(get_db)
 ):
     """
     Get market snapshot and historical data for a specific market.
     Returns the latest data point and time-series history.
+
+    History is downsampled on the server so the payload stays bounded however
+    wide the window is: `resolution` buckets it into OHLC points, and
+    `max_points` (or the default cap) thins it with LTTB. Windows longer than
+    a day are read from the rollup tables instead of raw rows (or bucketed
+    from raw rows if the market has no rollups yet), merging rollup buckets
+    for a wider `resolution`. `data_points` always
+    reports the raw number of points in the window.
+
+    The ETag covers the market's data version, the current poll interval
+    (the window slides) and the query parameters, so a matching If-None-Match gets a 304 before any history is read.
+
+    With format=columnar history is a set of parallel arrays (epoch-ms ts,
+    prob, price, volume, plus OHLC when bucketed) with the title sent once,
+    serialized without response models.
     """
+    bucket_seconds = None
+    if resolution:
+        try:
+            bucket_seconds = parse_resolution(resolution)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    limit = max_points or DEFAULT_MAX_POINTS
+    rollup = pick_rollup_resolution(hours, limit)
+    if rollup and resolution:
+        # Raw rows of long windows are purged by retention: build the buckets
+        # from the coarsest rollup they are a multiple of. Short windows are
+        # bucketed from raw rows, whatever the resolution.
+        rollup = source_rollup(bucket_seconds)
+        if rollup is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Resolution '{resolution}' is only available for windows up to {RAW_WINDOW_HOURS} hours "
+                       f"(longer windows need a multiple of 1m)"
+            )
+
+    version = get_versions(db, [market_id])[market_id]
+    etag = make_etag("market", market_id, version, time_bucket(), hours, max_points, resolution, format)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
     # Get time window
     since = datetime.now(timezone.utc) - timedelta(hours=hours)
 
@@ -312,20 +469,76 @@ async def get_market_detail(
         .first()
     )
 
-    # Get historical data
-    history = (
-        db.query(MarketHistory)
-        .filter(
-            MarketHistory.market_id == market_id,
-            MarketHistory.ts >= since
+    # Get historical data as plain tuples; snapshot models are only built for
+    # the points that survive downsampling
+    rollup_rows = []
+    if rollup:
+        rollup_rows = (
+            db.query(
+                MarketHistoryRollup.bucket_start,
+                MarketHistoryRollup.close,
+                MarketHistoryRollup.price,
+                MarketHistoryRollup.volume,
+                MarketHistoryRollup.open,
+                MarketHistoryRollup.high,
+                MarketHistoryRollup.low,
+                MarketHistoryRollup.count
+            )
+            .filter(
+                MarketHistoryRollup.market_id == market_id,
+                MarketHistoryRollup.resolution == rollup,
+                MarketHistoryRollup.bucket_start >= since
+            )
+            .order_by(MarketHistoryRollup.bucket_start)
+            .all()
         )
-        .order_by(MarketHistory.ts)
-        .all()
-    )
+
+    if rollup_rows:
+        raw_points = sum(row.count for row in rollup_rows)
+        if bucket_seconds and bucket_seconds != ROLLUP_RESOLUTIONS[rollup]:
+            rollup_rows = rebucket(rollup_rows, bucket_seconds)
+            applied_resolution = resolution
+        else:
+            applied_resolution = rollup
+        points = [tuple(row)[:7] for row in rollup_rows]
+    else:
+        if rollup and not bucket_seconds:
+            # Not rolled up (e.g. history written outside the worker):
+            # bucket raw rows at the rollup's resolution instead
+            resolution, bucket_seconds = rollup, ROLLUP_RESOLUTIONS[rollup]
+
+        rows = (
+            db.query(
+                MarketHistory.ts,
+                MarketHistory.implied_prob,
+                MarketHistory.price,
+                MarketHistory.volume
+            )
+            .filter(
+                MarketHistory.market_id == market_id,
+                MarketHistory.ts >= since
+            )
+            .order_by(MarketHistory.ts)
+            .all()
+        )
+        raw_points = len(rows)
+
+        if bucket_seconds:
+            buckets = ohlc_buckets(rows, bucket_seconds)
+            applied_resolution = resolution
+            points = [
+                (b["ts"], b["close"], b["price"], b["volume"], b["open"], b["high"], b["low"])
+                for b in buckets
+            ]
+        else:
+            applied_resolution = "raw"
+            points = [(ts, prob, price, volume, None, None, None) for ts, prob, price, volume in rows]
 
     # Convert to response models
     latest_snapshot = None
+    market_title = None
     if latest:
+        market_title = latest.market_title
         latest_snapshot = MarketSnapshot(
             ts=latest.ts,
             implied_prob=latest.implied_prob,
@@ -334,58 +547,139 @@ async def get_market_detail(
             market_title=latest.market_title
         )
 
+    if len(points) > limit:
+        keep = lttb_indices([to_epoch(p[0]) for p in points], [p[1] for p in points], limit)
+        points = [points[i] for i in keep]
+        if applied_resolution == "raw":
+            applied_resolution = "lttb"
+
+    if format == "columnar":
+        return columnar_response({
+            "market_id": market_id,
+            "market_title": market_title,
+            "latest": make_tick(market_id, latest.ts, latest.implied_prob, latest.price, latest.volume) if latest else None,
+            "history": to_columns(points, ohlc=applied_resolution not in ("raw", "lttb")),
+            "data_points": raw_points,
+            "resolution": applied_resolution,
+        }, response)
+
     history_snapshots = [
         MarketSnapshot(
-            ts=h.ts,
-            implied_prob=h.implied_prob,
-            price=h.price,
-            volume=h.volume,
-            market_title=h.market_title
+            ts=ts,
+            implied_prob=prob,
+            price=price,
+            volume=volume,
+            market_title=market_title,
+            prob_open=prob_open,
+            prob_high=prob_high,
+            prob_low=prob_low
         )
-        for h in history
+        for ts, prob, price, volume, prob_open, prob_high, prob_low in points
     ]
 
     return MarketDetail(
         market_id=market_id,
         latest=latest_snapshot,
         history=history_snapshots,
-        data_points=len(history_snapshots)
+        data_points=raw_points,
+        resolution=applied_resolution
     )
 
 
 # ========== ALERTS ENDPOINT ==========
 
+def encode_alert_cursor(alert: Alert) -> str:
+    """Opaque pagination cursor for an alert's (ts, id) position."""
+    return base64.urlsafe_b64encode(f"{alert.ts.isoformat()}|{alert.id}".encode()).decode()
+
+
+def decode_alert_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor from encode_alert_cursor.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed
+    """
+    try:
+        ts, alert_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(ts), int(alert_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def alerts_before(cursor: str, inclusive: bool = False):
+    """Condition selecting alerts older than a cursor in (ts, id) order."""
+    ts, alert_id = decode_alert_cursor(cursor)
+    return or_(
+        Alert.ts < ts,
+        and_(Alert.ts == ts, Alert.id <= alert_id if inclusive else Alert.id < alert_id)
+    )
+
+
+def alerts_after(cursor: str):
+    """Condition selecting alerts newer than a cursor in (ts, id) order."""
+    ts, alert_id = decode_alert_cursor(cursor)
+    return or_(Alert.ts > ts, and_(Alert.ts == ts, Alert.id > alert_id))
+
+
 @router.get("/alerts", response_model=AlertsListResponse)
 async def get_alerts(
     userId: int = Query(..., description="User ID to get alerts for"),
     unread_only: bool = Query(False, description="Only show unread alerts"),
-    limit: int = Query(50, description="Maximum number of alerts to return"),
+    limit: int = Query(50, ge=1, description="Maximum number of alerts to return"),
+    before: Optional[str] = Query(None, description="Cursor: return alerts older than this one (next page)"),
+    after: Optional[str] = Query(None, description="Cursor: return alerts newer than this one (previous page / new alerts)"),
     db: Session = Depends(get_db)
 ):
     """
     Get alerts for a user, optionally filtered by read/unread status.
     Returns alerts sorted by most recent first.
+
+    Pages are keyset-paginated on (ts, id): pass next_cursor as `before` to
+    get older alerts, or prev_cursor as `after` to get newer ones. Each page
+    is an index range scan, however deep the client pages.
     """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Pass either before or after, not both")
+
     # Check if user exists
     user = get_user(userId, db)
 
-    # Build query
-    query = db.query(Alert).filter(Alert.user_id == userId)
+    # Maintained counter, no COUNT over the user's alerts (read first: a
+    # first-time read initializes the counter and commits)
+    unread_count = unread.get_unread_count(db, userId)
 
+    conditions = [Alert.user_id == userId]
     if unread_only:
-        query = query.filter(Alert.seen == False)
-
-    # Get alerts
-    alerts = query.order_by(desc(Alert.ts)).limit(limit).all()
+        conditions.append(Alert.seen == False)
 
-    # Count unread
-    unread_count = (
-        db.query(Alert)
-        .filter(Alert.user_id == userId, Alert.seen == False)
-        .count()
+    # Build query; shared insights come along in the same query
+    query = (
+        db.query(Alert, Insight.text)
+        .outerjoin(Insight, Alert.insight_id == Insight.id)
+        .filter(*conditions)
     )
 
-    # Convert to response models
+    # Get one alert past the page to know whether there is more
+    if after:
+        alerts = query.filter(alerts_after(after)).order_by(Alert.ts, Alert.id).limit(limit + 1).all()
+        has_newer = len(alerts) > limit
+        # The page starts right after the cursor, so anything up to it is older
+        has_older = (
+            db.query(Alert.id)
+            .filter(*conditions, alerts_before(after, inclusive=True))
+            .first()
+        ) is not None
+        alerts = alerts[:limit][::-1]
+    else:
+        if before:
+            query = query.filter(alerts_before(before))
+        alerts = query.order_by(desc(Alert.ts), desc(Alert.id)).limit(limit + 1).all()
+        has_newer, has_older = bool(before), len(alerts) > limit
+        alerts = alerts[:limit]
+
+    # Convert to response models, personalizing shared insights
+    user_name = user.email.split('@')[0]
     alert_responses = [
         AlertResponse(
             id=alert.id,
@@ -395,19 +689,111 @@ async def get_alerts(
             change_pct=alert.change_pct,
             threshold=alert.threshold,
             market_title=alert.market_title,
-            insight_text=alert.insight_text,
+            insight_text=personalize_insight(shared_text, user_name) if alert.insight_id else alert.insight_text,
             seen=alert.seen
         )
-        for alert in alerts
+        for alert, shared_text in alerts
     ]
 
+    # An empty "after" page keeps the client's cursor for the next poll
+    prev_cursor = encode_alert_cursor(alerts[0][0]) if alerts else after
+    next_cursor = encode_alert_cursor(alerts[-1][0]) if alerts and has_older else None
+
     return AlertsListResponse(
         alerts=alert_responses,
         total=len(alert_responses),
-        unread_count=unread_count
+        unread_count=unread_count,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+        has_newer=has_newer
+    )
+
+
+@router.get("/alerts/stream")
+async def stream_alerts(
+    request: Request,
+    userId: int = Query(..., description="User ID to stream alerts for"),
+    last_id: Optional[int] = Query(None, description="Last alert ID received; newer alerts are replayed"),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream a user's alerts as Server-Sent Events instead of polling GET /alerts.
+
+    Events: `alert` (a new alert; its ID is the SSE event ID), `insight` (an
+    alert's insight text, once generated) and `unread` (the unread count).
+    Reconnecting clients resume via the Last-Event-ID header or last_id.
+    """
+    get_user(userId, db)
+
+    last_event_id = request.headers.get("last-event-id")
+    if last_id is None and last_event_id and last_event_id.isdigit():
+        last_id = int(last_event_id)
+
+    return StreamingResponse(
+        alert_event_stream(userId, last_id, is_disconnected=request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
+@router.patch("/alerts/mark-seen", response_model=StatusResponse)
+async def mark_alerts_seen_up_to(
+    userId: int = Query(..., description="User ID whose alerts to mark"),
+    up_to: str = Query(..., description="Cursor: mark this alert and every older one as seen"),
+    db: Session = Depends(get_db)
+):
+    """
+    Mark a user's alerts up to and including a cursor as seen, in one update.
+    """
+    get_user(userId, db)
+    condition = alerts_before(up_to, inclusive=True)
+
+    try:
+        marked = (
+            db.query(Alert)
+            .filter(Alert.user_id == userId, Alert.seen == False, condition)
+            .update({Alert.seen: True}, synchronize_session=False)
+        )
+        unread.decrement(db, userId, marked)
+        db.commit()
+        publish_unread(db, [userId])
+        return StatusResponse(
+            status="ok",
+            message=f"Marked {marked} alerts as seen"
+        )
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to mark alerts as seen: {str(e)}")
+
+
+@router.patch("/alerts/mark-all-seen", response_model=StatusResponse)
+async def mark_all_alerts_seen(
+    userId: int = Query(..., description="User ID whose alerts to mark"),
+    db: Session = Depends(get_db)
+):
+    """
+    Mark all of a user's alerts as seen, in one update.
+    """
+    get_user(userId, db)
+
+    try:
+        marked = (
+            db.query(Alert)
+            .filter(Alert.user_id == userId, Alert.seen == False)
+            .update({Alert.seen: True}, synchronize_session=False)
+        )
+        unread.reset(db, userId)
+        db.commit()
+        publish_unread(db, [userId])
+        return StatusResponse(
+            status="ok",
+            message=f"Marked {marked} alerts as seen"
+        )
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to mark alerts as seen: {str(e)}")
+
+
 @router.patch("/alerts/{alert_id}/mark-seen", response_model=StatusResponse)
 async def mark_alert_seen(alert_id: int, db: Session = Depends(get_db)):
     """
@@ -419,8 +805,15 @@ async def mark_alert_seen(alert_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Alert not found")
 
     try:
-        alert.seen = True
+        # Conditional update so a repeated call doesn't decrement twice
+        marked = (
+            db.query(Alert)
+            .filter(Alert.id == alert_id, Alert.seen == False)
+            .update({Alert.seen: True}, synchronize_session=False)
+        )
+        unread.decrement(db, alert.user_id, marked)
         db.commit()
+        publish_unread(db, [alert.user_id])
         return StatusResponse(
             status="ok",
             message=f"Alert {alert_id} marked as seen"
@@ -505,3 +898,81 @@ async def get_event_detail(event_id: str):
         ],
         "market_count": len(markets),
     }
+
+
+# ========== LIVE PRICES ENDPOINT ==========
+
+@router.websocket("/ws/prices")
+async def price_stream(websocket: WebSocket):
+    """
+    Push live price ticks for the markets a client subscribes to.
+
+    Client messages: {"action": "subscribe" | "unsubscribe", "market_ids": [...]}
+    Server messages: {"type": "ticks", "ticks": [{"market_id", "ts", "prob", "price", "volume"}, ...]}
+    with the latest tick of each market since the previous message; a client
+    that reads slowly skips intermediate ticks rather than falling behind.
+    """
+    await websocket.accept()
+    hub = get_price_hub()
+    subscriber = PriceSubscriber()
+
+    async def receive():
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                action = message.get("action")
+                market_ids = [str(market_id) for market_id in message.get("market_ids", [])]
+            except (ValueError, AttributeError, TypeError):
+                await websocket.send_json({"type": "error", "detail": "Expected a JSON object with action and market_ids"})
+                continue
+
+            if action == "subscribe":
+                hub.subscribe(subscriber, market_ids)
+            elif action == "unsubscribe":
+                hub.unsubscribe(subscriber, market_ids)
+            else:
+                await websocket.send_json({"type": "error", "detail": f"Unknown action: {action}"})
+
+    async def send():
+        while True:
+            ticks = await subscriber.next_batch()
+            await websocket.send_json({"type": "ticks", "ticks": list(ticks.values())})
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error and not isinstance(error, WebSocketDisconnect):
+                logger.error(f"Error in price stream: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        hub.unsubscribe(subscriber)
+
+
+# ========== METRICS ENDPOINT ==========
+
+@router.get("/metrics")
+async def get_metrics(db: Session = Depends(get_db)):
+    """
+    Get operational counters: last polling cycle and retention stats, upstream
+    cache hit rates, coalesced upstream requests, and Claude usage with the
+    calls and spend saved by the insight cache.
+    """
+    polymarket = get_polymarket_service()
+    worker = get_worker()
+    return {
+        "worker": worker.last_cycle_stats,
+        "retention": worker.last_retention_stats,
+        "hot_window": worker.hot_window.stats(),
+        "polymarket": polymarket.cache_stats(),
+        "singleflight": polymarket.singleflight_stats(),
+        "alert_streams": get_alert_broker().stats(),
+        "price_streams": get_price_hub().stats(),
+        "insights": {
+            "claude": worker.insight_service.usage_stats(),
+            "cache": worker.insight_cache.stats(db, worker.insight_service.usage_stats()),
+        },
+    }
@@ -52,6 +52,10 @@ class MarketSnapshot(BaseModel):
     price: float
     volume: float
     market_title: Optional[str] = None
+    # Set on bucketed (OHLC) history points; implied_prob is then the close
+    prob_open: Optional[float] = None
+    prob_high: Optional[float] = None
+    prob_low: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -61,7 +65,8 @@ class MarketDetail(BaseModel):
     market_id: str
     latest: Optional[MarketSnapshot] = None
     history: List[MarketSnapshot] = []
-    data_points: int = 0
+    data_points: int = 0  # Raw points in the window, before any downsampling
+    resolution: str = "raw"  # "raw", "lttb", or the OHLC bucket size (e.g. "1h")
 
 
 # Alert schemas
@@ -84,6 +89,9 @@ class AlertsListResponse(BaseModel):
     alerts: List[AlertResponse]
     total: int
     unread_count: int
+    next_cursor: Optional[str] = None  # Pass as `before` for older alerts; null on the last page
+    prev_cursor: Optional[str] = None  # Pass as `after` for newer alerts
+    has_newer: bool = False  # Newer alerts exist beyond this page
 
 
 # Pinned markets list response
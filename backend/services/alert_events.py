@@ -0,0 +1,287 @@
+"""
+Alert events - in-process pub/sub and Server-Sent Events stream for live alerts
+"""
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Alert, Insight, User
+from services.insight import personalize_insight
+from services.unread import get_unread_count, get_unread_counts
+
+logger = logging.getLogger(__name__)
+
+# Alerts loaded per replay query when a client resumes or resyncs; the
+# replay pages through until it has caught up
+REPLAY_LIMIT = 200
+
+
+class AlertBroker:
+    """
+    Fan out alert events to the streams connected in this process.
+
+    Each stream has a bounded queue. A stream that falls too far behind gets
+    a "resync" event instead of the backlog and catches up from the database
+    (alerts it missed, and insight texts of alerts it already has).
+    Publishing is synchronous and costs nothing for users with no stream.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+
+        self.published = 0
+        self.resyncs = 0
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        """Open a queue receiving the user's events."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def subscribed_users(self, user_ids: Optional[Iterable[int]] = None) -> Set[int]:
+        """Users with at least one stream (optionally limited to user_ids)."""
+        if user_ids is None:
+            return set(self._subscribers)
+        return {user_id for user_id in user_ids if user_id in self._subscribers}
+
+    def publish(self, user_id: int, event: Dict[str, Any]):
+        """Queue an event on every stream of a user."""
+        for queue in self._subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+                self.published += 1
+            except asyncio.QueueFull:
+                # Replace the backlog with a marker; the stream reloads from the DB
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+                self.resyncs += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for monitoring."""
+        return {
+            "users": len(self._subscribers),
+            "streams": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "resyncs": self.resyncs,
+        }
+
+
+# Singleton instance
+_broker: Optional[AlertBroker] = None
+
+
+def get_alert_broker() -> AlertBroker:
+    """Get or create the alert broker"""
+    global _broker
+    if _broker is None:
+        _broker = AlertBroker()
+    return _broker
+
+
+def alert_payload(alert: Alert, email: str, shared_text: Optional[str]) -> Dict[str, Any]:
+    """JSON-ready alert, shaped like AlertResponse, with the shared insight personalized."""
+    if alert.insight_id:
+        insight_text = personalize_insight(shared_text, email.split('@')[0])
+    else:
+        insight_text = alert.insight_text
+
+    return {
+        "id": alert.id,
+        "user_id": alert.user_id,
+        "market_id": alert.market_id,
+        "ts": alert.ts.isoformat() if alert.ts else None,
+        "change_pct": alert.change_pct,
+        "threshold": alert.threshold,
+        "market_title": alert.market_title,
+        "insight_text": insight_text,
+        "seen": alert.seen,
+    }
+
+
+def load_alert_payloads(db: Session, *conditions, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Alerts matching conditions as payloads, in ID order, with one query."""
+    query = (
+        db.query(Alert, User.email, Insight.text)
+        .join(User, Alert.user_id == User.id)
+        .outerjoin(Insight, Alert.insight_id == Insight.id)
+        .filter(*conditions)
+        .order_by(Alert.id)
+    )
+    if limit:
+        query = query.limit(limit)
+    return [alert_payload(alert, email, text) for alert, email, text in query.all()]
+
+
+def publish_unread(db: Session, user_ids: Iterable[int], broker: Optional[AlertBroker] = None):
+    """Push fresh unread counts to the users that have a stream open."""
+    broker = broker or get_alert_broker()
+    subscribed = broker.subscribed_users(user_ids)
+    if not subscribed:
+        return
+
+    for user_id, count in get_unread_counts(db, subscribed).items():
+        broker.publish(user_id, {"type": "unread", "unread_count": count})
+
+
+def publish_new_alerts(db: Session, insight_id: int, broker: Optional[AlertBroker] = None):
+    """Push the alerts of a move (and new unread counts) to subscribers with a stream open."""
+    broker = broker or get_alert_broker()
+    subscribed = broker.subscribed_users()
+    if not subscribed:
+        return
+
+    payloads = load_alert_payloads(db, Alert.insight_id == insight_id, Alert.user_id.in_(subscribed))
+    for payload in payloads:
+        broker.publish(payload["user_id"], {"type": "alert", "alert": payload})
+    publish_unread(db, {payload["user_id"] for payload in payloads}, broker)
+
+
+def publish_insights(db: Session, insight_ids: List[int], broker: Optional[AlertBroker] = None):
+    """Push insight texts that arrived after their alerts to subscribers with a stream open."""
+    broker = broker or get_alert_broker()
+    subscribed = broker.subscribed_users()
+    if not subscribed or not insight_ids:
+        return
+
+    payloads = load_alert_payloads(db, Alert.insight_id.in_(insight_ids), Alert.user_id.in_(subscribed))
+    for payload in payloads:
+        broker.publish(payload["user_id"], insight_event(payload))
+
+
+def insight_event(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Event filling in the insight text of an alert the client already has."""
+    return {"type": "insight", "alert_id": payload["id"], "insight_text": payload["insight_text"]}
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Encode an event as a Server-Sent Events message (alert IDs become event IDs)."""
+    lines = []
+    if event["type"] == "alert":
+        lines.append(f"id: {event['alert']['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def alert_event_stream(
+    user_id: int,
+    last_id: Optional[int] = None,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    broker: Optional[AlertBroker] = None,
+    heartbeat_sec: float = 15.0
+) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for a user's alerts.
+
+    Sends alerts newer than last_id (when resuming) and the unread count on
+    connect, then new alerts, late insight texts and unread-count changes as
+    the worker publishes them. While idle it only sends keep-alive comments
+    and touches no database.
+
+    On a resync (the stream fell behind and its backlog was dropped) it
+    re-sends the insight texts of the alerts sent so far on this connection,
+    then the alerts it missed, REPLAY_LIMIT per query until caught up.
+
+    Args:
+        user_id: User to stream alerts for
+        last_id: Last alert ID the client received (resume point)
+        is_disconnected: Coroutine function reporting a client disconnect
+        broker: Broker to subscribe to (defaults to the singleton)
+        heartbeat_sec: Seconds between keep-alive comments when idle
+    """
+    broker = broker or get_alert_broker()
+    # Subscribe before reading the backlog so nothing published in between is lost
+    queue = broker.subscribe(user_id)
+    sent_id = last_id  # Last alert ID sent to the client
+    replay_from = last_id  # Where a resync reloads alerts from
+    stream_from = last_id  # Alerts after this were sent on this connection
+    insights_from = insights_to = None  # Alert IDs whose insight texts to re-send
+
+    def catch_up() -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        The next page of missed insight texts and alerts from the database,
+        plus the unread count once caught up.
+
+        Returns:
+            (events, whether more pages remain)
+        """
+        nonlocal replay_from, stream_from, insights_from
+        db = SessionLocal()
+        try:
+            events = []
+            if replay_from is None:
+                # Fresh connection: the client has the list; only newer alerts matter
+                replay_from = db.query(func.max(Alert.id)).filter(Alert.user_id == user_id).scalar() or 0
+                stream_from = replay_from
+            elif insights_from is not None and insights_from < insights_to:
+                # Insight events dropped with the backlog; the alerts were already sent
+                alerts = load_alert_payloads(
+                    db, Alert.user_id == user_id, Alert.id > insights_from, Alert.id <= insights_to,
+                    Insight.text.isnot(None), limit=REPLAY_LIMIT
+                )
+                if len(alerts) < REPLAY_LIMIT:
+                    insights_from = insights_to
+                else:
+                    insights_from = alerts[-1]["id"]
+                events = [insight_event(payload) for payload in alerts]
+                return events, True
+            else:
+                alerts = load_alert_payloads(
+                    db, Alert.user_id == user_id, Alert.id > replay_from, limit=REPLAY_LIMIT
+                )
+                events = [{"type": "alert", "alert": payload} for payload in alerts]
+                if len(alerts) == REPLAY_LIMIT:
+                    replay_from = alerts[-1]["id"]
+                    return events, True
+            events.append({"type": "unread", "unread_count": get_unread_count(db, user_id)})
+            return events, False
+        finally:
+            db.close()
+
+    try:
+        pending, more = catch_up()
+        while True:
+            for event in pending:
+                if event["type"] == "alert":
+                    if sent_id is not None and event["alert"]["id"] <= sent_id:
+                        continue  # Already sent from the backlog
+                    sent_id = replay_from = event["alert"]["id"]
+                yield format_sse(event)
+
+            if more:
+                pending, more = catch_up()
+                continue
+
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=heartbeat_sec)
+            except asyncio.TimeoutError:
+                if is_disconnected and await is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                pending = []
+                continue
+
+            if event["type"] == "resync":
+                if sent_id is not None and sent_id > (stream_from or 0):
+                    insights_from, insights_to = stream_from or 0, sent_id
+                pending, more = catch_up()
+            else:
+                pending = [event]
+    finally:
+        broker.unsubscribe(user_id, queue)
@@ -0,0 +1,190 @@
+"""
+In-process caches - bounded TTL + LRU caches with hit/miss counters
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+# Marks a field the upstream payload did not contain, so that "absent" can be cached too
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded in-process cache with per-entry TTL and LRU eviction.
+
+    Entries expire ttl seconds after they are set (or after the ttl given to
+    set()). When the cache is full, the least recently used entry is evicted.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of entries kept
+            ttl: Default time-to-live in seconds
+            clock: Monotonic time source (overridable for tests)
+        """
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key: Hashable) -> Any:
+        """Return the live value for key (marking it recently used) or _MISSING."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+
+        value, expires_at = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return _MISSING
+
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a cached value, or default if missing or expired."""
+        value = self._lookup(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return value
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key) is not _MISSING
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value, expiring after ttl seconds (defaults to the cache TTL)."""
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one entry, or every entry if key is None."""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class FieldTTLCache(TTLCache):
+    """
+    TTLCache of dict records whose fields expire independently.
+
+    Each field listed in field_ttls gets its own TTL, so slow-changing fields
+    (e.g. a market's question) can outlive volatile ones (e.g. its prices).
+    Fields not listed in field_ttls are not cached.
+    """
+
+    def __init__(
+        self,
+        field_ttls: Dict[str, float],
+        maxsize: int = 1024,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            field_ttls: Time-to-live in seconds for each cached field
+            maxsize: Maximum number of records kept
+            clock: Monotonic time source (overridable for tests)
+        """
+        super().__init__(maxsize=maxsize, ttl=max(field_ttls.values()), clock=clock)
+        self.field_ttls = dict(field_ttls)
+
+    def set_fields(self, key: Hashable, record: Dict[str, Any], fields: Optional[Iterable[str]] = None):
+        """
+        Store (or refresh) the cached fields of record.
+
+        Args:
+            key: Record key
+            record: Field values
+            fields: Fields to refresh (defaults to every cached field); the
+                others keep their value and expiry
+        """
+        now = self._clock()
+        cached = self._lookup(key)
+        cached = dict(cached) if cached is not _MISSING else {}
+
+        for field in (fields if fields is not None else self.field_ttls):
+            cached[field] = (record.get(field, _MISSING), now + self.field_ttls[field])
+
+        self.set(key, cached)
+
+    def peek_fields(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Every cached field of a record, expired or not (not counted as a hit or miss)."""
+        record = self._lookup(key)
+        if record is _MISSING:
+            return None
+        return {field: entry[0] for field, entry in record.items() if entry[0] is not _MISSING}
+
+    def get_fields(
+        self,
+        key: Hashable,
+        fields: Optional[Iterable[str]] = None,
+        count: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get cached fields of a record.
+
+        Args:
+            key: Record key
+            fields: Fields that must all be fresh (defaults to every cached field)
+            count: Count the lookup in the hit/miss counters
+
+        Returns:
+            Dict of the requested fields (absent upstream fields are left out),
+            or None if any requested field is missing or expired
+        """
+        record = self._lookup(key)
+        if record is _MISSING:
+            self.misses += count
+            return None
+
+        now = self._clock()
+        result = {}
+        for field in (fields if fields is not None else self.field_ttls):
+            entry = record.get(field)
+            if entry is None or entry[1] <= now:
+                self.misses += count
+                return None
+            if entry[0] is not _MISSING:
+                result[field] = entry[0]
+
+        self.hits += count
+        return result
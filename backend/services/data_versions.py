@@ -0,0 +1,90 @@
+"""
+Data versions - per-market version stamps backing ETags on market responses
+"""
+
+import hashlib
+import os
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models import MarketDataVersion
+
+# (version, updated_at) of a market with no recorded writes
+NO_VERSION: Tuple[int, Optional[datetime]] = (0, None)
+
+# Width of the time bucket in ETags; responses cover a sliding window, so an
+# ETag expires at least once per poll cycle even if nothing was written
+ETAG_WINDOW_SEC = int(os.getenv("POLL_INTERVAL_SEC", "300"))
+
+
+def bump_versions(db: Session, market_ids: Iterable[str], ts: datetime):
+    """
+    Bump the data version of markets whose history was written (caller commits).
+
+    One UPDATE for the markets already tracked and one INSERT for new ones,
+    however many markets were written.
+    """
+    market_ids = list(set(market_ids))
+    if not market_ids:
+        return
+
+    (
+        db.query(MarketDataVersion)
+        .filter(MarketDataVersion.market_id.in_(market_ids))
+        .update(
+            {MarketDataVersion.version: MarketDataVersion.version + 1, MarketDataVersion.updated_at: ts},
+            synchronize_session=False
+        )
+    )
+    tracked = {
+        row.market_id
+        for row in db.query(MarketDataVersion.market_id).filter(MarketDataVersion.market_id.in_(market_ids))
+    }
+    new = [market_id for market_id in market_ids if market_id not in tracked]
+    if new:
+        db.bulk_insert_mappings(
+            MarketDataVersion,
+            [{"market_id": market_id, "version": 1, "updated_at": ts} for market_id in new]
+        )
+
+
+def get_versions(db: Session, market_ids: Iterable[str]) -> Dict[str, Tuple[int, Optional[datetime]]]:
+    """(version, updated_at) per market with one query; NO_VERSION for untracked markets."""
+    market_ids = list(market_ids)
+    versions = {
+        row.market_id: (row.version, row.updated_at)
+        for row in db.query(MarketDataVersion).filter(MarketDataVersion.market_id.in_(market_ids))
+    }
+    return {market_id: versions.get(market_id, NO_VERSION) for market_id in market_ids}
+
+
+def time_bucket(now: Optional[float] = None) -> int:
+    """Index of the current ETAG_WINDOW_SEC-wide time bucket."""
+    return int((time.time() if now is None else now) // ETAG_WINDOW_SEC)
+
+
+def _opaque_tag(etag: str) -> str:
+    """An ETag without its weakness indicator."""
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def make_etag(*parts) -> str:
+    """
+    Weak ETag hashing the given parts.
+
+    Weak because the same tag is sent whether or not the body is gzipped, so
+    it only promises semantically equivalent content, not identical bytes.
+    """
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches etag (weak comparison, as for GET)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or _opaque_tag(etag) in (_opaque_tag(tag) for tag in candidates)
@@ -0,0 +1,151 @@
+"""
+Downsampling - reduce market history to a bounded number of chart points
+"""
+
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+# Cap applied to history responses that don't ask for a max_points of their own
+DEFAULT_MAX_POINTS = 2000
+
+_RESOLUTION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_resolution(resolution: str) -> int:
+    """
+    Parse a bucket size like "30s", "5m", "1h" or "1d" into seconds.
+
+    Raises:
+        ValueError: If the resolution is malformed or not positive
+    """
+    match = re.fullmatch(r"(\d+)([smhd])", resolution.strip().lower())
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Invalid resolution '{resolution}' (expected e.g. 5m, 1h, 1d)")
+    return int(match.group(1)) * _RESOLUTION_UNITS[match.group(2)]
+
+
+def to_epoch(ts: datetime) -> float:
+    """Epoch seconds for a timestamp; naive timestamps are treated as UTC."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    Pick which points to keep using Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last point and, from each of threshold - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the average of the next bucket. This keeps the
+    visual shape of the series (spikes included) at a fraction of the points.
+
+    Args:
+        xs: X values (e.g. epoch seconds), ascending
+        ys: Y values
+        threshold: Number of points to keep
+
+    Returns:
+        Ascending indices of the points to keep
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_len = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / avg_len
+        avg_y = sum(ys[avg_start:avg_end]) / avg_len
+
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+
+        max_area = -1.0
+        next_a = range_start
+        for j in range(range_start, range_end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                next_a = j
+
+        selected.append(next_a)
+        a = next_a
+
+    selected.append(n - 1)
+    return selected
+
+
+def ohlc_buckets(
+    rows: Iterable[Tuple[datetime, float, float, float]],
+    bucket_seconds: int
+) -> List[Dict[str, Any]]:
+    """
+    Aggregate (ts, implied_prob, price, volume) rows into time buckets, in one pass.
+
+    Args:
+        rows: Rows ordered by ts
+        bucket_seconds: Bucket width in seconds
+
+    Returns:
+        One dict per non-empty bucket with ts (bucket start), open/high/low/close
+        of implied_prob, the closing price and volume, and the row count
+    """
+    buckets: List[Dict[str, Any]] = []
+    current = None
+    current_start = None
+
+    for ts, implied_prob, price, volume in rows:
+        start = int(to_epoch(ts)) // bucket_seconds * bucket_seconds
+        if start != current_start:
+            bucket_ts = datetime.fromtimestamp(start, timezone.utc)
+            if ts.tzinfo is None:
+                bucket_ts = bucket_ts.replace(tzinfo=None)
+            current = {
+                "ts": bucket_ts,
+                "open": implied_prob,
+                "high": implied_prob,
+                "low": implied_prob,
+                "close": implied_prob,
+                "price": price,
+                "volume": volume,
+                "count": 0,
+            }
+            buckets.append(current)
+            current_start = start
+
+        current["high"] = max(current["high"], implied_prob)
+        current["low"] = min(current["low"], implied_prob)
+        current["close"] = implied_prob
+        current["price"] = price
+        current["volume"] = volume
+        current["count"] += 1
+
+    return buckets
+
+
+def to_columns(points: Sequence[tuple], ohlc: bool = False) -> Dict[str, List[Any]]:
+    """
+    Transpose history points into parallel arrays (the columnar response format).
+
+    Args:
+        points: (ts, prob, price, volume) tuples, followed by (open, high, low)
+            when ohlc is set
+        ohlc: Include the prob_open / prob_high / prob_low columns
+
+    Returns:
+        Dict of columns; ts is in epoch milliseconds
+    """
+    names = ["ts", "prob", "price", "volume"] + (["prob_open", "prob_high", "prob_low"] if ohlc else [])
+    columns = list(zip(*points)) if points else [()] * len(names)
+    result = {name: list(column) for name, column in zip(names, columns)}
+    result["ts"] = [int(to_epoch(ts) * 1000) for ts in result["ts"]]
+    return result
@@ -0,0 +1,184 @@
+"""
+Hot window - in-memory recent history per market for alert evaluation
+"""
+
+import logging
+from array import array
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from models import MarketHistory
+from services.downsample import to_epoch
+
+logger = logging.getLogger(__name__)
+
+# Oldest point of a market's window; attribute-compatible with MarketHistory rows
+WindowPoint = namedtuple("WindowPoint", ["ts", "implied_prob", "volume"])
+
+
+class RingBuffer:
+    """
+    Fixed-width (ts, prob, volume) points in three parallel float arrays.
+
+    Points are appended in time order and dropped from the front, both in
+    O(1) (amortized; the arrays double when full).
+    """
+
+    __slots__ = ("_ts", "_prob", "_volume", "_head", "_size")
+
+    def __init__(self, capacity: int = 16):
+        capacity = max(1, capacity)
+        self._ts = array("d", bytes(8 * capacity))
+        self._prob = array("d", bytes(8 * capacity))
+        self._volume = array("d", bytes(8 * capacity))
+        self._head = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return len(self._ts)
+
+    def _grow(self):
+        """Double the capacity, unrolling the ring so the head is at index 0."""
+        capacity = self.capacity
+        for name in ("_ts", "_prob", "_volume"):
+            old = getattr(self, name)
+            new = old[self._head:] + old[:self._head]
+            new.extend(array("d", bytes(8 * capacity)))
+            setattr(self, name, new)
+        self._head = 0
+
+    def append(self, ts: float, prob: float, volume: float):
+        """Add a point (ts in epoch seconds, not older than the last point)."""
+        if self._size == self.capacity:
+            self._grow()
+        i = (self._head + self._size) % self.capacity
+        self._ts[i] = ts
+        self._prob[i] = prob
+        self._volume[i] = volume
+        self._size += 1
+
+    def evict_before(self, cutoff: float):
+        """Drop points older than cutoff (epoch seconds)."""
+        while self._size and self._ts[self._head] < cutoff:
+            self._head = (self._head + 1) % self.capacity
+            self._size -= 1
+
+    def first(self) -> Optional[tuple]:
+        """Oldest (ts, prob, volume) point, or None if empty."""
+        if not self._size:
+            return None
+        i = self._head
+        return self._ts[i], self._prob[i], self._volume[i]
+
+
+class HotWindow:
+    """
+    The last window_minutes of history for every polled market, in memory.
+
+    The worker appends every snapshot it writes, so finding a market's
+    alert baseline (the oldest point inside the window) needs no database
+    round trip. Markets are warmed from market history the first time they
+    are seen.
+    """
+
+    def __init__(self, window_minutes: int = 60, initial_capacity: int = 16):
+        """
+        Initialize the hot window.
+
+        Args:
+            window_minutes: Length of the window kept per market
+            initial_capacity: Starting buffer size per market (grows as needed);
+                ideally the number of polls per window plus one
+        """
+        self.window_seconds = window_minutes * 60
+        self.initial_capacity = initial_capacity
+        self._buffers: Dict[str, RingBuffer] = {}
+
+    def __contains__(self, market_id: str) -> bool:
+        return market_id in self._buffers
+
+    def _buffer(self, market_id: str) -> RingBuffer:
+        buffer = self._buffers.get(market_id)
+        if buffer is None:
+            buffer = self._buffers[market_id] = RingBuffer(self.initial_capacity)
+        return buffer
+
+    def append(self, market_id: str, ts: datetime, implied_prob: float, volume: Optional[float]):
+        """Record a history point and drop points that fell out of the window."""
+        epoch = to_epoch(ts)
+        buffer = self._buffer(market_id)
+        buffer.append(epoch, implied_prob, volume or 0)
+        buffer.evict_before(epoch - self.window_seconds)
+
+    def baseline(self, market_id: str, now: Optional[datetime] = None) -> Optional[WindowPoint]:
+        """
+        Oldest point inside the window for a market.
+
+        Returns:
+            The point, or None if the market has no history in the window
+        """
+        buffer = self._buffers.get(market_id)
+        if buffer is None:
+            return None
+
+        now = now or datetime.now(timezone.utc)
+        buffer.evict_before(to_epoch(now) - self.window_seconds)
+        point = buffer.first()
+        if point is None:
+            return None
+
+        ts, prob, volume = point
+        return WindowPoint(datetime.fromtimestamp(ts, timezone.utc), prob, volume)
+
+    def warm(self, db: Session, market_ids: List[str]) -> int:
+        """
+        Load the window for markets from market history, replacing what is held.
+
+        Every market passed is tracked afterwards, with or without history, so
+        it is not loaded again.
+
+        Returns:
+            Number of points loaded
+        """
+        window_start = datetime.now(timezone.utc) - timedelta(seconds=self.window_seconds)
+        for market_id in market_ids:
+            self._buffers[market_id] = RingBuffer(self.initial_capacity)
+
+        rows = (
+            db.query(
+                MarketHistory.market_id,
+                MarketHistory.ts,
+                MarketHistory.implied_prob,
+                MarketHistory.volume
+            )
+            .filter(
+                MarketHistory.market_id.in_(market_ids),
+                MarketHistory.ts >= window_start
+            )
+            .order_by(MarketHistory.market_id, MarketHistory.ts)
+            .all()
+        )
+        for row in rows:
+            self._buffers[row.market_id].append(to_epoch(row.ts), row.implied_prob, row.volume or 0)
+
+        return len(rows)
+
+    def retain(self, market_ids: Iterable[str]):
+        """Forget markets not in market_ids (e.g. no longer pinned by anyone)."""
+        keep = set(market_ids)
+        for market_id in [m for m in self._buffers if m not in keep]:
+            del self._buffers[market_id]
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for monitoring."""
+        return {
+            "markets": len(self._buffers),
+            "points": sum(len(b) for b in self._buffers.values()),
+        }
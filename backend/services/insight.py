@@ -2,31 +2,176 @@
 Insight Service - Generate AI insights using Claude API
 """
 
+import asyncio
+import json
 import os
-from typing import Optional
-from anthropic import Anthropic
+from typing import Any, Dict, List, Optional
+from anthropic import Anthropic, AsyncAnthropic
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+INSIGHT_MODEL = "claude-3-haiku-20240307"
+INSIGHT_MAX_TOKENS = 300
+SYSTEM_PROMPT = "You are an analyst for prediction markets. Be concise and neutral."
+
+INSIGHT_INSTRUCTIONS = (
+    "Consider external factors and market context when analyzing this move. In 3–5 sentences: "
+    "explain plausible drivers of the move, 2 risks to watch, and a neutral note (not financial advice)."
+)
+
+# System prompt for multi-market prompts, identical on every call. At ~150
+# tokens it is far below the minimum prompt length Haiku can cache, so it is
+# not marked for prompt caching
+BATCH_SYSTEM_PROMPT = (
+    f"{SYSTEM_PROMPT}\n\n"
+    "You will be given several numbered prediction market moves. Analyze each move on its "
+    "own. For each one: consider external factors and market context, and in 3–5 sentences "
+    "explain plausible drivers of the move, 2 risks to watch, and a neutral note (not "
+    "financial advice).\n\n"
+    'Reply with only a JSON object of the form {"insights": [{"id": 1, "insight": "..."}]} '
+    "with exactly one entry per move, using the move numbers as ids."
+)
+
+# Personalization applied when a shared insight is shown to a user
+PERSONALIZED_INSIGHT_TEMPLATE = "Hi {user_name}, here's what moved this market: {insight}"
+
+
+def personalize_insight(insight: Optional[str], user_name: str) -> Optional[str]:
+    """Address a shared (user-agnostic) insight to one user."""
+    if not insight:
+        return insight
+    return PERSONALIZED_INSIGHT_TEMPLATE.format(user_name=user_name, insight=insight)
+
 
 class InsightService:
     """Service for generating market insights using Claude API"""
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        timeout_sec: Optional[float] = None
+    ):
         """
         Initialize the Insight Service.
 
         Args:
             api_key: Claude API key (defaults to CLAUDE_API_KEY env var)
+            max_concurrency: Maximum Claude requests in flight on the async path
+                (defaults to INSIGHT_CONCURRENCY env var or 4)
+            timeout_sec: Per-insight time limit on the async path, including
+                time spent waiting for a slot (defaults to INSIGHT_TIMEOUT_SEC
+                env var or 30)
         """
         self.api_key = api_key or os.getenv("CLAUDE_API_KEY")
+        self.max_concurrency = max(1, max_concurrency or int(os.getenv("INSIGHT_CONCURRENCY", "4")))
+        self.timeout_sec = timeout_sec or float(os.getenv("INSIGHT_TIMEOUT_SEC", "30"))
+
         if not self.api_key:
             logger.warning("Claude API key not set. Insights will be disabled.")
             self.client = None
+            self.async_client = None
         else:
             self.client = Anthropic(api_key=self.api_key)
+            self.async_client = AsyncAnthropic(api_key=self.api_key, timeout=self.timeout_sec)
+
+        # Created on first use so it binds to the running event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        # Claude usage, for monitoring and spend estimates
+        self.calls = 0
+        self.insights = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def _describe_move(
+        self,
+        market_title: str,
+        old_prob: float,
+        new_prob: float,
+        delta_pct: float,
+        window_minutes: int,
+        volume_delta: Optional[float] = None,
+        time_to_resolution: Optional[str] = None,
+        user_name: Optional[str] = "Yash",
+        signal_summary: Optional[str] = None,
+        long_term_trend: Optional[str] = None,
+    ) -> str:
+        """Describe a market move for a prompt (user-agnostic if user_name is None)"""
+        volume_text = f"\nVolume change: {volume_delta:+.2f}" if volume_delta else ""
+        ttr_text = f"\nTime to resolution: {time_to_resolution}" if time_to_resolution else ""
+        signal_text = f"\nExternal signal (optional): {signal_summary}" if signal_summary else ""
+        trend_text = f"\n\nLong-term trend from history: {long_term_trend}" if long_term_trend else ""
+
+        user_text = f"User: {user_name}\n" if user_name else ""
+
+        return f"""{user_text}Market: "{market_title}"
+Time window: last {window_minutes} minutes
+Implied probability: {old_prob:.1f}% → {new_prob:.1f}% (Δ {delta_pct:+.1f}%){volume_text}{ttr_text}{signal_text}{trend_text}"""
+
+    def _build_prompt(self, *args, **kwargs) -> str:
+        """Build the user prompt for a market move (see _describe_move)"""
+        return f"{self._describe_move(*args, **kwargs)}\n\n{INSIGHT_INSTRUCTIONS}"
+
+    def _build_batch_prompt(self, moves: List[Dict[str, Any]]) -> str:
+        """Build one user prompt covering several moves (generate_insight arguments)"""
+        sections = [f"[{i}] {self._describe_move(**move)}" for i, move in enumerate(moves, start=1)]
+        return f"Market moves ({len(moves)}):\n\n" + "\n\n".join(sections)
+
+    @staticmethod
+    def _parse_batch_response(text: Optional[str], count: int) -> List[Optional[str]]:
+        """Per-move insights from a batch response (None for moves it left out)"""
+        insights: List[Optional[str]] = [None] * count
+        if not text:
+            return insights
+
+        try:
+            # Tolerate prose or code fences around the JSON object
+            payload = json.loads(text[text.index("{"):text.rindex("}") + 1])
+            entries = payload.get("insights", [])
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"Could not parse batched insight response: {e}")
+            return insights
+
+        for entry in entries:
+            try:
+                index = int(entry.get("id")) - 1
+            except (TypeError, ValueError, AttributeError):
+                continue
+            insight = entry.get("insight")
+            if 0 <= index < count and isinstance(insight, str) and insight.strip():
+                insights[index] = insight.strip()
+
+        return insights
+
+    def _request(self, user_prompt: str) -> Dict[str, Any]:
+        """Keyword arguments for messages.create"""
+        return {
+            "model": INSIGHT_MODEL,
+            "max_tokens": INSIGHT_MAX_TOKENS,
+            "system": SYSTEM_PROMPT,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": user_prompt
+                }
+            ],
+        }
+
+    def _extract_text(self, message: Any) -> Optional[str]:
+        """First text block of a Claude response, or None if empty"""
+        self.calls += 1
+        usage = getattr(message, "usage", None)
+        if usage:
+            self.input_tokens += usage.input_tokens or 0
+            self.output_tokens += usage.output_tokens or 0
+
+        if message.content and len(message.content) > 0:
+            return message.content[0].text
+        logger.warning("Claude API returned empty response")
+        return None
 
     def generate_insight(
         self,
@@ -37,7 +182,7 @@ class InsightService:
         window_minutes: int,
         volume_delta: Optional[float] = None,
         time_to_resolution: Optional[str] = None,
-        user_name: str = "Yash",
+        user_name: Optional[str] = "Yash",
         signal_summary: Optional[str] = None,
         long_term_trend: Optional[str] = None,
     ) -> Optional[str]:
@@ -52,7 +197,8 @@ class InsightService:
             window_minutes: Time window in minutes
             volume_delta: Change in volume (optional)
             time_to_resolution: Time remaining until market resolves (optional)
-            user_name: User name for personalization (default: "Yash")
+            user_name: User name for personalization (default: "Yash"); None for
+                an insight shared by all users
             signal_summary: External signal summary (optional, for future integration)
             long_term_trend: Historical trend analysis (optional)
 
@@ -64,45 +210,163 @@ class InsightService:
             return None
 
         try:
-            # Build the enhanced prompt template
-            volume_text = f"\nVolume change: {volume_delta:+.2f}" if volume_delta else ""
-            ttr_text = f"\nTime to resolution: {time_to_resolution}" if time_to_resolution else ""
-            signal_text = f"\nExternal signal (optional): {signal_summary}" if signal_summary else ""
-            trend_text = f"\n\nLong-term trend from history: {long_term_trend}" if long_term_trend else ""
-
-            user_prompt = f"""User: {user_name}
-Market: "{market_title}"
-Time window: last {window_minutes} minutes
-Implied probability: {old_prob:.1f}% → {new_prob:.1f}% (Δ {delta_pct:+.1f}%){volume_text}{ttr_text}{signal_text}{trend_text}
-
-Consider external factors and market context when analyzing this move. In 3–5 sentences: explain plausible drivers of the move, 2 risks to watch, and a neutral note (not financial advice)."""
+            user_prompt = self._build_prompt(
+                market_title, old_prob, new_prob, delta_pct, window_minutes,
+                volume_delta, time_to_resolution, user_name, signal_summary, long_term_trend
+            )
 
             # Call Claude API with enhanced prompt
-            message = self.client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=300,
-                system="You are an analyst for prediction markets. Be concise and neutral.",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": user_prompt
-                    }
-                ]
-            )
+            message = self.client.messages.create(**self._request(user_prompt))
 
-            # Extract the text response
-            if message.content and len(message.content) > 0:
-                insight_text = message.content[0].text
-                logger.info(f"Generated insight for {user_name} on market: {market_title[:50]}...")
-                return insight_text
-            else:
-                logger.warning("Claude API returned empty response")
-                return None
+            insight_text = self._extract_text(message)
+            if insight_text:
+                self.insights += 1
+                logger.info(f"Generated insight for {user_name or 'all users'} on market: {market_title[:50]}...")
+            return insight_text
 
         except Exception as e:
             logger.error(f"Error generating insight with Claude: {e}")
             return None
 
+    def usage_stats(self) -> Dict[str, int]:
+        """Claude calls made, insights generated and tokens used"""
+        return {
+            "calls": self.calls,
+            "insights": self.insights,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+    async def generate_insights_batch_async(
+        self,
+        moves: List[Dict[str, Any]],
+        batch_size: int = 8
+    ) -> List[Optional[str]]:
+        """
+        Generate insights for many moves with one Claude request per batch_size moves.
+
+        Each request carries a numbered list of moves and asks for a JSON reply
+        with one insight per move. The system prompt is the same on every call.
+        Requests share the concurrency limit and timeout of
+        generate_insight_async; moves a reply leaves out are retried with a
+        single-move request.
+
+        Args:
+            moves: generate_insight arguments per move (history_args builds them
+                from snapshots)
+            batch_size: Moves per request
+
+        Returns:
+            Insight text (or None) per move, in order
+        """
+        if not self.async_client:
+            logger.warning("Claude client not initialized. Skipping insight generation.")
+            return [None] * len(moves)
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        batch_size = max(1, batch_size)
+        batches = [moves[i:i + batch_size] for i in range(0, len(moves), batch_size)]
+        results = await asyncio.gather(*(self._generate_batch(batch) for batch in batches))
+        return [insight for batch in results for insight in batch]
+
+    async def _generate_batch(self, moves: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """One Claude request for up to batch_size moves"""
+        if len(moves) == 1:
+            return [await self.generate_insight_async(**moves[0])]
+
+        request = {
+            "model": INSIGHT_MODEL,
+            "max_tokens": INSIGHT_MAX_TOKENS * len(moves),
+            "system": BATCH_SYSTEM_PROMPT,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": self._build_batch_prompt(moves)
+                }
+            ],
+        }
+
+        async def call():
+            async with self._semaphore:
+                return await self.async_client.messages.create(**request)
+
+        try:
+            message = await asyncio.wait_for(call(), timeout=self.timeout_sec)
+            insights = self._parse_batch_response(self._extract_text(message), len(moves))
+        except asyncio.TimeoutError:
+            logger.warning(f"Batched insight for {len(moves)} markets timed out after {self.timeout_sec}s")
+            return [None] * len(moves)
+        except Exception as e:
+            logger.error(f"Error generating batched insights with Claude: {e}")
+            return [None] * len(moves)
+
+        self.insights += sum(1 for insight in insights if insight)
+        missing = [i for i, insight in enumerate(insights) if insight is None]
+        if missing:
+            logger.warning(f"Batched insight reply left out {len(missing)} of {len(moves)} markets")
+            retried = await asyncio.gather(*(self.generate_insight_async(**moves[i]) for i in missing))
+            for i, insight in zip(missing, retried):
+                insights[i] = insight
+
+        logger.info(f"Generated {sum(1 for i in insights if i)} insights in one batched request")
+        return insights
+
+    async def generate_insight_async(
+        self,
+        market_title: str,
+        old_prob: float,
+        new_prob: float,
+        delta_pct: float,
+        window_minutes: int,
+        volume_delta: Optional[float] = None,
+        time_to_resolution: Optional[str] = None,
+        user_name: Optional[str] = "Yash",
+        signal_summary: Optional[str] = None,
+        long_term_trend: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Non-blocking generate_insight for use on the event loop.
+
+        At most max_concurrency requests are in flight; callers beyond that
+        wait for a slot. The whole call, waiting included, is limited to
+        timeout_sec. Cancelling the caller cancels the request.
+
+        Returns:
+            Generated insight text or None if disabled/timed out/error
+        """
+        if not self.async_client:
+            logger.warning("Claude client not initialized. Skipping insight generation.")
+            return None
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        user_prompt = self._build_prompt(
+            market_title, old_prob, new_prob, delta_pct, window_minutes,
+            volume_delta, time_to_resolution, user_name, signal_summary, long_term_trend
+        )
+
+        async def request():
+            async with self._semaphore:
+                return await self.async_client.messages.create(**self._request(user_prompt))
+
+        try:
+            message = await asyncio.wait_for(request(), timeout=self.timeout_sec)
+        except asyncio.TimeoutError:
+            logger.warning(f"Insight for {market_title[:50]} timed out after {self.timeout_sec}s")
+            return None
+        except Exception as e:
+            logger.error(f"Error generating insight with Claude: {e}")
+            return None
+
+        insight_text = self._extract_text(message)
+        if insight_text:
+            self.insights += 1
+            logger.info(f"Generated insight for {user_name or 'all users'} on market: {market_title[:50]}...")
+        return insight_text
+
     def generate_insight_from_history(
         self,
         market_title: str,
@@ -110,7 +374,7 @@ Consider external factors and market context when analyzing this move. In 3–5
         new_snapshot: dict,
         window_minutes: int,
         time_to_resolution: Optional[str] = None,
-        user_name: str = "Yash",
+        user_name: Optional[str] = "Yash",
         signal_summary: Optional[str] = None,
         long_term_trend: Optional[str] = None,
     ) -> Optional[str]:
@@ -123,33 +387,67 @@ Consider external factors and market context when analyzing this move. In 3–5
             new_snapshot: New snapshot with 'implied_prob' and 'volume'
             window_minutes: Time window between snapshots
             time_to_resolution: Time until resolution (optional)
-            user_name: User name for personalization (default: "Yash")
+            user_name: User name for personalization (default: "Yash"); None for
+                an insight shared by all users
             signal_summary: External signal summary (optional)
             long_term_trend: Historical trend analysis (optional)
 
         Returns:
             Generated insight text or None
         """
+        return self.generate_insight(**self.history_args(
+            market_title, old_snapshot, new_snapshot, window_minutes,
+            time_to_resolution, user_name, signal_summary, long_term_trend
+        ))
+
+    async def generate_insight_from_history_async(
+        self,
+        market_title: str,
+        old_snapshot: dict,
+        new_snapshot: dict,
+        window_minutes: int,
+        time_to_resolution: Optional[str] = None,
+        user_name: Optional[str] = "Yash",
+        signal_summary: Optional[str] = None,
+        long_term_trend: Optional[str] = None,
+    ) -> Optional[str]:
+        """Non-blocking generate_insight_from_history (see generate_insight_async)"""
+        return await self.generate_insight_async(**self.history_args(
+            market_title, old_snapshot, new_snapshot, window_minutes,
+            time_to_resolution, user_name, signal_summary, long_term_trend
+        ))
+
+    @staticmethod
+    def history_args(
+        market_title: str,
+        old_snapshot: dict,
+        new_snapshot: dict,
+        window_minutes: int,
+        time_to_resolution: Optional[str],
+        user_name: Optional[str],
+        signal_summary: Optional[str],
+        long_term_trend: Optional[str],
+    ) -> Dict[str, Any]:
+        """generate_insight arguments for a move between two snapshots"""
         old_prob = old_snapshot.get("implied_prob", 0)
         new_prob = new_snapshot.get("implied_prob", 0)
-        delta_pct = new_prob - old_prob
 
         old_vol = old_snapshot.get("volume", 0)
         new_vol = new_snapshot.get("volume", 0)
         volume_delta = new_vol - old_vol if old_vol > 0 else None
 
-        return self.generate_insight(
-            market_title=market_title,
-            old_prob=old_prob,
-            new_prob=new_prob,
-            delta_pct=delta_pct,
-            window_minutes=window_minutes,
-            volume_delta=volume_delta,
-            time_to_resolution=time_to_resolution,
-            user_name=user_name,
-            signal_summary=signal_summary,
-            long_term_trend=long_term_trend,
-        )
+        return {
+            "market_title": market_title,
+            "old_prob": old_prob,
+            "new_prob": new_prob,
+            "delta_pct": new_prob - old_prob,
+            "window_minutes": window_minutes,
+            "volume_delta": volume_delta,
+            "time_to_resolution": time_to_resolution,
+            "user_name": user_name,
+            "signal_summary": signal_summary,
+            "long_term_trend": long_term_trend,
+        }
 
 
 # Singleton instance
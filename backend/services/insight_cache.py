@@ -0,0 +1,218 @@
+"""
+Insight Cache - Reuse Claude insights for near-identical market moves
+"""
+
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import InsightCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Claude pricing (USD per million tokens) for the insight model, used to
+# estimate the spend avoided by cache hits
+INPUT_COST_PER_MTOK = 0.25
+OUTPUT_COST_PER_MTOK = 1.25
+
+# Entries per upsert statement; 7 columns x 100 rows stays under SQLite's
+# historical 999 bound-parameter limit
+UPSERT_CHUNK_SIZE = 100
+
+
+class InsightCache:
+    """
+    Database-backed cache of insight texts keyed by a quantized market move.
+
+    Markets oscillating around the alert threshold trigger moves that differ
+    by a point or two; keying on market, direction and bucketed change and
+    probability lets those share one Claude call. Entries expire after ttl_sec,
+    and the least recently used entries are evicted beyond maxsize.
+    """
+
+    def __init__(
+        self,
+        ttl_sec: float = 6 * 3600,
+        maxsize: int = 10000,
+        delta_bucket_pct: float = 2.0,
+        prob_bucket_pct: float = 5.0
+    ):
+        """
+        Initialize the insight cache.
+
+        Args:
+            ttl_sec: How long a cached insight is reused
+            maxsize: Maximum number of cached insights
+            delta_bucket_pct: Width of the change buckets (percentage points)
+            prob_bucket_pct: Width of the new-probability buckets (percentage points)
+        """
+        self.ttl_sec = ttl_sec
+        self.maxsize = max(1, maxsize)
+        self.delta_bucket_pct = delta_bucket_pct
+        self.prob_bucket_pct = prob_bucket_pct
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "InsightCache":
+        """Build a cache from INSIGHT_CACHE_* environment variables"""
+        return cls(
+            ttl_sec=float(os.getenv("INSIGHT_CACHE_TTL_SEC", str(6 * 3600))),
+            maxsize=int(os.getenv("INSIGHT_CACHE_SIZE", "10000")),
+            delta_bucket_pct=float(os.getenv("INSIGHT_CACHE_DELTA_BUCKET_PCT", "2.0")),
+            prob_bucket_pct=float(os.getenv("INSIGHT_CACHE_PROB_BUCKET_PCT", "5.0")),
+        )
+
+    def key(self, market_id: str, old_prob: float, new_prob: float) -> str:
+        """Cache key for a move: market, direction, change bucket, probability bucket."""
+        delta = new_prob - old_prob
+        direction = "up" if delta >= 0 else "down"
+        delta_bucket = int(abs(delta) // self.delta_bucket_pct)
+        prob_bucket = int(new_prob // self.prob_bucket_pct)
+        return f"{market_id}:{direction}:{delta_bucket}:{prob_bucket}"
+
+    def get(self, db: Session, key: str) -> Optional[str]:
+        """
+        Cached insight text for a key.
+
+        Returns:
+            The text, or None on a miss (expired entries count as misses)
+        """
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        entry = (
+            db.query(InsightCacheEntry)
+            .filter(InsightCacheEntry.key == key, InsightCacheEntry.expires_at > now)
+            .first()
+        )
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        entry.hits += 1
+        entry.last_used_at = now
+        db.commit()
+        return entry.text
+
+    def set(self, db: Session, key: str, market_id: str, text: str):
+        """Cache one insight text (see set_many)."""
+        self.set_many(db, [(key, market_id, text)])
+
+    def set_many(self, db: Session, entries: List[Tuple[str, str, str]]):
+        """
+        Cache insight texts, then evict expired and least recently used entries.
+
+        Entries are upserted on their key, so a concurrent writer caching the
+        same move replaces the text instead of failing the batch. Eviction
+        runs once per call.
+
+        Args:
+            db: Database session (committed on success)
+            entries: (key, market_id, text) per insight
+        """
+        if not entries:
+            return
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        expires_at = now + timedelta(seconds=self.ttl_sec)
+        rows = {
+            key: {
+                "key": key,
+                "market_id": market_id,
+                "text": text,
+                "created_at": now,
+                "expires_at": expires_at,
+                "last_used_at": now,
+                "hits": 0,
+            }
+            for key, market_id, text in entries
+        }
+
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            insert = sqlite.insert
+        elif dialect == "postgresql":
+            insert = postgresql.insert
+        else:
+            logger.warning(f"Insight cache writes are not supported on {dialect}; skipping")
+            return
+
+        values = list(rows.values())
+        for i in range(0, len(values), UPSERT_CHUNK_SIZE):
+            stmt = insert(InsightCacheEntry.__table__).values(values[i:i + UPSERT_CHUNK_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["key"],
+                set_={
+                    "text": stmt.excluded.text,
+                    "created_at": stmt.excluded.created_at,
+                    "expires_at": stmt.excluded.expires_at,
+                    "last_used_at": stmt.excluded.last_used_at,
+                }
+            )
+            db.execute(stmt)
+
+        self._evict(db, now)
+        db.commit()
+
+    def _evict(self, db: Session, now: datetime):
+        """Drop expired entries, then the least recently used beyond maxsize."""
+        evicted = (
+            db.query(InsightCacheEntry)
+            .filter(InsightCacheEntry.expires_at <= now)
+            .delete(synchronize_session=False)
+        )
+
+        overflow = db.query(func.count(InsightCacheEntry.id)).scalar() - self.maxsize
+        if overflow > 0:
+            oldest = (
+                db.query(InsightCacheEntry.id)
+                .order_by(InsightCacheEntry.last_used_at)
+                .limit(overflow)
+                .subquery()
+            )
+            evicted += (
+                db.query(InsightCacheEntry)
+                .filter(InsightCacheEntry.id.in_(db.query(oldest.c.id)))
+                .delete(synchronize_session=False)
+            )
+
+        self.evictions += evicted
+
+    def stats(self, db: Session, usage: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Counters for monitoring.
+
+        Args:
+            db: Database session
+            usage: InsightService.usage_stats(), used to estimate the tokens
+                and spend avoided by hits (at the average cost of a generated
+                insight; a batched call produces several)
+        """
+        lookups = self.hits + self.misses
+        stats = {
+            "size": db.query(func.count(InsightCacheEntry.id)).scalar(),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "calls_avoided": self.hits,
+        }
+
+        if usage and usage.get("insights"):
+            avg_input = usage["input_tokens"] / usage["insights"]
+            avg_output = usage["output_tokens"] / usage["insights"]
+            stats["tokens_avoided"] = round(self.hits * (avg_input + avg_output))
+            stats["cost_avoided_usd"] = round(
+                self.hits * (avg_input * INPUT_COST_PER_MTOK + avg_output * OUTPUT_COST_PER_MTOK) / 1_000_000,
+                4
+            )
+
+        return stats
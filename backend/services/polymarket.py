@@ -2,14 +2,27 @@
 Polymarket Service - Fetch market data from Polymarket APIs
 """
 
+import asyncio
+import json
+import os
 import httpx
 from typing import Optional, Dict, List, Any, Tuple
 from datetime import datetime, timezone
 from urllib.parse import urlparse
 import logging
 
+from services.cache import FieldTTLCache, TTLCache
+from services.singleflight import SingleFlight
+
 logger = logging.getLogger(__name__)
 
+# Default for resolution cache lookups, distinct from a cached "not found" (None)
+_NOT_CACHED = object()
+
+
+class LookupFailed(Exception):
+    """A Gamma lookup errored or got an unexpected status (not a definite "not found")."""
+
 
 class PolymarketService:
     """Service for interacting with Polymarket Gamma and CLOB APIs"""
@@ -17,17 +30,169 @@ class PolymarketService:
     GAMMA_API_BASE = "https://gamma-api.polymarket.com"
     CLOB_API_BASE = "https://clob.polymarket.com"
 
-    def __init__(self):
+    # Number of market IDs sent in one multi-ID Gamma /markets query
+    GAMMA_BULK_CHUNK_SIZE = 50
+    # Number of token IDs sent in one CLOB /midpoints request
+    CLOB_BULK_CHUNK_SIZE = 100
+
+    # Market fields that almost never change, cached for metadata_ttl_sec
+    METADATA_FIELDS = ("id", "question", "slug", "outcomes", "clobTokenIds", "endDate")
+    # Market fields that move with trading, cached for volatile_ttl_sec and
+    # only ever refreshed from Gamma
+    VOLATILE_FIELDS = (
+        "lastTradePrice", "bestBid", "bestAsk", "volume24hrClob", "active", "closed",
+    )
+    # Outcome prices, cached for price_ttl_sec; CLOB can refresh these alone
+    PRICE_FIELDS = ("outcomePrices", "updatedAt")
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        price_source: Optional[str] = None,
+        price_staleness_sec: Optional[float] = None,
+        price_history_window_sec: Optional[float] = None,
+        metadata_ttl_sec: Optional[float] = None,
+        price_ttl_sec: Optional[float] = None,
+        volatile_ttl_sec: Optional[float] = None,
+        market_cache_size: Optional[int] = None,
+        resolution_ttl_sec: Optional[float] = None,
+        negative_ttl_sec: Optional[float] = None
+    ):
+        """
+        Initialize the Polymarket service.
+
+        Args:
+            max_concurrency: Maximum upstream requests in flight for bulk
+                calls (defaults to POLYMARKET_MAX_CONCURRENCY env var or 10)
+            price_source: "gamma" to price snapshots from the Gamma payload and
+                only call CLOB as a fallback, or "clob" to always ask CLOB
+                (defaults to SNAPSHOT_PRICE_SOURCE env var or "gamma")
+            price_staleness_sec: Gamma prices older than this are refreshed
+                from CLOB (defaults to PRICE_STALENESS_SEC env var or 600)
+            price_history_window_sec: How far back the CLOB price-history
+                fallback looks (defaults to PRICE_HISTORY_WINDOW_SEC env var or 3600)
+            metadata_ttl_sec: Cache TTL for METADATA_FIELDS (defaults to
+                METADATA_TTL_SEC env var or 3600)
+            price_ttl_sec: Cache TTL for PRICE_FIELDS (defaults to
+                PRICE_TTL_SEC env var or 60)
+            volatile_ttl_sec: Cache TTL for VOLATILE_FIELDS (defaults to
+                VOLATILE_TTL_SEC env var or 300)
+            market_cache_size: Maximum markets kept in the cache (defaults to
+                MARKET_CACHE_SIZE env var or 5000)
+            resolution_ttl_sec: Cache TTL for resolved slugs/URLs (defaults to
+                RESOLUTION_TTL_SEC env var or 3600)
+            negative_ttl_sec: Cache TTL for slugs/URLs that resolved to nothing
+                (defaults to NEGATIVE_CACHE_TTL_SEC env var or 60)
+        """
         self.client = httpx.AsyncClient(timeout=30.0)
+        self.max_concurrency = max(1, max_concurrency or int(os.getenv("POLYMARKET_MAX_CONCURRENCY", "10")))
+        self.price_source = (price_source or os.getenv("SNAPSHOT_PRICE_SOURCE", "gamma")).lower()
+        self.price_staleness_sec = (
+            price_staleness_sec
+            if price_staleness_sec is not None
+            else float(os.getenv("PRICE_STALENESS_SEC", "600"))
+        )
+        self.price_history_window_sec = (
+            price_history_window_sec
+            if price_history_window_sec is not None
+            else float(os.getenv("PRICE_HISTORY_WINDOW_SEC", "3600"))
+        )
+
+        if metadata_ttl_sec is None:
+            metadata_ttl_sec = float(os.getenv("METADATA_TTL_SEC", "3600"))
+        if price_ttl_sec is None:
+            price_ttl_sec = float(os.getenv("PRICE_TTL_SEC", "60"))
+        if volatile_ttl_sec is None:
+            volatile_ttl_sec = float(os.getenv("VOLATILE_TTL_SEC", "300"))
+        field_ttls = {field: metadata_ttl_sec for field in self.METADATA_FIELDS}
+        field_ttls.update({field: volatile_ttl_sec for field in self.VOLATILE_FIELDS})
+        field_ttls.update({field: price_ttl_sec for field in self.PRICE_FIELDS})
+        self.market_cache = FieldTTLCache(
+            field_ttls,
+            maxsize=market_cache_size or int(os.getenv("MARKET_CACHE_SIZE", "5000"))
+        )
+
+        self.resolution_cache = TTLCache(
+            maxsize=int(os.getenv("RESOLUTION_CACHE_SIZE", "2048")),
+            ttl=resolution_ttl_sec if resolution_ttl_sec is not None else float(os.getenv("RESOLUTION_TTL_SEC", "3600"))
+        )
+        self.negative_ttl_sec = (
+            negative_ttl_sec
+            if negative_ttl_sec is not None
+            else float(os.getenv("NEGATIVE_CACHE_TTL_SEC", "60"))
+        )
+
+        # Markets re-priced from CLOB instead of refetched from Gamma
+        self.price_refreshes = 0
+
+        # Concurrent identical requests share one upstream call
+        self._flights = SingleFlight()  # snapshots, events, slug resolution
+        self._market_flights = SingleFlight()  # Gamma markets, per market ID
+        self._price_flights = SingleFlight()  # CLOB prices, per token ID
 
     async def close(self):
         """Close the HTTP client"""
         await self.client.aclose()
 
+    @staticmethod
+    async def _first_positive(coros: List[Any], is_positive, ordered: bool = False) -> Any:
+        """
+        Run lookups concurrently and return the first positive result.
+
+        Args:
+            coros: Lookup coroutines, in priority order
+            is_positive: Predicate deciding whether a result is a hit
+            ordered: If True, a hit only wins once every higher-priority lookup
+                has come back negative (results differ in meaning); otherwise
+                whichever hit arrives first wins
+
+        Returns:
+            The winning result, or None if every lookup was negative
+
+        Raises:
+            LookupFailed: No lookup hit and at least one failed, so "not
+                found" isn't certain (with ordered, also if a
+                higher-priority lookup failed before a hit)
+        """
+        tasks = [asyncio.ensure_future(coro) for coro in coros]
+        failure: Optional[LookupFailed] = None
+        try:
+            if ordered:
+                for task in tasks:
+                    try:
+                        result = await task
+                    except LookupFailed as e:
+                        failure = failure or e
+                        continue
+                    if is_positive(result):
+                        if failure:
+                            raise failure
+                        return result
+            else:
+                for next_done in asyncio.as_completed(tasks):
+                    try:
+                        result = await next_done
+                    except LookupFailed as e:
+                        failure = failure or e
+                        continue
+                    if is_positive(result):
+                        return result
+            if failure:
+                raise failure
+            return None
+        finally:
+            # The answer is known; stop any lookups still in flight
+            for task in tasks:
+                task.cancel()
+
     async def resolve_market_input(self, input_str: str) -> Tuple[Optional[str], Optional[str], Optional[str], bool]:
         """
         Resolve a user input (URL, slug, or ID) to market/event details.
 
+        Results are cached for resolution_ttl_sec, and inputs that Gamma
+        reports as not found for negative_ttl_sec. Failed lookups (errors,
+        unexpected statuses) return not-found without being cached.
+
         Args:
             input_str: URL, slug, or numeric ID
 
@@ -36,19 +201,45 @@ class PolymarketService:
         """
         input_str = input_str.strip()
 
+        # If it's numeric, assume it's a market ID
+        if input_str.isdigit():
+            return (input_str, None, None, False)
+
+        cache_key = ("input", input_str)
+        cached = self.resolution_cache.get(cache_key, _NOT_CACHED)
+        if cached is not _NOT_CACHED:
+            return cached
+
+        return await self._flights.do(cache_key, lambda: self._resolve_and_cache(input_str))
+
+    async def _resolve_and_cache(self, input_str: str) -> Tuple[Optional[str], Optional[str], Optional[str], bool]:
+        """Resolve input_str upstream and cache the result (unless the lookup failed)."""
+        try:
+            result = await self._resolve_uncached(input_str)
+        except LookupFailed as e:
+            logger.warning(f"Could not resolve {input_str}: {e}")
+            return (None, None, None, False)
+        ttl = None if result[0] else self.negative_ttl_sec
+        self.resolution_cache.set(("input", input_str), result, ttl=ttl)
+        return result
+
+    async def _resolve_uncached(self, input_str: str) -> Tuple[Optional[str], Optional[str], Optional[str], bool]:
+        """Resolve a URL or slug against Gamma API (see resolve_market_input)."""
+        not_found = (None, None, None, False)
+
         # Check if it's a URL
         if input_str.startswith('http://') or input_str.startswith('https://'):
             parsed = urlparse(input_str)
 
             # Check if it's a Polymarket URL
-            if 'polymarket.com' not in parsed.hostname:
-                return (None, None, None, False)
+            if not parsed.hostname or 'polymarket.com' not in parsed.hostname:
+                return not_found
 
             # Extract path segments
             path_parts = [p for p in parsed.path.split('/') if p]
 
             if len(path_parts) < 2:
-                return (None, None, None, False)
+                return not_found
 
             path_type = path_parts[0]  # 'event' or 'market'
             slug = path_parts[1]
@@ -59,68 +250,106 @@ class PolymarketService:
             elif path_type == 'market':
                 return await self._resolve_market_slug(slug)
 
-        # If it's numeric, assume it's a market ID
-        if input_str.isdigit():
-            return (input_str, None, None, False)
+        # Otherwise, try as a slug: market and event lookups run concurrently,
+        # but a market match still takes precedence over an event match
+        result = await self._first_positive(
+            [self._resolve_market_slug(input_str), self._resolve_event_slug(input_str)],
+            lambda r: bool(r[0]),
+            ordered=True
+        )
+        return result or not_found
 
-        # Otherwise, try as a slug (market first, then event)
-        result = await self._resolve_market_slug(input_str)
-        if result[0]:
-            return result
+    async def _gamma_list(self, path: str, params: Dict[str, Any]) -> List[Any]:
+        """
+        GET a Gamma list endpoint.
 
-        return await self._resolve_event_slug(input_str)
+        Returns:
+            The listed items (empty if Gamma found nothing)
 
-    async def _resolve_market_slug(self, slug: str) -> Tuple[Optional[str], Optional[str], Optional[str], bool]:
-        """Resolve a market slug to market ID."""
+        Raises:
+            LookupFailed: The request errored or didn't return a 200 list
+        """
         try:
-            url = f"{self.GAMMA_API_BASE}/markets"
-            params = {"slug": slug, "limit": 1}
-            response = await self.client.get(url, params=params)
-
-            if response.status_code == 200:
-                data = response.json()
-                if isinstance(data, list) and len(data) > 0:
-                    market = data[0]
-                    return (market.get('id'), None, None, False)
+            response = await self.client.get(f"{self.GAMMA_API_BASE}{path}", params=params)
         except Exception as e:
-            logger.error(f"Error resolving market slug {slug}: {e}")
+            raise LookupFailed(f"GET {path} {params} failed: {e}") from e
+        if response.status_code != 200:
+            raise LookupFailed(f"GET {path} {params} returned {response.status_code}")
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise LookupFailed(f"GET {path} {params} returned invalid JSON") from e
+        if not isinstance(data, list):
+            raise LookupFailed(f"GET {path} {params} returned {type(data).__name__}, not a list")
+        return data
 
+    async def _resolve_market_slug(self, slug: str) -> Tuple[Optional[str], Optional[str], Optional[str], bool]:
+        """Resolve a market slug to market ID (raises LookupFailed on errors)."""
+        data = await self._gamma_list("/markets", {"slug": slug, "limit": 1})
+        if data:
+            return (data[0].get('id'), None, None, False)
         return (None, None, None, False)
 
     async def _resolve_event_slug(self, slug: str) -> Tuple[Optional[str], Optional[str], Optional[str], bool]:
-        """Resolve an event slug to event ID, market ID, and event title."""
-        try:
-            url = f"{self.GAMMA_API_BASE}/events"
-            params = {"slug": slug, "limit": 1}
-            response = await self.client.get(url, params=params)
-
-            if response.status_code == 200:
-                data = response.json()
-                if isinstance(data, list) and len(data) > 0:
-                    event = data[0]
-                    event_id = event.get('id')
-                    event_title = event.get('title')
-
-                    # Get first active market
-                    markets = event.get('markets', [])
-                    if markets:
-                        # Find first active, non-closed market
-                        active_market = next(
-                            (m for m in markets if m.get('active') and not m.get('closed')),
-                            markets[0]  # Fallback to first market
-                        )
-                        market_id = active_market.get('id')
-                        return (market_id, event_id, event_title, True)
-        except Exception as e:
-            logger.error(f"Error resolving event slug {slug}: {e}")
+        """Resolve an event slug to event ID, market ID, and event title (raises LookupFailed on errors)."""
+        data = await self._gamma_list("/events", {"slug": slug, "limit": 1})
+        if data:
+            event = data[0]
+            event_id = event.get('id')
+            event_title = event.get('title')
+
+            # Get first active market
+            markets = event.get('markets', [])
+            if markets:
+                # Find first active, non-closed market
+                active_market = next(
+                    (m for m in markets if m.get('active') and not m.get('closed')),
+                    markets[0]  # Fallback to first market
+                )
+                market_id = active_market.get('id')
+                return (market_id, event_id, event_title, True)
 
         return (None, None, None, False)
 
+    async def _get_event(self, params: Optional[Dict[str, str]] = None, event_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Fetch one event by query (/events?...) or directly (/events/{event_id}).
+
+        Returns:
+            The event, or None if Gamma has no such event
+
+        Raises:
+            LookupFailed: The request errored or got an unexpected status
+        """
+        if event_id is None:
+            data = await self._gamma_list("/events", params or {})
+            return data[0] if data else None
+
+        path = f"/events/{event_id}"
+        try:
+            response = await self.client.get(f"{self.GAMMA_API_BASE}{path}")
+        except Exception as e:
+            raise LookupFailed(f"GET {path} failed: {e}") from e
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise LookupFailed(f"GET {path} returned {response.status_code}")
+        try:
+            return response.json() or None
+        except ValueError as e:
+            raise LookupFailed(f"GET {path} returned invalid JSON") from e
+
     async def check_if_event(self, id_str: str) -> Optional[Dict[str, Any]]:
         """
         Check if an ID/slug corresponds to a multi-outcome event.
 
         Supports both numeric IDs and slug-based lookups (e.g., from URLs).
+        The slug, ID and direct-endpoint lookups run concurrently and the first
+        hit wins. The resolution (event ID, title, is_event) is cached like
+        resolve_market_input's, so repeat calls take a single direct request
+        for current event data; misses are cached for negative_ttl_sec.
+        Failed lookups return None without being cached. Concurrent calls for
+        the same ID/slug share one lookup.
 
         Args:
             id_str: The ID or slug to check (e.g., "764" or "of-views-of-next-mrbeast-video-on-day-1-764")
@@ -128,39 +357,48 @@ class PolymarketService:
         Returns:
             Event data if it's an event, None otherwise
         """
-        try:
-            # Try slug-based lookup first (handles URL slugs)
-            url = f"{self.GAMMA_API_BASE}/events"
-            params = {"slug": id_str}
-            response = await self.client.get(url, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                if isinstance(data, list) and len(data) > 0:
-                    logger.info(f"Found event by slug: {id_str}")
-                    return data[0]
-
-            # Try numeric ID lookup
-            params = {"id": id_str}
-            response = await self.client.get(url, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                if isinstance(data, list) and len(data) > 0:
-                    logger.info(f"Found event by ID: {id_str}")
-                    return data[0]
-
-            # Try direct endpoint (legacy support)
-            url = f"{self.GAMMA_API_BASE}/events/{id_str}"
-            response = await self.client.get(url)
-            if response.status_code == 200:
-                logger.info(f"Found event by direct endpoint: {id_str}")
-                return response.json()
+        return await self._flights.do(("event", id_str), lambda: self._check_if_event(id_str))
+
+    async def _check_if_event(self, id_str: str) -> Optional[Dict[str, Any]]:
+        """Look up an event by ID/slug via the resolution cache (see check_if_event)."""
+        cache_key = ("event", id_str)
+        cached = self.resolution_cache.get(cache_key, _NOT_CACHED)
+        if cached is not _NOT_CACHED:
+            event_id, _, is_event = cached
+            if not is_event:
+                logger.debug(f"Event not found (cached): {id_str}")
+                return None
+            try:
+                event = await self._get_event(event_id=event_id)
+            except LookupFailed as e:
+                logger.warning(f"Could not fetch event {id_str}: {e}")
+                return None
+            if event:
+                return event
+            # The cached mapping went stale; fall through to a full lookup
+            self.resolution_cache.invalidate(cache_key)
 
-            logger.debug(f"Event not found: {id_str}")
+        try:
+            event = await self._first_positive(
+                [
+                    self._get_event(params={"slug": id_str}),
+                    self._get_event(params={"id": id_str}),
+                    self._get_event(event_id=id_str),
+                ],
+                lambda e: bool(e)
+            )
+        except LookupFailed as e:
+            logger.warning(f"Could not look up event {id_str}: {e}")
             return None
 
-        except Exception as e:
-            logger.error(f"Error checking event {id_str}: {e}")
-            return None
+        if event and event.get("id") is not None:
+            logger.info(f"Found event: {id_str}")
+            self.resolution_cache.set(cache_key, (str(event["id"]), event.get("title"), True))
+            return event
+
+        logger.debug(f"Event not found: {id_str}")
+        self.resolution_cache.set(cache_key, (None, None, False), ttl=self.negative_ttl_sec)
+        return event or None
 
     async def get_market(self, market_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -242,6 +480,9 @@ class PolymarketService:
         """
         Get the last trade price for a token from CLOB API.
 
+        Only the last price_history_window_sec of history is requested, so
+        the response stays small no matter how old the market is.
+
         Args:
             token_id: The CLOB token ID
 
@@ -250,7 +491,8 @@ class PolymarketService:
         """
         try:
             url = f"{self.CLOB_API_BASE}/prices-history"
-            params = {"market": token_id, "interval": "max", "fidelity": "1"}
+            start_ts = int(datetime.now(timezone.utc).timestamp() - self.price_history_window_sec)
+            params = {"market": token_id, "startTs": str(start_ts), "fidelity": "1"}
 
             response = await self.client.get(url, params=params)
 
@@ -269,24 +511,386 @@ class PolymarketService:
             logger.error(f"Exception fetching price for token {token_id}: {e}")
             return None
 
-    async def get_market_snapshot(self, market_id: str) -> Optional[Dict[str, Any]]:
+    async def _fetch_midpoints_chunk(self, token_ids: List[str]) -> Dict[str, float]:
+        """Fetch midpoints for up to CLOB_BULK_CHUNK_SIZE tokens with one POST /midpoints."""
+        try:
+            url = f"{self.CLOB_API_BASE}/midpoints"
+            payload = [{"token_id": token_id} for token_id in token_ids]
+            response = await self.client.post(url, json=payload)
+
+            if response.status_code == 200:
+                data = response.json()
+                prices = {}
+                if isinstance(data, dict):
+                    for token_id, mid in data.items():
+                        try:
+                            prices[str(token_id)] = float(mid)
+                        except (TypeError, ValueError):
+                            continue
+                return prices
+            else:
+                logger.error(f"Error fetching midpoints for {len(token_ids)} tokens: {response.status_code}")
+                return {}
+
+        except Exception as e:
+            logger.error(f"Exception fetching midpoints for {len(token_ids)} tokens: {e}")
+            return {}
+
+    async def get_prices_bulk(
+        self,
+        token_ids: List[str],
+        max_concurrency: Optional[int] = None
+    ) -> Dict[str, float]:
         """
-        Get a complete snapshot of a market including price data.
+        Get current prices for many CLOB tokens in as few requests as possible.
 
-        This combines data from Gamma API (market info) and CLOB API (prices).
+        Tokens are priced by midpoint with chunked POST /midpoints requests.
+        Tokens the midpoint endpoint does not price fall back to the last
+        point of a short window of price history. Tokens another caller is
+        already pricing join that request.
 
         Args:
-            market_id: The Polymarket market ID
+            token_ids: CLOB token IDs
+            max_concurrency: Limit on requests in flight (defaults to the
+                service limit)
 
         Returns:
-            Dictionary with market snapshot data or None if error
+            Prices keyed by token ID (tokens without a price are omitted)
         """
+        unique_ids = list(dict.fromkeys(str(token_id) for token_id in token_ids))
+        if not unique_ids:
+            return {}
+
+        return await self._price_flights.do_many(
+            unique_ids,
+            lambda ids: self._fetch_prices_uncached(ids, max_concurrency)
+        )
+
+    async def _fetch_prices_uncached(
+        self,
+        unique_ids: List[str],
+        max_concurrency: Optional[int] = None
+    ) -> Dict[str, float]:
+        """Price tokens with chunked /midpoints requests, falling back to recent price history."""
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def fetch_chunk(chunk: List[str]) -> Dict[str, float]:
+            async with semaphore:
+                return await self._fetch_midpoints_chunk(chunk)
+
+        async def fetch_single(token_id: str) -> Optional[float]:
+            async with semaphore:
+                return await self.get_last_trade_price(token_id)
+
+        chunks = [
+            unique_ids[i:i + self.CLOB_BULK_CHUNK_SIZE]
+            for i in range(0, len(unique_ids), self.CLOB_BULK_CHUNK_SIZE)
+        ]
+        prices: Dict[str, float] = {}
+        for chunk_result in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks)):
+            prices.update(chunk_result)
+
+        missing = [token_id for token_id in unique_ids if token_id not in prices]
+        if missing:
+            logger.debug(f"{len(missing)} tokens missing from midpoints, using recent price history")
+            singles = await asyncio.gather(*(fetch_single(token_id) for token_id in missing))
+            for token_id, price in zip(missing, singles):
+                if price is not None:
+                    prices[token_id] = price
+
+        return prices
+
+    async def _fetch_markets_chunk(self, market_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch up to GAMMA_BULK_CHUNK_SIZE markets with one multi-ID /markets query."""
         try:
-            # Get market metadata from Gamma
-            market = await self.get_market(market_id)
-            if not market:
+            url = f"{self.GAMMA_API_BASE}/markets"
+            params = [("id", market_id) for market_id in market_ids]
+            params.append(("limit", str(len(market_ids))))
+            response = await self.client.get(url, params=params)
+
+            if response.status_code == 200:
+                data = response.json()
+                if isinstance(data, list):
+                    return {str(market.get("id")): market for market in data if market.get("id") is not None}
+                return {}
+            else:
+                logger.error(f"Error fetching {len(market_ids)} markets in bulk: {response.status_code}")
+                return {}
+
+        except Exception as e:
+            logger.error(f"Exception fetching {len(market_ids)} markets in bulk: {e}")
+            return {}
+
+    async def get_markets_bulk(
+        self,
+        market_ids: List[str],
+        max_concurrency: Optional[int] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch many markets from Gamma API in as few requests as possible.
+
+        Records hold METADATA_FIELDS, VOLATILE_FIELDS and PRICE_FIELDS only,
+        whether they come from the cache or from Gamma. Markets whose cached
+        fields are all fresh are served from the market cache. Markets whose
+        only expired fields are PRICE_FIELDS are re-priced with one batched
+        CLOB /midpoints call instead of refetching Gamma (see
+        _refresh_prices). Once volume, status or metadata expire, the market
+        is refetched from Gamma. Markets another caller is already fetching join
+        that request. The rest are chunked into multi-ID /markets queries of
+        GAMMA_BULK_CHUNK_SIZE. Any ID the bulk query does not return (e.g.
+        closed markets or unusual IDs) falls back to the single-market endpoint.
+
+        Args:
+            market_ids: Polymarket market IDs
+            max_concurrency: Limit on requests in flight (defaults to the
+                service limit)
+
+        Returns:
+            Market data dictionaries keyed by market ID (missing IDs are omitted)
+        """
+        unique_ids = list(dict.fromkeys(str(market_id) for market_id in market_ids))
+        if not unique_ids:
+            return {}
+
+        markets: Dict[str, Dict[str, Any]] = {}
+        stale_prices: Dict[str, str] = {}  # Token ID per market with only prices expired
+        for market_id in unique_ids:
+            cached = self.market_cache.get_fields(market_id)
+            if cached is not None:
+                markets[market_id] = cached
+                continue
+            unpriced = self.market_cache.get_fields(
+                market_id, self.METADATA_FIELDS + self.VOLATILE_FIELDS, count=False
+            )
+            token_id = self._first_token_id(unpriced) if unpriced else None
+            if token_id:
+                stale_prices[market_id] = token_id
+
+        if stale_prices:
+            markets.update(await self._refresh_prices(stale_prices, max_concurrency))
+
+        to_fetch = [market_id for market_id in unique_ids if market_id not in markets]
+        if to_fetch:
+            markets.update(await self._market_flights.do_many(
+                to_fetch,
+                lambda ids: self._fetch_markets_uncached(ids, max_concurrency)
+            ))
+
+        # Only return what was asked for, keyed by the caller's IDs
+        return {market_id: markets[market_id] for market_id in unique_ids if market_id in markets}
+
+    async def _refresh_prices(
+        self,
+        token_ids: Dict[str, str],
+        max_concurrency: Optional[int] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Re-price cached markets from CLOB and merge the prices into their records.
+
+        The first outcome's price is replaced (and the second's, for binary
+        markets) and updatedAt is set to now. Only PRICE_FIELDS get a new
+        lifetime; volume and status expire on their own schedule and are then
+        refetched from Gamma.
+
+        Args:
+            token_ids: First-outcome CLOB token ID per market ID
+
+        Returns:
+            Refreshed records keyed by market ID (markets CLOB didn't price are omitted)
+        """
+        prices = await self.get_prices_bulk(list(token_ids.values()), max_concurrency=max_concurrency)
+        updated_at = datetime.now(timezone.utc).isoformat()
+
+        refreshed = {}
+        for market_id, token_id in token_ids.items():
+            price = prices.get(token_id)
+            record = self.market_cache.peek_fields(market_id)
+            if price is None or record is None:
+                continue
+
+            outcome_prices = list(self._parse_json_list(record.get("outcomePrices")) or [])
+            if len(outcome_prices) == 2:
+                outcome_prices = [price, 1 - price]
+            else:
+                outcome_prices[:1] = [price]
+            record["outcomePrices"] = outcome_prices
+            record["updatedAt"] = updated_at
+
+            self.market_cache.set_fields(market_id, record, self.PRICE_FIELDS)
+            self.price_refreshes += 1
+            refreshed[market_id] = record
+        return refreshed
+
+    async def _fetch_markets_uncached(
+        self,
+        unique_ids: List[str],
+        max_concurrency: Optional[int] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Fetch markets from Gamma in multi-ID chunks (falling back to /markets/{id}) and cache them."""
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def fetch_chunk(chunk: List[str]) -> Dict[str, Dict[str, Any]]:
+            async with semaphore:
+                return await self._fetch_markets_chunk(chunk)
+
+        async def fetch_single(market_id: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await self.get_market(market_id)
+
+        chunks = [
+            unique_ids[i:i + self.GAMMA_BULK_CHUNK_SIZE]
+            for i in range(0, len(unique_ids), self.GAMMA_BULK_CHUNK_SIZE)
+        ]
+        markets: Dict[str, Dict[str, Any]] = {}
+        for chunk_result in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks)):
+            markets.update(chunk_result)
+
+        missing = [market_id for market_id in unique_ids if market_id not in markets]
+        if missing:
+            logger.debug(f"{len(missing)} markets missing from bulk response, fetching individually")
+            singles = await asyncio.gather(*(fetch_single(market_id) for market_id in missing))
+            for market_id, market in zip(missing, singles):
+                if market:
+                    markets[market_id] = market
+
+        cached_fields = self.METADATA_FIELDS + self.VOLATILE_FIELDS + self.PRICE_FIELDS
+        records = {}
+        for market_id in unique_ids:
+            market = markets.get(market_id)
+            if market:
+                self.market_cache.set_fields(market_id, market)
+                records[market_id] = {field: market[field] for field in cached_fields if field in market}
+        return records
+
+    async def get_market_metadata(self, market_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a market's slow-changing metadata (METADATA_FIELDS).
+
+        Served from the market cache while the metadata TTL lasts, even when
+        the cached prices have expired.
+
+        Args:
+            market_id: The Polymarket market ID
+
+        Returns:
+            Metadata dictionary or None if the market could not be fetched
+        """
+        market_id = str(market_id)
+        cached = self.market_cache.get_fields(market_id, self.METADATA_FIELDS)
+        if cached is not None:
+            return cached
+
+        markets = await self.get_markets_bulk([market_id])
+        market = markets.get(market_id)
+        if not market:
+            return None
+        return {field: market[field] for field in self.METADATA_FIELDS if field in market}
+
+    def invalidate_market(self, market_id: Optional[str] = None):
+        """Drop a market (or every market if market_id is None) from the market cache."""
+        self.market_cache.invalidate(str(market_id) if market_id is not None else None)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the service caches."""
+        return {
+            "markets": {**self.market_cache.stats(), "price_refreshes": self.price_refreshes},
+            "resolutions": self.resolution_cache.stats(),
+        }
+
+    def singleflight_stats(self) -> Dict[str, Any]:
+        """Counters of upstream requests shared between concurrent callers."""
+        return {
+            "requests": self._flights.stats(),
+            "markets": self._market_flights.stats(),
+            "prices": self._price_flights.stats(),
+        }
+
+    @staticmethod
+    def _parse_json_list(value: Any) -> Optional[List[Any]]:
+        """Parse Gamma list fields, which may arrive as JSON-encoded strings."""
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
                 return None
+        return value if isinstance(value, list) else None
+
+    def _first_token_id(self, market: Dict[str, Any]) -> Optional[str]:
+        """CLOB token ID of the first outcome (typically "Yes"), if any."""
+        clob_token_ids = self._parse_json_list(market.get("clobTokenIds"))
+        if clob_token_ids:
+            return str(clob_token_ids[0])
+        return None
 
+    def _gamma_price(self, market: Dict[str, Any]) -> Optional[float]:
+        """
+        Price of the first outcome taken from the Gamma payload alone.
+
+        Prefers outcomePrices, then the bestBid/bestAsk midpoint, then
+        lastTradePrice. Returns None if the payload has no usable price or
+        was last updated more than price_staleness_sec ago.
+        """
+        updated_at = market.get("updatedAt")
+        if updated_at and self.price_staleness_sec > 0:
+            try:
+                updated = datetime.fromisoformat(str(updated_at).replace("Z", "+00:00"))
+                if updated.tzinfo is None:
+                    updated = updated.replace(tzinfo=timezone.utc)
+                age = (datetime.now(timezone.utc) - updated).total_seconds()
+                if age > self.price_staleness_sec:
+                    return None
+            except ValueError:
+                pass
+
+        try:
+            outcome_prices = self._parse_json_list(market.get("outcomePrices"))
+            if outcome_prices:
+                price = float(outcome_prices[0])
+                if 0 <= price <= 1:
+                    return price
+
+            best_bid = market.get("bestBid")
+            best_ask = market.get("bestAsk")
+            if best_bid is not None and best_ask is not None and float(best_ask) > 0:
+                return (float(best_bid) + float(best_ask)) / 2
+
+            last_price = market.get("lastTradePrice")
+            if last_price is not None and float(last_price) > 0:
+                return float(last_price)
+        except (TypeError, ValueError):
+            pass
+
+        return None
+
+    def _needs_clob_price(self, market: Dict[str, Any]) -> bool:
+        """True if a snapshot of this market has to be priced from CLOB."""
+        return self.price_source == "clob" or self._gamma_price(market) is None
+
+    def build_snapshot(
+        self,
+        market_id: str,
+        market: Optional[Dict[str, Any]],
+        clob_prices: Optional[Dict[str, float]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Build a market snapshot from Gamma market data.
+
+        With price_source="gamma" the price comes straight from the Gamma
+        payload and the CLOB price is only used when that price is missing or
+        stale. With price_source="clob" the CLOB price is always preferred.
+
+        Args:
+            market_id: The Polymarket market ID
+            market: Market data from Gamma API (None if it could not be fetched)
+            clob_prices: CLOB prices keyed by token ID (see get_prices_bulk)
+
+        Returns:
+            Dictionary with market snapshot data or None if error
+        """
+        if not market:
+            return None
+
+        try:
             # Extract key information
             snapshot = {
                 "market_id": market_id,
@@ -298,37 +902,36 @@ class PolymarketService:
                 "fetched_at": datetime.now(timezone.utc).isoformat(),
             }
 
-            # Try to get price data if token IDs are available
-            clob_token_ids = market.get("clobTokenIds")
-            if clob_token_ids:
-                # Parse token IDs (they might be stored as JSON string)
-                if isinstance(clob_token_ids, str):
-                    import json
-                    try:
-                        clob_token_ids = json.loads(clob_token_ids)
-                    except:
-                        clob_token_ids = None
+            price = None
+            price_source = None
 
-                if clob_token_ids and len(clob_token_ids) > 0:
-                    # Get price for the first outcome (typically "Yes")
-                    token_id = clob_token_ids[0]
-                    price = await self.get_last_trade_price(token_id)
+            if self.price_source != "clob":
+                price = self._gamma_price(market)
+                price_source = "gamma" if price is not None else None
 
-                    if price is not None:
-                        snapshot["price"] = price
-                        snapshot["implied_prob"] = price * 100  # Convert to percentage
+            if price is None and clob_prices:
+                token_id = self._first_token_id(market)
+                if token_id:
+                    price = clob_prices.get(token_id)
+                    price_source = "clob" if price is not None else None
 
             # Fallback: use lastTradePrice if available
-            if "price" not in snapshot:
-                last_price = market.get("lastTradePrice", 0)
+            if price is None:
+                last_price = market.get("lastTradePrice") or 0
                 if last_price > 0:
-                    snapshot["price"] = last_price
-                    snapshot["implied_prob"] = last_price * 100
-                else:
-                    # Default values if no price data available
-                    snapshot["price"] = 0.5
-                    snapshot["implied_prob"] = 50.0
+                    price = last_price
+                    price_source = "gamma"
 
+            if price is not None:
+                snapshot["price"] = price
+                snapshot["implied_prob"] = price * 100  # Convert to percentage
+            else:
+                # Default values if no price data available
+                snapshot["price"] = 0.5
+                snapshot["implied_prob"] = 50.0
+                price_source = "default"
+
+            snapshot["price_source"] = price_source
             snapshot["volume"] = market.get("volume24hrClob", 0)
 
             return snapshot
@@ -337,6 +940,64 @@ class PolymarketService:
             logger.error(f"Exception getting market snapshot for {market_id}: {e}")
             return None
 
+    async def get_market_snapshot(self, market_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a complete snapshot of a market including price data.
+
+        Prices come from the Gamma payload, with CLOB as a fallback (see
+        build_snapshot). Concurrent calls for the same market share one fetch.
+
+        Args:
+            market_id: The Polymarket market ID
+
+        Returns:
+            Dictionary with market snapshot data or None if error
+        """
+        market_id = str(market_id)
+
+        async def fetch() -> Optional[Dict[str, Any]]:
+            snapshots = await self.get_market_snapshots([market_id])
+            return snapshots.get(market_id)
+
+        return await self._flights.do(("snapshot", market_id), fetch)
+
+    async def get_market_snapshots(
+        self,
+        market_ids: List[str],
+        max_concurrency: Optional[int] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Get snapshots for many markets with batched upstream requests.
+
+        Gamma data is fetched with get_markets_bulk, and every market that
+        needs a CLOB price is priced together with one get_prices_bulk call.
+
+        Args:
+            market_ids: Polymarket market IDs
+            max_concurrency: Limit on requests in flight (defaults to the
+                service limit)
+
+        Returns:
+            Snapshots keyed by market ID (markets that failed are omitted)
+        """
+        market_ids = list(dict.fromkeys(str(market_id) for market_id in market_ids))
+        markets = await self.get_markets_bulk(market_ids, max_concurrency=max_concurrency)
+
+        token_ids = [
+            self._first_token_id(market)
+            for market in markets.values()
+            if self._needs_clob_price(market)
+        ]
+        token_ids = [token_id for token_id in token_ids if token_id]
+        clob_prices = await self.get_prices_bulk(token_ids, max_concurrency=max_concurrency) if token_ids else {}
+
+        snapshots = {}
+        for market_id in market_ids:
+            snapshot = self.build_snapshot(market_id, markets.get(market_id), clob_prices)
+            if snapshot:
+                snapshots[market_id] = snapshot
+        return snapshots
+
 
 # Singleton instance
 _polymarket_service: Optional[PolymarketService] = None
@@ -0,0 +1,128 @@
+"""
+Price Hub - push live price ticks to WebSocket clients, per subscribed market
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Set
+
+from services.downsample import to_epoch
+
+logger = logging.getLogger(__name__)
+
+
+def make_tick(market_id: str, ts: datetime, implied_prob: float, price: float, volume: Optional[float]) -> Dict[str, Any]:
+    """Compact price tick for a stored snapshot (ts in epoch milliseconds)."""
+    return {
+        "market_id": market_id,
+        "ts": int(to_epoch(ts) * 1000),
+        "prob": implied_prob,
+        "price": price,
+        "volume": volume or 0,
+    }
+
+
+class PriceSubscriber:
+    """
+    One client's subscriptions and its pending ticks.
+
+    Pending ticks are kept per market and overwritten by newer ones, so a
+    slow client gets the latest value of each market instead of a backlog.
+    """
+
+    def __init__(self):
+        self.markets: Set[str] = set()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._ready = asyncio.Event()
+
+    def offer(self, tick: Dict[str, Any]) -> bool:
+        """
+        Queue a tick, replacing any unsent tick of the same market.
+
+        Returns:
+            True if an unsent tick was replaced
+        """
+        replaced = tick["market_id"] in self._pending
+        self._pending[tick["market_id"]] = tick
+        self._ready.set()
+        return replaced
+
+    async def next_batch(self) -> Dict[str, Dict[str, Any]]:
+        """Wait for ticks and take everything pending, keyed by market."""
+        await self._ready.wait()
+        batch, self._pending = self._pending, {}
+        self._ready.clear()
+        return batch
+
+
+class PriceHub:
+    """
+    Fan out price ticks to the subscribers of each market.
+
+    Publishing a tick touches only that market's subscribers. The latest tick
+    per market is kept so new subscribers get a value straight away.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[PriceSubscriber]] = defaultdict(set)
+        self._latest: Dict[str, Dict[str, Any]] = {}
+
+        self.published = 0
+        self.coalesced = 0
+
+    def subscribe(self, subscriber: PriceSubscriber, market_ids: Iterable[str]):
+        """Add markets to a subscriber, sending the latest tick of each."""
+        for market_id in market_ids:
+            if market_id in subscriber.markets:
+                continue
+            subscriber.markets.add(market_id)
+            self._subscribers[market_id].add(subscriber)
+            if market_id in self._latest:
+                subscriber.offer(self._latest[market_id])
+
+    def unsubscribe(self, subscriber: PriceSubscriber, market_ids: Optional[Iterable[str]] = None):
+        """Remove markets (all of them if None) from a subscriber."""
+        for market_id in list(subscriber.markets if market_ids is None else market_ids):
+            subscriber.markets.discard(market_id)
+            subscribers = self._subscribers.get(market_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[market_id]
+
+    def publish(self, tick: Dict[str, Any]):
+        """Send a tick to the subscribers of its market."""
+        self._latest[tick["market_id"]] = tick
+        for subscriber in self._subscribers.get(tick["market_id"], ()):
+            if subscriber.offer(tick):
+                self.coalesced += 1
+            self.published += 1
+
+    def retain(self, market_ids: Iterable[str]):
+        """Forget the latest ticks of markets not in market_ids (e.g. no longer pinned)."""
+        keep = set(market_ids)
+        for market_id in [m for m in self._latest if m not in keep]:
+            del self._latest[market_id]
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for monitoring."""
+        return {
+            "markets": len(self._subscribers),
+            "subscribers": len(set().union(*self._subscribers.values())),
+            "published": self.published,
+            "coalesced": self.coalesced,
+        }
+
+
+# Singleton instance
+_price_hub: Optional[PriceHub] = None
+
+
+def get_price_hub() -> PriceHub:
+    """Get or create the price hub"""
+    global _price_hub
+    if _price_hub is None:
+        _price_hub = PriceHub()
+    return _price_hub
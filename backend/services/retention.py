@@ -0,0 +1,170 @@
+"""
+Retention Engine - Incrementally purge expired history, rollups and alerts
+"""
+
+import asyncio
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+
+from models import Alert, Insight, MarketHistory, MarketHistoryRollup
+
+logger = logging.getLogger(__name__)
+
+
+def _days_from_env(name: str, default: str) -> Optional[float]:
+    """Read a retention period in days; 0 or empty means keep forever."""
+    value = float(os.getenv(name, default) or 0)
+    return value if value > 0 else None
+
+
+class RetentionEngine:
+    """
+    Deletes data that has aged out of the retention policy, in small batches.
+
+    Tiers: raw market history is kept for raw_history_days (older data lives
+    on in the rollups), each rollup resolution for its own period, and seen
+    alerts for seen_alert_days, along with insights no alert refers to any
+    more. Unseen alerts are never purged.
+
+    Each batch is its own short transaction, and a run stops after
+    max_batches, so retention never holds the write lock for long. On SQLite
+    freed pages are then returned with an incremental vacuum.
+    """
+
+    def __init__(
+        self,
+        raw_history_days: Optional[float] = 7,
+        rollup_days: Optional[Dict[str, Optional[float]]] = None,
+        seen_alert_days: Optional[float] = 30,
+        batch_size: int = 1000,
+        max_batches: int = 20,
+        vacuum_pages: int = 1000
+    ):
+        """
+        Initialize the retention engine.
+
+        Args:
+            raw_history_days: Days of raw market history to keep (None = forever)
+            rollup_days: Days to keep per rollup resolution (None = forever);
+                defaults to 1m: 30, 1h: 365, 1d: forever
+            seen_alert_days: Days to keep alerts that were seen (None = forever)
+            batch_size: Rows deleted per transaction
+            max_batches: Batches per run, across all tables
+            vacuum_pages: Pages released per incremental vacuum (SQLite only)
+        """
+        self.raw_history_days = raw_history_days
+        self.rollup_days = rollup_days if rollup_days is not None else {"1m": 30, "1h": 365, "1d": None}
+        self.seen_alert_days = seen_alert_days
+        self.batch_size = max(1, batch_size)
+        self.max_batches = max(1, max_batches)
+        self.vacuum_pages = vacuum_pages
+
+    @classmethod
+    def from_env(cls) -> "RetentionEngine":
+        """Build an engine from RETENTION_* / *_RETENTION_DAYS environment variables"""
+        return cls(
+            raw_history_days=_days_from_env("RAW_HISTORY_RETENTION_DAYS", "7"),
+            rollup_days={
+                "1m": _days_from_env("ROLLUP_1M_RETENTION_DAYS", "30"),
+                "1h": _days_from_env("ROLLUP_1H_RETENTION_DAYS", "365"),
+                "1d": _days_from_env("ROLLUP_1D_RETENTION_DAYS", "0"),
+            },
+            seen_alert_days=_days_from_env("SEEN_ALERT_RETENTION_DAYS", "30"),
+            batch_size=int(os.getenv("RETENTION_BATCH_SIZE", "1000")),
+            max_batches=int(os.getenv("RETENTION_MAX_BATCHES", "20")),
+        )
+
+    def _targets(self, now: datetime):
+        """(name, model, filter conditions) for every table tier with a retention period"""
+        targets = []
+
+        if self.raw_history_days:
+            cutoff = now - timedelta(days=self.raw_history_days)
+            targets.append(("market_history", MarketHistory, [MarketHistory.ts < cutoff]))
+
+        for resolution, days in self.rollup_days.items():
+            if days:
+                cutoff = now - timedelta(days=days)
+                targets.append((
+                    f"rollups_{resolution}",
+                    MarketHistoryRollup,
+                    [
+                        MarketHistoryRollup.resolution == resolution,
+                        MarketHistoryRollup.bucket_start < cutoff.replace(tzinfo=None),
+                    ]
+                ))
+
+        if self.seen_alert_days:
+            cutoff = now - timedelta(days=self.seen_alert_days)
+            targets.append(("seen_alerts", Alert, [Alert.seen == True, Alert.ts < cutoff]))
+            # Shared insights go once no alert refers to them any more
+            targets.append((
+                "insights",
+                Insight,
+                [Insight.ts < cutoff, ~exists().where(Alert.insight_id == Insight.id)]
+            ))
+
+        return targets
+
+    def _delete_batch(self, db: Session, model, conditions) -> int:
+        """Delete up to batch_size matching rows in one transaction"""
+        batch_ids = (
+            db.query(model.id)
+            .filter(*conditions)
+            .limit(self.batch_size)
+            .subquery()
+        )
+        deleted = (
+            db.query(model)
+            .filter(model.id.in_(db.query(batch_ids.c.id)))
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        return deleted
+
+    def incremental_vacuum(self, db: Session):
+        """Return freed pages to the OS (SQLite with auto_vacuum=INCREMENTAL)"""
+        if db.get_bind().dialect.name != "sqlite":
+            return
+        db.connection().exec_driver_sql(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})")
+        db.commit()
+
+    async def run(self, db: Session) -> Dict[str, int]:
+        """
+        Delete expired rows, at most max_batches batches in total.
+
+        Yields to the event loop between batches. Anything left over is
+        picked up by the next run.
+
+        Returns:
+            Rows deleted per tier
+        """
+        now = datetime.now(timezone.utc)
+        deleted: Dict[str, int] = {}
+        batches = 0
+
+        try:
+            for name, model, conditions in self._targets(now):
+                deleted[name] = 0
+                while batches < self.max_batches:
+                    count = self._delete_batch(db, model, conditions)
+                    batches += 1
+                    deleted[name] += count
+                    await asyncio.sleep(0)
+                    if count < self.batch_size:
+                        break
+
+            if any(deleted.values()):
+                self.incremental_vacuum(db)
+                logger.info(f"Retention purged {sum(deleted.values())} rows: {deleted}")
+
+        except Exception as e:
+            logger.error(f"Error applying retention: {e}")
+            db.rollback()
+
+        return deleted
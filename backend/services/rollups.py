@@ -0,0 +1,241 @@
+"""
+History rollups - incrementally maintained OHLC buckets of market history
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import MarketHistory, MarketHistoryRollup
+from services.downsample import to_epoch
+
+logger = logging.getLogger(__name__)
+
+# Rollup resolutions and their bucket width in seconds, finest first
+ROLLUP_RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
+
+# History windows up to this long are served from raw rows; longer ones from rollups
+RAW_WINDOW_HOURS = 24
+
+# Buckets per upsert statement; 10 columns x 90 rows stays under SQLite's
+# historical 999 bound-parameter limit
+UPSERT_CHUNK_SIZE = 90
+
+
+def bucket_start(ts: datetime, bucket_seconds: int) -> datetime:
+    """Naive UTC start of the bucket containing ts."""
+    start = int(to_epoch(ts)) // bucket_seconds * bucket_seconds
+    return datetime.fromtimestamp(start, timezone.utc).replace(tzinfo=None)
+
+
+def aggregate_rows(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Aggregate history rows into rollup buckets for every resolution.
+
+    Args:
+        rows: Dicts with market_id, ts, implied_prob, price and volume, in
+            time order per market
+
+    Returns:
+        Rollup bucket dicts ready for upsert_buckets
+    """
+    buckets: Dict[tuple, Dict[str, Any]] = {}
+
+    for row in rows:
+        prob = row["implied_prob"]
+        for resolution, seconds in ROLLUP_RESOLUTIONS.items():
+            key = (row["market_id"], resolution, bucket_start(row["ts"], seconds))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = {
+                    "market_id": key[0],
+                    "resolution": resolution,
+                    "bucket_start": key[2],
+                    "open": prob,
+                    "high": prob,
+                    "low": prob,
+                    "close": prob,
+                    "price": row["price"],
+                    "volume": row["volume"] or 0,
+                    "count": 1,
+                }
+            else:
+                bucket["high"] = max(bucket["high"], prob)
+                bucket["low"] = min(bucket["low"], prob)
+                bucket["close"] = prob
+                bucket["price"] = row["price"]
+                bucket["volume"] = row["volume"] or 0
+                bucket["count"] += 1
+
+    return list(buckets.values())
+
+
+def upsert_buckets(db: Session, buckets: List[Dict[str, Any]]):
+    """
+    Merge buckets into the rollup table without committing.
+
+    New buckets are inserted; existing ones keep their open, widen high/low,
+    take the new close/price/volume and add to count. Buckets must arrive in
+    time order per market.
+    """
+    if not buckets:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        insert, greatest, least = sqlite.insert, func.max, func.min
+    elif dialect == "postgresql":
+        insert, greatest, least = postgresql.insert, func.greatest, func.least
+    else:
+        logger.warning(f"History rollups are not supported on {dialect}; skipping")
+        return
+
+    table = MarketHistoryRollup.__table__
+    for i in range(0, len(buckets), UPSERT_CHUNK_SIZE):
+        stmt = insert(table).values(buckets[i:i + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["market_id", "resolution", "bucket_start"],
+            set_={
+                "high": greatest(table.c.high, stmt.excluded.high),
+                "low": least(table.c.low, stmt.excluded.low),
+                "close": stmt.excluded.close,
+                "price": stmt.excluded.price,
+                "volume": stmt.excluded.volume,
+                "count": table.c.count + stmt.excluded.count,
+            }
+        )
+        db.execute(stmt)
+
+
+def update_rollups(db: Session, rows: List[Dict[str, Any]]):
+    """Fold freshly written history rows into the rollups (caller commits)."""
+    upsert_buckets(db, aggregate_rows(rows))
+
+
+def backfill_rollups(db: Session, batch_size: int = 5000) -> int:
+    """
+    Rebuild every rollup from raw market history.
+
+    Existing rollups are replaced. Rows are streamed in (market_id, ts) order
+    and flushed one market at a time, so memory stays bounded.
+
+    Returns:
+        Number of raw rows processed
+    """
+    db.query(MarketHistoryRollup).delete(synchronize_session=False)
+
+    rows = (
+        db.query(
+            MarketHistory.market_id,
+            MarketHistory.ts,
+            MarketHistory.implied_prob,
+            MarketHistory.price,
+            MarketHistory.volume
+        )
+        .order_by(MarketHistory.market_id, MarketHistory.ts)
+        .yield_per(batch_size)
+    )
+
+    processed = 0
+    pending: List[Dict[str, Any]] = []
+    current_market = None
+    for row in rows:
+        if row.market_id != current_market and pending:
+            upsert_buckets(db, aggregate_rows(pending))
+            pending = []
+        current_market = row.market_id
+        pending.append(row._asdict())
+        processed += 1
+
+    upsert_buckets(db, aggregate_rows(pending))
+    db.commit()
+    return processed
+
+
+def rollups_missing(db: Session) -> bool:
+    """True if there is raw history but no rollups (e.g. history from before rollups existed)."""
+    return (
+        db.query(MarketHistory.id).first() is not None
+        and db.query(MarketHistoryRollup.id).first() is None
+    )
+
+
+def ensure_rollups(db: Session) -> int:
+    """
+    Backfill the rollups if raw history has never been rolled up.
+
+    A no-op once rollups exist, so it is safe to run on every startup.
+
+    Returns:
+        Number of raw rows processed (0 if nothing was backfilled)
+    """
+    if not rollups_missing(db):
+        return 0
+    return backfill_rollups(db)
+
+
+def pick_rollup_resolution(window_hours: float, max_points: int) -> Optional[str]:
+    """
+    Choose the rollup to serve a history window from.
+
+    Returns None for windows short enough to serve from raw rows; otherwise
+    the finest rollup whose bucket count over the window fits in max_points
+    (falling back to the coarsest rollup).
+    """
+    if window_hours <= RAW_WINDOW_HOURS:
+        return None
+
+    window_seconds = window_hours * 3600
+    for resolution, seconds in ROLLUP_RESOLUTIONS.items():
+        if window_seconds / seconds <= max_points:
+            return resolution
+    return list(ROLLUP_RESOLUTIONS)[-1]
+
+
+def source_rollup(bucket_seconds: int) -> Optional[str]:
+    """
+    Coarsest rollup a requested bucket size can be built from.
+
+    Returns None if no rollup's width divides bucket_seconds (e.g. 30s or
+    90s), in which case the buckets can only come from raw rows.
+    """
+    for resolution, seconds in reversed(ROLLUP_RESOLUTIONS.items()):
+        if bucket_seconds % seconds == 0:
+            return resolution
+    return None
+
+
+def rebucket(rows: Iterable[tuple], bucket_seconds: int) -> List[tuple]:
+    """
+    Merge rollup buckets into wider buckets.
+
+    Args:
+        rows: (bucket_start, close, price, volume, open, high, low, count)
+            tuples ordered by bucket_start; bucket_seconds must be a multiple
+            of their width
+        bucket_seconds: Width of the merged buckets
+
+    Returns:
+        Merged tuples of the same shape
+    """
+    merged: List[list] = []
+    current_start = None
+
+    for bucket_start_ts, close, price, volume, open_, high, low, count in rows:
+        start = int(to_epoch(bucket_start_ts)) // bucket_seconds * bucket_seconds
+        if start != current_start:
+            merged_ts = datetime.fromtimestamp(start, timezone.utc).replace(tzinfo=None)
+            merged.append([merged_ts, close, price, volume, open_, high, low, 0])
+            current_start = start
+
+        current = merged[-1]
+        current[1], current[2], current[3] = close, price, volume
+        current[5] = max(current[5], high)
+        current[6] = min(current[6], low)
+        current[7] += count
+
+    return [tuple(bucket) for bucket in merged]
@@ -0,0 +1,106 @@
+"""
+Single-flight - coalesce concurrent identical upstream calls into one request
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+
+class SingleFlight:
+    """
+    Share one in-flight call between concurrent callers asking for the same key.
+
+    The first caller for a key starts the call; callers arriving while it is
+    still running await the same result instead of starting their own. Once
+    the call finishes the key is forgotten, so later callers start fresh.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+        self.calls = 0
+        self.deduplicated = 0
+
+    def _track(self, keys: List[Hashable], task: "asyncio.Future[Any]"):
+        """Register task as the in-flight call for keys until it finishes."""
+        for key in keys:
+            self._in_flight[key] = task
+
+        def forget(finished: "asyncio.Future[Any]"):
+            for key in keys:
+                if self._in_flight.get(key) is finished:
+                    del self._in_flight[key]
+
+        task.add_done_callback(forget)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn() once for all concurrent callers with the same key.
+
+        Args:
+            key: Identity of the call
+            fn: Zero-argument coroutine function making the call
+
+        Returns:
+            The call's result (shared by every caller)
+        """
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.deduplicated += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._track([key], task)
+
+        # Shield so one caller being cancelled doesn't cancel the shared call
+        return await asyncio.shield(task)
+
+    async def do_many(
+        self,
+        keys: List[Hashable],
+        fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+    ) -> Dict[Hashable, Any]:
+        """
+        Batched variant of do() for calls that fetch many keys at once.
+
+        Keys already in flight (from an earlier do_many on this instance) join
+        those calls; the remaining keys are fetched with one fn(keys) call.
+
+        Args:
+            keys: Keys wanted by the caller
+            fn: Coroutine function taking a list of keys and returning a dict
+                keyed by them (keys it could not fetch may be omitted)
+
+        Returns:
+            Results keyed by key (keys nobody could fetch are omitted)
+        """
+        keys = list(dict.fromkeys(keys))
+        tasks = {}
+        missing = []
+        for key in keys:
+            task = self._in_flight.get(key)
+            if task is not None:
+                self.deduplicated += 1
+                tasks[id(task)] = task
+            else:
+                missing.append(key)
+
+        if missing:
+            self.calls += 1
+            task = asyncio.ensure_future(fn(missing))
+            self._track(missing, task)
+            tasks[id(task)] = task
+
+        merged: Dict[Hashable, Any] = {}
+        for result in await asyncio.gather(*(asyncio.shield(task) for task in tasks.values())):
+            merged.update(result)
+
+        return {key: merged[key] for key in keys if key in merged}
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring."""
+        return {
+            "in_flight": len(set(map(id, self._in_flight.values()))),
+            "calls": self.calls,
+            "deduplicated": self.deduplicated,
+        }
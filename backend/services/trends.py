@@ -0,0 +1,81 @@
+"""
+Market trends - per-market move statistics maintained as moves are detected
+"""
+
+from typing import List, Optional
+
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+
+from models import Alert, MarketTrend
+
+# Number of recent moves the trend statistics cover
+TREND_WINDOW = 10
+
+
+def _parse_changes(recent_changes: Optional[str]) -> List[float]:
+    return [float(c) for c in recent_changes.split(",")] if recent_changes else []
+
+
+def _seed_changes(db: Session, market_id: str) -> List[float]:
+    """Last TREND_WINDOW moves from alert history, oldest first (markets with no trend row yet)."""
+    # Alerts are one row per subscriber; a move's alerts share ts and change
+    rows = (
+        db.query(Alert.change_pct)
+        .filter(Alert.market_id == market_id)
+        .group_by(Alert.ts, Alert.change_pct)
+        .order_by(desc(Alert.ts))
+        .limit(TREND_WINDOW)
+        .all()
+    )
+    return [row.change_pct for row in reversed(rows)]
+
+
+def record_move(db: Session, market_id: str, change_pct: float) -> MarketTrend:
+    """
+    Fold a detected move into the market's trend (caller commits).
+
+    Keeps the last TREND_WINDOW signed changes, their up/down counts and their
+    min/max, so the update costs the same however long the market has been
+    tracked.
+    """
+    trend = db.get(MarketTrend, market_id)
+    if trend is None:
+        trend = MarketTrend(market_id=market_id, moves=0)
+        changes = _seed_changes(db, market_id)
+        db.add(trend)
+    else:
+        changes = _parse_changes(trend.recent_changes)
+
+    changes = (changes + [change_pct])[-TREND_WINDOW:]
+
+    trend.moves = (trend.moves or 0) + 1
+    trend.recent_changes = ",".join(f"{c:.4f}" for c in changes)
+    trend.up_count = sum(1 for c in changes if c > 0)
+    trend.down_count = sum(1 for c in changes if c < 0)
+    trend.min_change = min(changes)
+    trend.max_change = max(changes)
+
+    # Sessions don't autoflush; flush so the next lookup finds a new row
+    db.flush()
+    return trend
+
+
+def describe_trend(trend: Optional[MarketTrend]) -> str:
+    """Human-readable trend pattern for insight prompts."""
+    count = len(_parse_changes(trend.recent_changes)) if trend else 0
+    if count < 3:
+        return "Insufficient history (< 3 moves)"
+
+    volatility = trend.max_change - trend.min_change
+
+    if trend.up_count >= count * 0.8:
+        return f"Consistently rising trend ({trend.up_count}/{count} bullish moves)"
+    elif trend.down_count >= count * 0.8:
+        return f"Consistently declining trend ({trend.down_count}/{count} bearish moves)"
+    elif volatility > 30:
+        return f"High volatility (range: {volatility:.1f}% over {count} moves)"
+    elif volatility > 15:
+        return f"Moderate fluctuations (range: {volatility:.1f}% over {count} moves)"
+    else:
+        return f"Stable with minor variations (range: {volatility:.1f}% over {count} moves)"
@@ -0,0 +1,137 @@
+"""
+Unread counters - per-user unread alert counts maintained alongside alert writes
+"""
+
+import logging
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import Alert, AlertCounter, PinnedMarket
+
+logger = logging.getLogger(__name__)
+
+
+def _count_unread(db: Session, user_ids: Iterable[int]) -> Dict[int, int]:
+    """Unread alerts per user counted from the alerts table."""
+    user_ids = list(user_ids)
+    counts = dict(
+        db.query(Alert.user_id, func.count(Alert.id))
+        .filter(Alert.user_id.in_(user_ids), Alert.seen == False)
+        .group_by(Alert.user_id)
+        .all()
+    )
+    return {user_id: counts.get(user_id, 0) for user_id in user_ids}
+
+
+def get_unread_counts(db: Session, user_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Unread alert count per user, read from the maintained counters.
+
+    A user without a counter row yet (new, or from before counters existed)
+    is counted once from the alerts table and the counter row is created;
+    after that reads are a primary-key lookup.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    counts = dict(
+        db.query(AlertCounter.user_id, AlertCounter.unread_count)
+        .filter(AlertCounter.user_id.in_(user_ids))
+        .all()
+    )
+
+    missing = [user_id for user_id in user_ids if user_id not in counts]
+    if missing:
+        initial = _count_unread(db, missing)
+        try:
+            db.add_all(AlertCounter(user_id=user_id, unread_count=count) for user_id, count in initial.items())
+            db.commit()
+            counts.update(initial)
+        except IntegrityError:
+            # Created concurrently (by another reader or an alert fan-out);
+            # the stored rows win
+            db.rollback()
+            counts.update(
+                db.query(AlertCounter.user_id, AlertCounter.unread_count)
+                .filter(AlertCounter.user_id.in_(missing))
+                .all()
+            )
+
+    return {user_id: counts[user_id] for user_id in user_ids}
+
+
+def get_unread_count(db: Session, user_id: int) -> int:
+    """Unread alert count for one user (see get_unread_counts)."""
+    return get_unread_counts(db, [user_id])[user_id]
+
+
+def increment_for_market(db: Session, market_id: str, user_ids: Optional[Iterable[int]] = None):
+    """
+    Add one unread alert for every user who pinned a market, or only for
+    user_ids among them (caller commits, after inserting the alerts).
+
+    Existing counters are incremented. Subscribers without a counter row get
+    one, counted from the alerts table including this alert; if a reader
+    creates the row concurrently, its count (which cannot see the
+    uncommitted alert) is incremented instead.
+    """
+    subscribers = (
+        select(PinnedMarket.user_id)
+        .where(PinnedMarket.market_id == market_id)
+        .group_by(PinnedMarket.user_id)
+    )
+    if user_ids is not None:
+        subscribers = subscribers.where(PinnedMarket.user_id.in_(list(user_ids)))
+    (
+        db.query(AlertCounter)
+        .filter(AlertCounter.user_id.in_(subscribers))
+        .update({AlertCounter.unread_count: AlertCounter.unread_count + 1}, synchronize_session=False)
+    )
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        insert = sqlite.insert
+    elif dialect == "postgresql":
+        insert = postgresql.insert
+    else:
+        logger.warning(f"Unread counter upserts are not supported on {dialect}; new counters start on first read")
+        return
+
+    unread_alerts = (
+        select(func.count(Alert.id))
+        .where(Alert.user_id == PinnedMarket.user_id, Alert.seen == False)
+        .scalar_subquery()
+    )
+    uncounted = (
+        subscribers
+        .add_columns(unread_alerts)
+        .where(~select(AlertCounter.user_id).where(AlertCounter.user_id == PinnedMarket.user_id).exists())
+    )
+    table = AlertCounter.__table__
+    stmt = insert(table).from_select(["user_id", "unread_count"], uncounted)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"unread_count": table.c.unread_count + 1}
+    )
+    db.execute(stmt)
+
+
+def decrement(db: Session, user_id: int, seen: int):
+    """Record that seen of a user's alerts were marked seen (caller commits)."""
+    if seen:
+        (
+            db.query(AlertCounter)
+            .filter(AlertCounter.user_id == user_id)
+            .update({AlertCounter.unread_count: AlertCounter.unread_count - seen}, synchronize_session=False)
+        )
+
+
+def reset(db: Session, user_id: int):
+    """Record that all of a user's alerts were marked seen (caller commits)."""
+    (
+        db.query(AlertCounter)
+        .filter(AlertCounter.user_id == user_id)
+        .update({AlertCounter.unread_count: 0}, synchronize_session=False)
+    )
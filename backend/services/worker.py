@@ -4,28 +4,57 @@ Polling Worker - Periodically fetch market data, detect changes, and create aler
 
 import asyncio
 import os
-from typing import List, Optional
-from datetime import datetime, timedelta, timezone
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+from datetime import datetime, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import Boolean, DateTime, Float, Integer, String, insert, literal, select
 import logging
 
 from database import SessionLocal
-from models import PinnedMarket, MarketHistory, Alert, User
+from models import PinnedMarket, MarketHistory, Alert, Insight, MarketTrend
 from services.polymarket import get_polymarket_service
 from services.insight import get_insight_service
+from services.rollups import ensure_rollups, update_rollups
+from services.data_versions import bump_versions
+from services.retention import RetentionEngine
+from services.hot_window import HotWindow
+from services.insight_cache import InsightCache
+from services.trends import describe_trend, record_move
+from services import unread
+from services.alert_events import publish_insights, publish_new_alerts
+from services.price_hub import get_price_hub, make_tick
 
 logger = logging.getLogger(__name__)
 
 
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    """Split items into lists of at most size elements"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
 class MarketPollingWorker:
     """Worker that polls Polymarket for pinned markets and creates alerts"""
 
+    # Rows per multi-row INSERT; 6 columns x 150 rows stays under SQLite's
+    # historical 999 bound-parameter limit
+    HISTORY_INSERT_CHUNK_SIZE = 150
+    # Market IDs per IN (...) clause
+    QUERY_CHUNK_SIZE = 500
+    # Markets per snapshot fetch (one Gamma bulk request); fetches finished
+    # by the cycle deadline are kept when others run over
+    SNAPSHOT_CHUNK_SIZE = 50
+
     def __init__(
         self,
         poll_interval_sec: int = 300,  # 5 minutes default
         alert_threshold_pct: float = 10.0,  # 10% change threshold
-        window_minutes: int = 60  # Look back 1 hour for comparison
+        window_minutes: int = 60,  # Look back 1 hour for comparison
+        max_concurrency: int = 10,  # Markets polled in parallel
+        cycle_deadline_sec: Optional[float] = None,  # Defaults to poll_interval_sec
+        retention: Optional[RetentionEngine] = None,  # Purge expired data after each cycle
+        insight_cache: Optional[InsightCache] = None,  # Defaults to InsightCache.from_env()
+        insight_batch_size: int = 8  # Moves per Claude request (1 = no batching)
     ):
         """
         Initialize the polling worker.
@@ -34,75 +63,151 @@ class MarketPollingWorker:
             poll_interval_sec: How often to poll (in seconds)
             alert_threshold_pct: Threshold for triggering alerts (percentage change)
             window_minutes: Time window to compare for detecting changes
+            max_concurrency: Maximum number of markets polled at the same time
+            cycle_deadline_sec: Time budget for one polling cycle; markets not
+                finished by then are skipped until the next cycle
+            retention: Retention engine run incrementally after each cycle
+                (disabled if None)
+            insight_cache: Cache of insights reused for similar moves of a market
+            insight_batch_size: Triggered moves explained per Claude request;
+                a cycle's moves are sent together, batch_size at a time
         """
         self.poll_interval = poll_interval_sec
         self.alert_threshold = alert_threshold_pct
         self.window_minutes = window_minutes
+        self.max_concurrency = max(1, max_concurrency)
+        self.cycle_deadline = cycle_deadline_sec if cycle_deadline_sec is not None else poll_interval_sec
+
+        self.retention = retention
+
+        # Recent history per market, so alert baselines need no DB round trip
+        self.hot_window = HotWindow(
+            window_minutes=window_minutes,
+            initial_capacity=window_minutes * 60 // max(1, poll_interval_sec) + 2
+        )
+
+        self.insight_cache = insight_cache or InsightCache.from_env()
+
+        # Background tasks filling in alert insights
+        self._insight_tasks: Set[asyncio.Task] = set()
+        self.insight_batch_size = max(1, insight_batch_size)
+        # Insights collected during a polling cycle, generated together at its end
+        self._insight_batch: Optional[List[tuple]] = None
+
+        # Stats from the most recent polling cycle and retention pass
+        self.last_cycle_stats: Dict[str, Any] = {}
+        self.last_retention_stats: Dict[str, int] = {}
 
         self.polymarket = get_polymarket_service()
         self.insight_service = get_insight_service()
+        self.price_hub = get_price_hub()
 
         logger.info(
             f"MarketPollingWorker initialized: "
             f"interval={poll_interval_sec}s, threshold={alert_threshold_pct}%, "
-            f"window={window_minutes}min"
+            f"window={window_minutes}min, concurrency={self.max_concurrency}, "
+            f"deadline={self.cycle_deadline}s"
         )
 
-    async def poll_market(self, market_id: str, db: Session) -> bool:
+    def store_snapshots(self, snapshots: Dict[str, dict], db: Session) -> int:
         """
-        Poll a single market, store history, and check for alerts.
+        Write a batch of snapshots to market history in one transaction.
+
+        Rows go in with one multi-row INSERT per HISTORY_INSERT_CHUNK_SIZE
+        snapshots and a single commit, instead of a commit per market. The
+        1m/1h/1d rollups and the markets' data versions (which back the API's
+        ETags) are updated in the same transaction. Once committed, the rows
+        are added to the hot window and pushed to price subscribers.
 
         Args:
-            market_id: The Polymarket market ID
+            snapshots: Snapshots keyed by market ID
             db: Database session
 
         Returns:
-            True if successful, False otherwise
+            Number of rows written
         """
+        ts = datetime.now(timezone.utc)
+        rows = [
+            {
+                "market_id": market_id,
+                "ts": ts,
+                "implied_prob": snapshot.get("implied_prob", 50.0),
+                "price": snapshot.get("price", 0.5),
+                "volume": snapshot.get("volume") or 0,
+                "market_title": snapshot.get("question", "Unknown Market"),
+            }
+            for market_id, snapshot in snapshots.items()
+        ]
+        if not rows:
+            return 0
+
         try:
-            # Fetch current market snapshot
-            snapshot = await self.polymarket.get_market_snapshot(market_id)
-            if not snapshot:
-                logger.warning(f"Failed to fetch snapshot for market {market_id}")
-                return False
-
-            market_title = snapshot.get("question", "Unknown Market")
-            implied_prob = snapshot.get("implied_prob", 50.0)
-            price = snapshot.get("price", 0.5)
-            volume = snapshot.get("volume", 0)
-
-            # Store in market history
-            history_entry = MarketHistory(
-                market_id=market_id,
-                ts=datetime.now(timezone.utc),
-                implied_prob=implied_prob,
-                price=price,
-                volume=volume,
-                market_title=market_title
-            )
-            db.add(history_entry)
+            for chunk in _chunks(rows, self.HISTORY_INSERT_CHUNK_SIZE):
+                db.execute(insert(MarketHistory).values(chunk))
+            update_rollups(db, rows)
+            bump_versions(db, snapshots.keys(), ts)
             db.commit()
+        except Exception:
+            db.rollback()
+            raise
 
-            logger.info(
-                f"Stored history for {market_id}: "
-                f"prob={implied_prob:.1f}%, vol={volume:.0f}"
-            )
+        for row in rows:
+            self.hot_window.append(row["market_id"], row["ts"], row["implied_prob"], row["volume"])
+            self.price_hub.publish(make_tick(
+                row["market_id"], row["ts"], row["implied_prob"], row["price"], row["volume"]
+            ))
 
-            # Check for alerts by comparing with historical data
-            await self.check_for_alerts(market_id, snapshot, db)
+        return len(rows)
 
-            return True
+    def warm_hot_window(self, market_ids: List[str], db: Session) -> int:
+        """
+        Load markets the hot window doesn't track yet from market history.
 
-        except Exception as e:
-            logger.error(f"Error polling market {market_id}: {e}")
-            db.rollback()
-            return False
+        Args:
+            market_ids: Markets about to be evaluated
+            db: Database session
+
+        Returns:
+            Number of history points loaded
+        """
+        missing = [market_id for market_id in market_ids if market_id not in self.hot_window]
+        loaded = 0
+        for chunk in _chunks(missing, self.QUERY_CHUNK_SIZE):
+            loaded += self.hot_window.warm(db, chunk)
+
+        if missing:
+            logger.info(f"Warmed hot window for {len(missing)} markets ({loaded} points)")
+        return loaded
+
+    async def load_hot_window(self):
+        """Warm the hot window for every pinned market (at startup)"""
+        db = SessionLocal()
+        try:
+            market_ids = [pm.market_id for pm in db.query(PinnedMarket.market_id).distinct()]
+            self.warm_hot_window(market_ids, db)
+        finally:
+            db.close()
+
+    async def backfill_rollups(self) -> int:
+        """Roll up history written before rollups existed, once (at startup)"""
+        def run() -> int:
+            db = SessionLocal()
+            try:
+                return ensure_rollups(db)
+            finally:
+                db.close()
+
+        processed = await asyncio.to_thread(run)
+        if processed:
+            logger.info(f"Backfilled history rollups from {processed} points")
+        return processed
 
     async def check_for_alerts(
         self,
         market_id: str,
         current_snapshot: dict,
-        db: Session
+        db: Session,
+        old_history: Optional[Any] = None
     ):
         """
         Check if the market has changed significantly and create alerts.
@@ -111,20 +216,12 @@ class MarketPollingWorker:
             market_id: The market ID
             current_snapshot: Current market snapshot
             db: Database session
+            old_history: Oldest point in the window; taken from the hot window
+                if None
         """
         try:
-            # Get historical data from the window
-            window_start = datetime.now(timezone.utc) - timedelta(minutes=self.window_minutes)
-
-            old_history = (
-                db.query(MarketHistory)
-                .filter(
-                    MarketHistory.market_id == market_id,
-                    MarketHistory.ts >= window_start
-                )
-                .order_by(MarketHistory.ts)
-                .first()
-            )
+            if old_history is None:
+                old_history = self.hot_window.baseline(market_id)
 
             if not old_history:
                 logger.debug(f"No historical data for market {market_id} in window")
@@ -143,36 +240,29 @@ class MarketPollingWorker:
                     f"(Δ {change_pct:+.1f}%)"
                 )
 
-                # Get all users who have this market pinned
-                pinned_users = (
-                    db.query(PinnedMarket)
-                    .filter(PinnedMarket.market_id == market_id)
-                    .all()
+                # One shared insight, one alert per subscribed user
+                await self.create_alerts(
+                    market_id=market_id,
+                    market_title=current_snapshot.get("question", "Unknown"),
+                    old_prob=old_prob,
+                    new_prob=new_prob,
+                    change_pct=new_prob - old_prob,  # Signed change
+                    old_snapshot={
+                        "implied_prob": old_prob,
+                        "volume": old_history.volume
+                    },
+                    new_snapshot=current_snapshot,
+                    db=db
                 )
 
-                # Create alerts for each user
-                for pinned in pinned_users:
-                    await self.create_alert(
-                        user_id=pinned.user_id,
-                        market_id=market_id,
-                        market_title=current_snapshot.get("question", "Unknown"),
-                        old_prob=old_prob,
-                        new_prob=new_prob,
-                        change_pct=new_prob - old_prob,  # Signed change
-                        old_snapshot={
-                            "implied_prob": old_prob,
-                            "volume": old_history.volume
-                        },
-                        new_snapshot=current_snapshot,
-                        db=db
-                    )
-
         except Exception as e:
             logger.error(f"Error checking alerts for {market_id}: {e}")
 
     def calculate_long_term_trend(self, market_id: str, db: Session) -> str:
         """
-        Analyze recent alert history to determine long-term trend.
+        Describe the market's long-term trend from its recent moves.
+
+        A single-row read of the market's trend state (see services/trends.py).
 
         Args:
             market_id: Market to analyze
@@ -182,47 +272,13 @@ class MarketPollingWorker:
             String description of trend pattern
         """
         try:
-            # Get last 10 alerts for this market
-            recent_alerts = (
-                db.query(Alert)
-                .filter(Alert.market_id == market_id)
-                .order_by(desc(Alert.ts))
-                .limit(10)
-                .all()
-            )
-
-            if len(recent_alerts) < 3:
-                return "Insufficient history (< 3 alerts)"
-
-            # Analyze change_pct values
-            changes = [alert.change_pct for alert in recent_alerts]
-
-            # Count positive and negative changes
-            positive = sum(1 for c in changes if c > 0)
-            negative = sum(1 for c in changes if c < 0)
-
-            # Calculate volatility
-            volatility = max(changes) - min(changes)
-
-            # Determine trend
-            if positive >= len(changes) * 0.8:
-                return f"Consistently rising trend ({positive}/{len(changes)} bullish alerts)"
-            elif negative >= len(changes) * 0.8:
-                return f"Consistently declining trend ({negative}/{len(changes)} bearish alerts)"
-            elif volatility > 30:
-                return f"High volatility (range: {volatility:.1f}% over {len(changes)} alerts)"
-            elif volatility > 15:
-                return f"Moderate fluctuations (range: {volatility:.1f}% over {len(changes)} alerts)"
-            else:
-                return f"Stable with minor variations (range: {volatility:.1f}% over {len(changes)} alerts)"
-
+            return describe_trend(db.get(MarketTrend, market_id))
         except Exception as e:
             logger.warning(f"Error calculating trend for {market_id}: {e}")
             return "Trend analysis unavailable"
 
-    async def create_alert(
+    async def create_alerts(
         self,
-        user_id: int,
         market_id: str,
         market_title: str,
         old_prob: float,
@@ -230,13 +286,23 @@ class MarketPollingWorker:
         change_pct: float,
         old_snapshot: dict,
         new_snapshot: dict,
-        db: Session
+        db: Session,
+        user_ids: Optional[List[int]] = None
     ):
         """
-        Create an alert with Claude-generated insight.
+        Create alerts for one market move, sharing a single Claude-generated insight.
+
+        Market-level data (trend, insight row) is updated once, and the alert
+        rows for every user who pinned the market are written with a single
+        INSERT ... SELECT from pinned markets, all in one transaction, so the
+        number of statements doesn't grow with the number of subscribers.
+        Subscribers' unread counters are bumped in the same transaction.
+
+        The insight text is generated once, in a background task (see
+        generate_insight_async), and personalized per user when alerts are
+        read. A slow Claude call never holds up polling or the API.
 
         Args:
-            user_id: User to alert
             market_id: Market ID
             market_title: Market title/question
             old_prob: Old probability
@@ -245,82 +311,421 @@ class MarketPollingWorker:
             old_snapshot: Old market snapshot
             new_snapshot: New market snapshot
             db: Database session
+            user_ids: Only alert these subscribers (e.g. the user who just
+                pinned the market); the move isn't recorded in the trend
+
+        Returns:
+            Number of alerts created
         """
         try:
-            # Get user information for personalization
-            user = db.query(User).filter(User.id == user_id).first()
-            user_name = user.email.split('@')[0] if user else "Yash"  # Extract name from email
-
-            # Calculate long-term trend from alert history
+            # Trend from the moves before this one, then fold this one in
             long_term_trend = self.calculate_long_term_trend(market_id, db)
+            if user_ids is None:
+                record_move(db, market_id, change_pct)
 
-            # Generate enhanced insight using Claude
-            insight_text = self.insight_service.generate_insight_from_history(
+            now = datetime.now(timezone.utc)
+            insight = Insight(
+                market_id=market_id,
+                ts=now,
+                market_title=market_title,
+                old_prob=old_prob,
+                new_prob=new_prob,
+                change_pct=change_pct,
+                window_minutes=self.window_minutes
+            )
+            db.add(insight)
+            db.flush()
+
+            # Create an alert for every subscriber in one statement
+            subscribers = (
+                select(
+                    PinnedMarket.user_id,
+                    literal(market_id, String),
+                    literal(now, DateTime),
+                    literal(change_pct, Float),
+                    literal(self.alert_threshold, Float),
+                    literal(market_title, String),
+                    literal(insight.id, Integer),
+                    literal(False, Boolean)
+                )
+                .where(PinnedMarket.market_id == market_id)
+                .group_by(PinnedMarket.user_id)
+            )
+            if user_ids is not None:
+                subscribers = subscribers.where(PinnedMarket.user_id.in_(user_ids))
+            created = db.execute(
+                insert(Alert).from_select(
+                    ["user_id", "market_id", "ts", "change_pct", "threshold",
+                     "market_title", "insight_id", "seen"],
+                    subscribers
+                )
+            ).rowcount
+
+            if not created:
+                db.rollback()
+                return 0
+            unread.increment_for_market(db, market_id, user_ids)
+            db.commit()
+            publish_new_alerts(db, insight.id)
+
+            logger.info(
+                f"Created {created} alerts: "
+                f"{market_title[:40]}... ({change_pct:+.1f}%) | Trend: {long_term_trend[:30]}..."
+            )
+
+            self._schedule_insight(
+                insight.id,
+                market_id,
                 market_title=market_title,
                 old_snapshot=old_snapshot,
                 new_snapshot=new_snapshot,
                 window_minutes=self.window_minutes,
                 time_to_resolution=None,  # TODO: Calculate from market end_date
-                user_name=user_name,
+                user_name=None,  # Personalized when alerts are read
                 signal_summary=None,  # Reserved for future external signal integration
                 long_term_trend=long_term_trend,
             )
+            return created
 
-            # Create alert
-            alert = Alert(
-                user_id=user_id,
-                market_id=market_id,
-                ts=datetime.now(timezone.utc),
-                change_pct=change_pct,
-                threshold=self.alert_threshold,
-                market_title=market_title,
-                insight_text=insight_text,
-                seen=False
-            )
+        except Exception as e:
+            logger.error(f"Error creating alerts: {e}")
+            db.rollback()
+            return 0
+
+    def _schedule_insight(self, insight_id: int, market_id: str, **insight_args):
+        """Generate an insight's text in the background (batched with the cycle's others)"""
+        job = (insight_id, market_id, insight_args)
+        if self._insight_batch is not None:
+            self._insight_batch.append(job)
+        else:
+            self._start_insight_task([job])
+
+    def _start_insight_task(self, jobs: List[tuple]):
+        task = asyncio.create_task(self._fill_insights(jobs))
+        self._insight_tasks.add(task)
+        task.add_done_callback(self._insight_tasks.discard)
+
+    async def _fill_insights(self, jobs: List[tuple]):
+        """
+        Store insight texts on already-persisted insight rows.
 
-            db.add(alert)
-            db.commit()
-
-            logger.info(
-                f"Created alert for {user_name}: "
-                f"{market_title[:40]}... ({change_pct:+.1f}%) | Trend: {long_term_trend[:30]}..."
-            )
+        A text comes from the insight cache when a similar move of the market
+        was explained recently, and from Claude (then cached) otherwise. No
+        database session is open while Claude is awaited. Cache failures only
+        cost reuse: texts are stored and published before new ones are cached.
 
+        Args:
+            jobs: (insight_id, market_id, insight arguments) per insight
+        """
+        keyed = [
+            (insight_id, market_id, insight_args, self.insight_cache.key(
+                market_id,
+                insight_args["old_snapshot"].get("implied_prob", 0),
+                insight_args["new_snapshot"].get("implied_prob", 0)
+            ))
+            for insight_id, market_id, insight_args in jobs
+        ]
+        texts = {}
+        misses = []
+
+        # Cache lookups in a short-lived session: no pooled connection is
+        # held while waiting on Claude
+        db = SessionLocal()
+        try:
+            for i, job in enumerate(keyed):
+                insight_text = self.insight_cache.get(db, job[3])
+                if insight_text is None:
+                    misses.append(job)
+                else:
+                    texts[job[0]] = insight_text
         except Exception as e:
-            logger.error(f"Error creating alert: {e}")
+            logger.error(f"Error reading insight cache for {[job[0] for job in jobs]}: {e}")
             db.rollback()
+            misses.extend(keyed[i:])
+        finally:
+            db.close()
+
+        generated = []
+        if misses:
+            try:
+                generated = await self._generate_insights([insight_args for _, _, insight_args, _ in misses])
+            except Exception as e:
+                logger.error(f"Error generating insights {[job[0] for job in misses]}: {e}")
+
+        new_entries = []
+        for (insight_id, market_id, _, cache_key), insight_text in zip(misses, generated):
+            if insight_text:
+                texts[insight_id] = insight_text
+                new_entries.append((cache_key, market_id, insight_text))
+
+        if not texts:
+            return
 
-    async def poll_all_markets(self):
-        """Poll all pinned markets across all users"""
         db = SessionLocal()
+        try:
+            try:
+                for insight_id, insight_text in texts.items():
+                    db.query(Insight).filter(Insight.id == insight_id).update({"text": insight_text})
+                db.commit()
+                publish_insights(db, list(texts))
+            except Exception as e:
+                logger.error(f"Error storing insights {list(texts)}: {e}")
+                db.rollback()
+                return
+
+            try:
+                self.insight_cache.set_many(db, new_entries)
+            except Exception as e:
+                logger.error(f"Error caching insights {list(texts)}: {e}")
+                db.rollback()
+        finally:
+            db.close()
+
+    async def _generate_insights(self, insight_args: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """Insight text per move: batched prompts if enabled, else one request per move"""
+        if self.insight_batch_size > 1 and len(insight_args) > 1:
+            moves = [self.insight_service.history_args(**args) for args in insight_args]
+            return await self.insight_service.generate_insights_batch_async(moves, self.insight_batch_size)
+
+        return list(await asyncio.gather(*(
+            self.insight_service.generate_insight_from_history_async(**args)
+            for args in insight_args
+        )))
+
+    async def drain_insights(self, timeout: Optional[float] = None) -> int:
+        """
+        Wait for pending insights to be filled in.
+
+        Returns:
+            Number of insights still pending after timeout
+        """
+        if not self._insight_tasks:
+            return 0
+        _, pending = await asyncio.wait(set(self._insight_tasks), timeout=timeout)
+        return len(pending)
+
+    def cancel_insights(self):
+        """Cancel pending insight generation (insights keep no text)"""
+        for task in list(self._insight_tasks):
+            task.cancel()
+
+    def is_significant_move(self, old_prob: float, current_snapshot: dict) -> bool:
+        """True if the snapshot moved at least alert_threshold from old_prob"""
+        return abs(current_snapshot.get("implied_prob", 50.0) - old_prob) >= self.alert_threshold
+
+    async def _alert_market_limited(
+        self,
+        market_id: str,
+        snapshot: dict,
+        baseline: Any,
+        semaphore: asyncio.Semaphore
+    ):
+        """Create alerts for one market under the concurrency limit, using its own DB session"""
+        async with semaphore:
+            db = SessionLocal()
+            try:
+                await self.check_for_alerts(market_id, snapshot, db, old_history=baseline)
+            finally:
+                db.close()
+
+    def _time_left(self, started: float) -> Optional[float]:
+        """Seconds left before the cycle deadline (None if there is none)"""
+        if not self.cycle_deadline:
+            return None
+        return max(0.0, self.cycle_deadline - (time.monotonic() - started))
+
+    async def fetch_snapshots(self, market_ids: List[str], started: float) -> Tuple[Dict[str, dict], List[str]]:
+        """
+        Fetch snapshots in SNAPSHOT_CHUNK_SIZE chunks until the cycle deadline.
+
+        At most max_concurrency upstream requests are in flight across all
+        chunks. Chunks still running at the deadline are cancelled.
+
+        Returns:
+            (snapshots keyed by market ID, market IDs skipped by the deadline)
+        """
+        chunks = _chunks(market_ids, self.SNAPSHOT_CHUNK_SIZE)
+        in_flight = min(len(chunks), self.max_concurrency)
+        semaphore = asyncio.Semaphore(in_flight)
+
+        async def fetch(chunk: List[str]) -> Dict[str, dict]:
+            async with semaphore:
+                return await self.polymarket.get_market_snapshots(
+                    chunk, max_concurrency=max(1, self.max_concurrency // in_flight)
+                )
+
+        tasks = {asyncio.create_task(fetch(chunk)): chunk for chunk in chunks}
+        done, pending = await asyncio.wait(tasks, timeout=self._time_left(started))
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        snapshots: Dict[str, dict] = {}
+        for task in done:
+            if task.exception():
+                logger.error(f"Error fetching snapshots for {len(tasks[task])} markets: {task.exception()}")
+            else:
+                snapshots.update(task.result())
+        skipped = [market_id for task in pending for market_id in tasks[task]]
+        return snapshots, skipped
+
+    async def poll_all_markets(self) -> Dict[str, Any]:
+        """
+        Poll all pinned markets across all users.
+
+        One cycle:
+        1. Fetch snapshots for every market with batched upstream requests,
+           in chunks of SNAPSHOT_CHUNK_SIZE markets
+        2. Take each market's alert-window baseline from the hot window (markets
+           seen for the first time are loaded from history in one query)
+        3. Write all snapshots to market history in a single transaction
+        4. Compare the in-memory batch against the baselines and create alerts
+           for markets that moved, concurrently (at most max_concurrency in
+           flight, each with its own DB session)
+        5. Generate the insights for those alerts in the background, with
+           insight_batch_size moves per Claude request
+
+        Work not finished when the cycle deadline passes is skipped until the
+        next cycle: markets whose snapshot fetch ran over are not written
+        (skipped), and alert checks still running are cancelled
+        (alerts_skipped).
+
+        Returns:
+            Cycle stats: markets, succeeded (fetched and written), failed,
+            skipped, alerts_triggered, alerts_skipped, rows_written,
+            rows_per_sec, duration_sec
+        """
+        started = time.monotonic()
+        stats: Dict[str, Any] = {
+            "markets": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "skipped": 0,
+            "alerts_triggered": 0,
+            "alerts_skipped": 0,
+            "rows_written": 0,
+            "rows_per_sec": 0.0,
+            "duration_sec": 0.0,
+        }
 
         try:
-            # Get all unique pinned market IDs
-            pinned_markets = (
-                db.query(PinnedMarket.market_id)
-                .distinct()
-                .all()
-            )
+            db = SessionLocal()
+            try:
+                # Get all unique pinned market IDs
+                pinned_markets = (
+                    db.query(PinnedMarket.market_id)
+                    .distinct()
+                    .all()
+                )
+            finally:
+                db.close()
 
             market_ids = [pm.market_id for pm in pinned_markets]
+            stats["markets"] = len(market_ids)
+            self.hot_window.retain(market_ids)
+            self.price_hub.retain(market_ids)
 
             if not market_ids:
                 logger.info("No pinned markets to poll")
-                return
+                return stats
 
             logger.info(f"Polling {len(market_ids)} pinned markets")
 
-            # Poll each market
-            for market_id in market_ids:
-                await self.poll_market(market_id, db)
+            snapshots, skipped = await self.fetch_snapshots(market_ids, started)
+            stats["skipped"] = len(skipped)
+            if skipped:
+                logger.warning(f"Snapshot fetch for {len(skipped)} markets exceeded {self.cycle_deadline}s cycle deadline")
 
-            logger.info(f"Completed polling {len(market_ids)} markets")
+            snapshots = {market_id: snapshot for market_id, snapshot in snapshots.items() if snapshot}
+            stats["failed"] = len(market_ids) - len(skipped) - len(snapshots)
+            if stats["failed"]:
+                logger.warning(f"Failed to fetch snapshots for {stats['failed']} markets")
+            if not snapshots:
+                return stats
+
+            db = SessionLocal()
+            try:
+                # Baselines are taken before this cycle's rows are written, so
+                # alerts compare the in-memory batch against existing history
+                self.warm_hot_window(list(snapshots), db)
+                now = datetime.now(timezone.utc)
+                baselines = {}
+                for market_id in snapshots:
+                    baseline = self.hot_window.baseline(market_id, now)
+                    if baseline is not None:
+                        baselines[market_id] = baseline
+
+                write_started = time.monotonic()
+                stats["rows_written"] = self.store_snapshots(snapshots, db)
+                write_sec = time.monotonic() - write_started
+            finally:
+                db.close()
+
+            stats["succeeded"] = len(snapshots)
+            stats["rows_per_sec"] = round(stats["rows_written"] / write_sec, 1) if write_sec > 0 else 0.0
+            logger.info(
+                f"Stored {stats['rows_written']} history rows in {write_sec * 1000:.1f}ms "
+                f"({stats['rows_per_sec']:.0f} rows/s)"
+            )
+
+            triggered = [
+                (market_id, snapshot, baselines[market_id])
+                for market_id, snapshot in snapshots.items()
+                if market_id in baselines
+                and self.is_significant_move(baselines[market_id].implied_prob, snapshot)
+            ]
+            stats["alerts_triggered"] = len(triggered)
+
+            if triggered:
+                # Insights for the cycle's alerts are collected and generated together
+                self._insight_batch = []
+                try:
+                    semaphore = asyncio.Semaphore(self.max_concurrency)
+                    tasks = [
+                        asyncio.create_task(self._alert_market_limited(market_id, snapshot, baseline, semaphore))
+                        for market_id, snapshot, baseline in triggered
+                    ]
+
+                    done, pending = await asyncio.wait(tasks, timeout=self._time_left(started))
+
+                    # Anything still running past the deadline is skipped this cycle
+                    for task in pending:
+                        task.cancel()
+                    if pending:
+                        await asyncio.gather(*pending, return_exceptions=True)
+                    stats["alerts_skipped"] = len(pending)
+                finally:
+                    jobs, self._insight_batch = self._insight_batch, None
+                    if jobs:
+                        self._start_insight_task(jobs)
 
         except Exception as e:
             logger.error(f"Error in poll_all_markets: {e}")
+        finally:
+            stats["duration_sec"] = round(time.monotonic() - started, 3)
+            self.last_cycle_stats = stats
+
+        logger.info(
+            f"Completed polling {stats['markets']} markets in {stats['duration_sec']:.2f}s: "
+            f"{stats['succeeded']} ok, {stats['failed']} failed, {stats['skipped']} skipped, "
+            f"{stats['alerts_triggered']} alerts triggered ({stats['alerts_skipped']} skipped)"
+        )
+        return stats
+
+    async def apply_retention(self) -> Dict[str, int]:
+        """Run one incremental retention pass (a bounded number of small batches)"""
+        if not self.retention:
+            return {}
+
+        db = SessionLocal()
+        try:
+            self.last_retention_stats = await self.retention.run(db)
         finally:
             db.close()
 
+        return self.last_retention_stats
+
     async def run_once(self):
         """Run one polling cycle (for testing)"""
         await self.poll_all_markets()
@@ -328,11 +733,23 @@ class MarketPollingWorker:
     async def start(self):
         """Start the polling loop"""
         logger.info("Starting market polling worker")
+        try:
+            await self.backfill_rollups()
+        except Exception as e:
+            # Long windows fall back to raw rows until the rollups exist
+            logger.error(f"Error backfilling history rollups: {e}")
+        await self.load_hot_window()
 
         while True:
             try:
+                started = time.monotonic()
                 await self.poll_all_markets()
-                await asyncio.sleep(self.poll_interval)
+                await self.apply_retention()
+                # Keep a steady cadence: sleep for whatever is left of the interval
+                await asyncio.sleep(max(0.0, self.poll_interval - (time.monotonic() - started)))
+            except asyncio.CancelledError:
+                self.cancel_insights()
+                raise
             except Exception as e:
                 logger.error(f"Error in polling loop: {e}")
                 await asyncio.sleep(60)  # Wait 1 minute before retry
@@ -353,10 +770,18 @@ def get_worker(
         # Get config from environment
         interval = poll_interval_sec or int(os.getenv("POLL_INTERVAL_SEC", "300"))
         threshold = alert_threshold_pct or float(os.getenv("ALERT_THRESHOLD_PCT", "10.0"))
+        concurrency = int(os.getenv("POLL_CONCURRENCY", "10"))
+        deadline = os.getenv("POLL_CYCLE_DEADLINE_SEC")
+        retention_enabled = os.getenv("RETENTION_ENABLED", "true").lower() == "true"
+        insight_batch_size = int(os.getenv("INSIGHT_BATCH_SIZE", "8"))
 
         _worker = MarketPollingWorker(
             poll_interval_sec=interval,
-            alert_threshold_pct=threshold
+            alert_threshold_pct=threshold,
+            max_concurrency=concurrency,
+            cycle_deadline_sec=float(deadline) if deadline else None,
+            retention=RetentionEngine.from_env() if retention_enabled else None,
+            insight_batch_size=insight_batch_size
         )
 
     return _worker
@@ -1,7 +1,9 @@
 import os
 import sys
+import json
+import asyncio
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 BACKEND_ROOT = Path(__file__).resolve().parents[1]
 sys.path.append(str(BACKEND_ROOT))
@@ -12,9 +14,18 @@ os.environ["ENABLE_WORKER"] = "false"
 from fastapi.testclient import TestClient
 import pytest
 
+from sqlalchemy import create_engine, event, inspect
+
 from main import app
-from database import SessionLocal, init_db, drop_db
-from models import User, PinnedMarket, MarketHistory, Alert
+import database
+from database import SessionLocal, engine, init_db, drop_db
+from models import User, PinnedMarket, MarketHistory, MarketHistoryRollup, Alert, AlertCounter, Insight
+from services import alert_events, unread
+from services.alert_events import AlertBroker, alert_event_stream, publish_insights, publish_new_alerts
+from services.data_versions import bump_versions, time_bucket
+from services.price_hub import PriceHub, PriceSubscriber, get_price_hub, make_tick
+from services.rollups import backfill_rollups
+from services.worker import MarketPollingWorker
 import routes
 
 
@@ -109,6 +120,36 @@ def test_pin_market_creates_new_record(client, db_session):
     assert stored is not None
 
 
+def test_pin_market_creates_initial_alert_for_pinning_user_only(client, db_session, monkeypatch):
+    class FakePolymarketService:
+        async def resolve_market_input(self, market_input):
+            return market_input, None, None, False
+
+        async def get_market_snapshot(self, market_id):
+            return {"implied_prob": 62.0, "price": 0.62, "volume": 1000, "question": "New Market"}
+
+    db = db_session["session"]
+    user_id = db_session["user_id"]
+    other = User(email="other@example.com")
+    db.add(other)
+    db.flush()
+    db.add(PinnedMarket(user_id=other.id, market_id="market-new"))
+    db.commit()
+
+    worker = MarketPollingWorker()
+    scheduled = []
+    worker._schedule_insight = lambda insight_id, market_id, **args: scheduled.append(insight_id)
+    monkeypatch.setattr(routes, "get_polymarket_service", lambda: FakePolymarketService())
+    monkeypatch.setattr(routes, "get_worker", lambda: worker)
+
+    response = client.post("/api/pin", json={"userId": user_id, "marketId": "market-new"})
+    assert response.status_code == 200
+
+    alerts = db.query(Alert).filter(Alert.market_id == "market-new").all()
+    assert [(a.user_id, a.market_title, a.change_pct) for a in alerts] == [(user_id, "New Market", 0.0)]
+    assert scheduled == [alerts[0].insight_id]
+
+
 def test_get_pinned_markets_returns_latest_snapshot(client, db_session):
     response = client.get(f"/api/pinned?userId={db_session['user_id']}")
 
@@ -222,3 +263,652 @@ def test_event_endpoint_with_slug(client, monkeypatch):
     assert len(payload["markets"]) == 3
     assert payload["markets"][0]["question"] == "Will it get over 50M views?"
     assert payload["markets"][1]["question"] == "Will it get 40-50M views?"
+
+
+def capture_selects(fn):
+    """Run fn and return the (statement, parameters) of every SELECT it executed."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def query_plan(statement, parameters):
+    """EXPLAIN QUERY PLAN output for a captured statement, as one string."""
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return " | ".join(row[-1] for row in rows)
+
+
+def test_init_db_adds_missing_indexes_to_existing_tables(db_session):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_market_history_market_id_ts")
+        conn.exec_driver_sql("DROP INDEX ix_alerts_user_id_seen_ts")
+
+    init_db()
+    init_db()  # idempotent
+
+    inspector = inspect(engine)
+    assert "ix_market_history_market_id_ts" in {i["name"] for i in inspector.get_indexes("market_history")}
+    assert "ix_alerts_user_id_seen_ts" in {i["name"] for i in inspector.get_indexes("alerts")}
+
+
+def test_hot_queries_use_composite_indexes(client, db_session):
+    user_id = db_session["user_id"]
+    market_id = db_session["market_id"]
+
+    def run_routes():
+        assert client.get(f"/api/pinned?userId={user_id}").status_code == 200
+        assert client.get(f"/api/market/{market_id}?hours=24").status_code == 200
+        assert client.get(f"/api/alerts?userId={user_id}").status_code == 200
+        assert client.get(f"/api/alerts?userId={user_id}&unread_only=true").status_code == 200
+
+    statements = capture_selects(run_routes)
+
+    history_queries = [s for s in statements if "FROM market_history" in s[0]]
+    alert_queries = [s for s in statements if "FROM alerts" in s[0]]
+    assert history_queries and alert_queries
+
+    for statement, parameters in history_queries:
+        assert "ix_market_history_market_id_ts" in query_plan(statement, parameters), statement
+    for statement, parameters in alert_queries:
+        plan = query_plan(statement, parameters)
+        assert "ix_alerts_user_id_seen_ts" in plan or "ix_alerts_user_id_ts_id" in plan, statement
+
+
+def test_get_pinned_markets_query_count_is_flat(client, db_session):
+    db = db_session["session"]
+    user_id = db_session["user_id"]
+
+    def pinned_selects():
+        return capture_selects(
+            lambda: client.get(f"/api/pinned?userId={user_id}").raise_for_status()
+        )
+
+    baseline = len(pinned_selects())
+
+    now = datetime.utcnow()
+    for i in range(10):
+        market_id = f"market-{i}"
+        db.add(PinnedMarket(user_id=user_id, market_id=market_id))
+        db.add(MarketHistory(
+            market_id=market_id,
+            ts=now,
+            implied_prob=10.0 + i,
+            price=(10.0 + i) / 100,
+            volume=100,
+            market_title=f"Market {i}",
+        ))
+    db.commit()
+
+    assert len(pinned_selects()) == baseline
+
+    payload = client.get(f"/api/pinned?userId={user_id}").json()
+    assert payload["total"] == 11
+    by_market = {item["market_id"]: item for item in payload["items"]}
+    assert by_market["market-3"]["latest_prob"] == pytest.approx(13.0)
+    assert len(by_market["market-abc"]["history"]) == 2
+
+
+def seed_dense_history(db, market_id="market-dense", points=600):
+    """Add one history row per minute, ending now, with a spike in the middle."""
+    now = datetime.utcnow()
+    db.add_all(
+        MarketHistory(
+            market_id=market_id,
+            ts=now - timedelta(minutes=points - 1 - i),
+            implied_prob=90.0 if i == points // 2 else 40.0 + (i % 7),
+            price=0.4,
+            volume=1000 + i,
+            market_title="Dense Market",
+        )
+        for i in range(points)
+    )
+    db.commit()
+    return market_id
+
+
+def test_pinned_and_market_detail_answer_conditional_requests(client, db_session, monkeypatch):
+    db = db_session["session"]
+    user_id = db_session["user_id"]
+    market_id = db_session["market_id"]
+    bump_versions(db, [market_id], datetime.utcnow())
+    db.commit()
+
+    for url in (f"/api/pinned?userId={user_id}", f"/api/market/{market_id}?hours=24"):
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+        # Weak, since gzipped and identity bodies share it
+        assert etag.startswith('W/"')
+
+        # A current copy costs no history query
+        responses = []
+        statements = capture_selects(lambda: responses.append(client.get(url, headers={"If-None-Match": etag})))
+        not_modified = responses[0]
+        assert not_modified.status_code == 304
+        assert not_modified.headers["etag"] == etag
+        assert not_modified.content == b""
+        assert not [s for s, _ in statements if "market_history" in s]
+
+        # New snapshots change the ETag
+        bump_versions(db, [market_id], datetime.utcnow())
+        db.commit()
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+    # The ETag depends on the query, and on the user's pins
+    detail = client.get(f"/api/market/{market_id}?hours=24").headers["etag"]
+    assert client.get(f"/api/market/{market_id}?hours=48").headers["etag"] != detail
+    pinned = client.get(f"/api/pinned?userId={user_id}").headers["etag"]
+    db.add(PinnedMarket(user_id=user_id, market_id="market-xyz"))
+    db.commit()
+    assert client.get(f"/api/pinned?userId={user_id}", headers={"If-None-Match": pinned}).status_code == 200
+
+    # ...and on the poll interval, since the history window slides
+    detail = client.get(f"/api/market/{market_id}?hours=24").headers["etag"]
+    monkeypatch.setattr(routes, "time_bucket", lambda: time_bucket() + 1)
+    assert client.get(f"/api/market/{market_id}?hours=24", headers={"If-None-Match": detail}).status_code == 200
+
+
+def test_market_detail_downsamples_with_lttb(client, db_session):
+    market_id = seed_dense_history(db_session["session"])
+
+    payload = client.get(f"/api/market/{market_id}?hours=24&max_points=50").json()
+
+    assert payload["data_points"] == 600
+    assert payload["resolution"] == "lttb"
+    assert len(payload["history"]) == 50
+    # LTTB keeps the spike
+    assert max(p["implied_prob"] for p in payload["history"]) == pytest.approx(90.0)
+
+
+def test_market_detail_buckets_into_ohlc(client, db_session):
+    market_id = seed_dense_history(db_session["session"])
+
+    payload = client.get(f"/api/market/{market_id}?hours=24&resolution=1h").json()
+
+    assert payload["data_points"] == 600
+    assert payload["resolution"] == "1h"
+    assert 10 <= len(payload["history"]) <= 11
+    assert max(p["prob_high"] for p in payload["history"]) == pytest.approx(90.0)
+    assert all(p["prob_low"] <= p["implied_prob"] <= p["prob_high"] for p in payload["history"])
+
+    assert client.get(f"/api/market/{market_id}?resolution=often").status_code == 400
+
+
+def test_market_detail_columnar_format(client, db_session):
+    market_id = seed_dense_history(db_session["session"])
+    url = f"/api/market/{market_id}?hours=24"
+
+    rows = client.get(url).json()
+    response = client.get(url + "&format=columnar")
+    columnar = response.json()
+
+    # Same points as parallel arrays, title once, timestamps in epoch ms
+    assert columnar["format"] == "columnar"
+    assert columnar["market_title"] == "Dense Market"
+    assert columnar["data_points"] == 600
+    history = columnar["history"]
+    assert set(history) == {"ts", "prob", "price", "volume"}
+    assert history["prob"] == [p["implied_prob"] for p in rows["history"]]
+    assert history["volume"] == [p["volume"] for p in rows["history"]]
+    assert history["ts"][0] == int(datetime.fromisoformat(rows["history"][0]["ts"] + "+00:00").timestamp() * 1000)
+    assert columnar["latest"]["prob"] == rows["latest"]["implied_prob"]
+
+    # Several times smaller, and gzipped on the wire
+    assert len(json.dumps(rows)) > 3 * len(json.dumps(columnar))
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.num_bytes_downloaded < len(response.content)
+
+    bucketed = client.get(url + "&resolution=30m&format=columnar").json()["history"]
+    assert max(bucketed["prob_high"]) == pytest.approx(90.0)
+
+    # Each format has its own ETag
+    assert client.get(url).headers["etag"] != response.headers["etag"]
+    assert client.get(url + "&format=xml").status_code == 422
+
+
+def test_pinned_markets_columnar_format(client, db_session):
+    user_id = db_session["user_id"]
+
+    rows = client.get(f"/api/pinned?userId={user_id}").json()["items"][0]
+    columnar = client.get(f"/api/pinned?userId={user_id}&format=columnar").json()
+
+    assert columnar["format"] == "columnar"
+    assert columnar["total"] == 1
+    item = columnar["items"][0]
+    assert item["market_title"] == rows["market_title"] == "Test Market"
+    assert item["change_pct"] == pytest.approx(rows["change_pct"])
+    assert item["history"]["prob"] == [p["implied_prob"] for p in rows["history"]] == [48.0, 55.0]
+    assert item["history"]["price"] == [0.48, 0.55]
+    assert len(item["history"]["ts"]) == 2
+
+
+def test_long_windows_without_rollups_are_bucketed_from_raw_rows(client, db_session):
+    market_id = seed_dense_history(db_session["session"])
+
+    payload = client.get(f"/api/market/{market_id}?hours=48").json()
+
+    assert payload["resolution"] == "1h"
+    assert payload["data_points"] == 600
+    assert 10 <= len(payload["history"]) <= 11
+    assert max(p["prob_high"] for p in payload["history"]) == pytest.approx(90.0)
+
+
+def test_long_windows_are_served_from_rollups(client, db_session):
+    db = db_session["session"]
+    market_id = seed_dense_history(db)
+    assert backfill_rollups(db) == 602  # dense market + the two fixture rows
+
+    payload = client.get(f"/api/market/{market_id}?hours=48").json()
+
+    assert payload["resolution"] == "1h"
+    assert payload["data_points"] == 600
+    assert 10 <= len(payload["history"]) <= 11
+    assert max(p["prob_high"] for p in payload["history"]) == pytest.approx(90.0)
+
+    minute = client.get(f"/api/market/{market_id}?hours=48&resolution=1m").json()
+    assert minute["resolution"] == "1m"
+    assert len(minute["history"]) == 600
+
+    # Backfill replaces rather than double-counts
+    backfill_rollups(db)
+    daily = (
+        db.query(MarketHistoryRollup)
+        .filter(MarketHistoryRollup.market_id == market_id, MarketHistoryRollup.resolution == "1d")
+        .all()
+    )
+    assert sum(bucket.count for bucket in daily) == 600
+
+
+def test_long_windows_merge_rollups_for_other_resolutions(client, db_session):
+    db = db_session["session"]
+    market_id = seed_dense_history(db)
+    backfill_rollups(db)
+    expected = client.get(f"/api/market/{market_id}?hours=24&resolution=5m").json()
+
+    # Raw rows past retention are gone; 5m buckets come from the 1m rollups
+    db.query(MarketHistory).filter(MarketHistory.market_id == market_id).delete()
+    db.commit()
+    payload = client.get(f"/api/market/{market_id}?hours=48&resolution=5m").json()
+
+    assert payload["resolution"] == "5m"
+    assert payload["data_points"] == 600
+    assert len(payload["history"]) == len(expected["history"])
+    for merged, bucketed in zip(payload["history"], expected["history"]):
+        assert merged["ts"] == bucketed["ts"]
+        for field in ("implied_prob", "prob_open", "prob_high", "prob_low", "volume"):
+            assert merged[field] == pytest.approx(bucketed[field])
+
+    # No rollup can build 30s buckets
+    assert client.get(f"/api/market/{market_id}?hours=48&resolution=30s").status_code == 400
+    assert client.get(f"/api/market/{market_id}?hours=24&resolution=30s").status_code == 200
+
+
+def test_alerts_personalize_shared_insight(client, db_session):
+    db = db_session["session"]
+    insight = Insight(
+        market_id="market-abc",
+        market_title="Test Market",
+        old_prob=48.0,
+        new_prob=55.0,
+        change_pct=7.0,
+        window_minutes=60,
+        text="Volume picked up after the announcement.",
+    )
+    db.add(insight)
+    db.flush()
+    db.add(Alert(
+        user_id=db_session["user_id"],
+        market_id="market-abc",
+        change_pct=7.0,
+        threshold=5.0,
+        insight_id=insight.id,
+        seen=False,
+    ))
+    db.commit()
+
+    response = client.get("/api/alerts", params={"userId": db_session["user_id"]})
+
+    assert response.status_code == 200
+    texts = sorted(a["insight_text"] for a in response.json()["alerts"])
+    assert texts == [
+        "Hi tester, here's what moved this market: Volume picked up after the announcement.",
+        "Sample insight",
+    ]
+
+
+def test_init_db_adds_missing_columns_to_existing_tables(db_session):
+    # An alerts table from before shared insights
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE alerts")
+        conn.exec_driver_sql(
+            "CREATE TABLE alerts (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+            "market_id VARCHAR NOT NULL, ts DATETIME, change_pct FLOAT NOT NULL, "
+            "threshold FLOAT NOT NULL, market_title VARCHAR, insight_text TEXT, seen BOOLEAN)"
+        )
+
+    init_db()
+    init_db()  # idempotent
+
+    inspector = inspect(engine)
+    assert "insight_id" in {c["name"] for c in inspector.get_columns("alerts")}
+    assert "ix_alerts_insight_id" in {i["name"] for i in inspector.get_indexes("alerts")}
+
+
+def test_init_db_leaves_vacuum_of_existing_databases_to_maintenance(tmp_path, monkeypatch, caplog):
+    def auto_vacuum():
+        with database.engine.connect() as conn:
+            return conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+
+    # An existing database from before incremental vacuum: warned about, not rewritten
+    monkeypatch.setattr(database, "engine", create_engine(f"sqlite:///{tmp_path / 'old.db'}"))
+    with database.engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE legacy (id INTEGER PRIMARY KEY)")
+    database.init_db()
+    assert auto_vacuum() == 0
+    assert "--enable-incremental-vacuum" in caplog.text
+
+    database.enable_incremental_vacuum()
+    assert auto_vacuum() == 2
+
+    # A new database is created with it
+    monkeypatch.setattr(database, "engine", create_engine(f"sqlite:///{tmp_path / 'new.db'}"))
+    database.init_db()
+    assert auto_vacuum() == 2
+
+
+def test_alert_stream_pushes_alerts_and_resumes(db_session):
+    db = db_session["session"]
+    user_id = db_session["user_id"]
+    first_alert_id = db.query(Alert.id).scalar()
+    broker = AlertBroker()
+
+    def parse(message):
+        fields = dict(line.split(": ", 1) for line in message.strip().splitlines())
+        return fields.get("id"), fields["event"], json.loads(fields["data"])
+
+    def add_move():
+        insight = Insight(
+            market_id="market-abc", market_title="Test Market", old_prob=48.0,
+            new_prob=55.0, change_pct=7.0, window_minutes=60,
+        )
+        db.add(insight)
+        db.flush()
+        alert = Alert(
+            user_id=user_id, market_id="market-abc", change_pct=7.0,
+            threshold=5.0, insight_id=insight.id, seen=False,
+        )
+        db.add(alert)
+        unread.increment_for_market(db, "market-abc")
+        db.commit()
+        return insight.id, alert.id
+
+    async def run():
+        stream = alert_event_stream(user_id, broker=broker, heartbeat_sec=0.05)
+        assert parse(await stream.__anext__())[1:] == ("unread", {"type": "unread", "unread_count": 1})
+
+        # Idle streams only send keep-alive comments and run no queries
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            assert await stream.__anext__() == ": keep-alive\n\n"
+            assert await stream.__anext__() == ": keep-alive\n\n"
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert statements == []
+
+        insight_id, alert_id = add_move()
+        publish_new_alerts(db, insight_id, broker)
+        event_id, event_type, data = parse(await stream.__anext__())
+        assert (event_id, event_type, data["alert"]["id"]) == (str(alert_id), "alert", alert_id)
+        assert parse(await stream.__anext__())[2]["unread_count"] == 2
+        await stream.aclose()
+        assert broker.stats()["streams"] == 0
+
+        # Reconnecting from the first alert replays what came after it
+        resumed = alert_event_stream(user_id, last_id=first_alert_id, broker=broker, heartbeat_sec=0.05)
+        event_id, event_type, _ = parse(await resumed.__anext__())
+        assert (event_id, event_type) == (str(alert_id), "alert")
+        assert parse(await resumed.__anext__())[1] == "unread"
+        await resumed.aclose()
+
+    asyncio.run(run())
+
+
+def test_alert_stream_resync_resends_insights_and_pages_the_replay(db_session, monkeypatch):
+    monkeypatch.setattr(alert_events, "REPLAY_LIMIT", 2)
+    db = db_session["session"]
+    user_id = db_session["user_id"]
+    broker = AlertBroker(queue_size=2)
+
+    def parse(message):
+        fields = dict(line.split(": ", 1) for line in message.strip().splitlines())
+        return fields["event"], json.loads(fields["data"])
+
+    def add_move():
+        insight = Insight(
+            market_id="market-abc", market_title="Test Market", old_prob=48.0,
+            new_prob=55.0, change_pct=7.0, window_minutes=60,
+        )
+        db.add(insight)
+        db.flush()
+        alert = Alert(
+            user_id=user_id, market_id="market-abc", change_pct=7.0,
+            threshold=5.0, insight_id=insight.id, seen=False,
+        )
+        db.add(alert)
+        unread.increment_for_market(db, "market-abc")
+        db.commit()
+        return insight, alert.id
+
+    async def run():
+        stream = alert_event_stream(user_id, broker=broker, heartbeat_sec=0.05)
+        assert parse(await stream.__anext__())[0] == "unread"
+
+        first, first_alert_id = add_move()
+        publish_new_alerts(db, first.id, broker)
+        assert parse(await stream.__anext__())[1]["alert"]["id"] == first_alert_id
+        assert parse(await stream.__anext__())[0] == "unread"
+
+        # The late insight and three new alerts overflow the queue
+        first.text = "Late insight"
+        db.commit()
+        publish_insights(db, [first.id], broker)
+        moves = [add_move() for _ in range(3)]
+        publish_new_alerts(db, moves[0][0].id, broker)
+        assert broker.stats()["resyncs"] == 1
+
+        events = [parse(await stream.__anext__()) for _ in range(5)]
+        await stream.aclose()
+        return first_alert_id, [alert_id for _, alert_id in moves], events
+
+    first_alert_id, new_alert_ids, events = asyncio.run(run())
+
+    kind, data = events[0]
+    assert (kind, data["alert_id"]) == ("insight", first_alert_id)
+    assert data["insight_text"].endswith("Late insight")
+    # All three missed alerts, though each replay query returns at most two
+    assert [data["alert"]["id"] for kind, data in events[1:4]] == new_alert_ids
+    assert events[4] == ("unread", {"type": "unread", "unread_count": 5})
+
+
+def test_alert_stream_rejects_unknown_user(client, db_session):
+    response = client.get("/api/alerts/stream", params={"userId": 9999})
+    assert response.status_code == 404
+
+
+def add_alerts(db, user_id, count, seen=False):
+    """Add alerts one minute apart (the last newest) plus one sharing the newest ts."""
+    base = datetime.utcnow() - timedelta(hours=1)
+    alerts = [
+        Alert(user_id=user_id, market_id="market-abc", ts=base + timedelta(minutes=i),
+              change_pct=6.0, threshold=5.0, seen=seen)
+        for i in range(count)
+    ]
+    alerts.append(Alert(user_id=user_id, market_id="market-abc", ts=alerts[-1].ts,
+                        change_pct=6.0, threshold=5.0, seen=seen))
+    db.add_all(alerts)
+    db.commit()
+    return [a.id for a in alerts]
+
+
+def test_alerts_keyset_pagination(client, db_session):
+    user_id = db_session["user_id"]
+    add_alerts(db_session["session"], user_id, 6)  # 7 alerts plus the fixture's 1
+
+    ids, cursor, pages = [], None, 0
+    while True:
+        url = f"/api/alerts?userId={user_id}&limit=3" + (f"&before={cursor}" if cursor else "")
+        payload = client.get(url).json()
+        ids += [a["id"] for a in payload["alerts"]]
+        pages += 1
+        cursor = payload["next_cursor"]
+        if cursor is None:
+            break
+
+    # Newest first, ties on ts broken by id, no gaps or repeats
+    assert pages == 3
+    assert len(ids) == len(set(ids)) == 8
+    all_alerts = client.get(f"/api/alerts?userId={user_id}&limit=100").json()["alerts"]
+    assert ids == [a["id"] for a in all_alerts]
+
+    # Paging back with "after" returns the newer page in the same order
+    first = client.get(f"/api/alerts?userId={user_id}&limit=3").json()
+    second = client.get(f"/api/alerts?userId={user_id}&limit=3&before={first['next_cursor']}").json()
+    newer = client.get(f"/api/alerts?userId={user_id}&limit=3&after={second['prev_cursor']}").json()
+    assert [a["id"] for a in newer["alerts"]] == ids[:3]
+    assert newer["has_newer"] is False
+    assert newer["next_cursor"] == first["next_cursor"]
+
+    # Whether an "after" page has older alerts is looked up, not assumed
+    client.patch(f"/api/alerts/mark-all-seen?userId={user_id}")
+    db_session["session"].add_all(
+        Alert(user_id=user_id, market_id="market-abc", ts=datetime.utcnow(), change_pct=6.0, threshold=5.0)
+        for _ in range(2)
+    )
+    db_session["session"].commit()
+    unread_page = client.get(f"/api/alerts?userId={user_id}&unread_only=true&after={first['prev_cursor']}").json()
+    assert len(unread_page["alerts"]) == 2
+    assert unread_page["next_cursor"] is None
+
+    assert client.get(f"/api/alerts?userId={user_id}&before=not-a-cursor").status_code == 400
+
+
+def test_unread_counter_is_maintained(client, db_session):
+    db = db_session["session"]
+    user_id = db_session["user_id"]
+    alert_id = db.query(Alert.id).scalar()
+
+    assert client.get(f"/api/alerts?userId={user_id}").json()["unread_count"] == 1
+    assert db.get(AlertCounter, user_id).unread_count == 1
+
+    # Marking the same alert twice decrements once
+    assert client.patch(f"/api/alerts/{alert_id}/mark-seen").status_code == 200
+    assert client.patch(f"/api/alerts/{alert_id}/mark-seen").status_code == 200
+    db.expire_all()
+    assert db.get(AlertCounter, user_id).unread_count == 0
+
+    # Once initialized, reading the count doesn't scan alerts
+    statements = capture_selects(lambda: client.get(f"/api/alerts?userId={user_id}"))
+    assert not [s for s, _ in statements if "count(" in s.lower()]
+
+
+def test_unread_counter_created_concurrently_keeps_stored_row(db_session, monkeypatch):
+    db = db_session["session"]
+    user_id = db_session["user_id"]
+    count_unread = unread._count_unread
+
+    def count_then_race(db, user_ids):
+        counts = count_unread(db, user_ids)
+        # An alert fan-out creates the row (counting its new alert) meanwhile
+        other = SessionLocal()
+        other.add(AlertCounter(user_id=user_id, unread_count=counts[user_id] + 1))
+        other.commit()
+        other.close()
+        return counts
+
+    monkeypatch.setattr(unread, "_count_unread", count_then_race)
+    assert unread.get_unread_count(db, user_id) == 2
+
+
+def test_bulk_mark_seen(client, db_session):
+    db = db_session["session"]
+    user_id = db_session["user_id"]
+    add_alerts(db, user_id, 4)  # 5 alerts plus the fixture's 1
+    assert client.get(f"/api/alerts?userId={user_id}").json()["unread_count"] == 6
+
+    # Mark the second page and everything older
+    first = client.get(f"/api/alerts?userId={user_id}&limit=2").json()
+    up_to = client.get(f"/api/alerts?userId={user_id}&limit=2&before={first['next_cursor']}").json()["prev_cursor"]
+    response = client.patch(f"/api/alerts/mark-seen?userId={user_id}&up_to={up_to}")
+    assert response.status_code == 200
+    assert response.json()["message"] == "Marked 4 alerts as seen"
+
+    payload = client.get(f"/api/alerts?userId={user_id}&unread_only=true").json()
+    assert payload["unread_count"] == 2
+    assert [a["id"] for a in payload["alerts"]] == [a["id"] for a in first["alerts"]]
+
+    response = client.patch(f"/api/alerts/mark-all-seen?userId={user_id}")
+    assert response.json()["message"] == "Marked 2 alerts as seen"
+    assert client.get(f"/api/alerts?userId={user_id}").json()["unread_count"] == 0
+    assert db.query(Alert).filter(Alert.seen == False).count() == 0
+
+    assert client.patch("/api/alerts/mark-all-seen?userId=999").status_code == 404
+
+
+def test_price_hub_coalesces_per_market():
+    hub = PriceHub()
+    ts = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    async def run():
+        slow, other = PriceSubscriber(), PriceSubscriber()
+        hub.subscribe(slow, ["m1", "m2"])
+        hub.subscribe(other, ["m3"])
+
+        for prob in (50.0, 51.0, 52.0):
+            hub.publish(make_tick("m1", ts, prob, prob / 100, 10))
+        hub.publish(make_tick("m2", ts, 30.0, 0.3, None))
+
+        batch = await slow.next_batch()
+        assert {m: t["prob"] for m, t in batch.items()} == {"m1": 52.0, "m2": 30.0}
+        assert batch["m1"]["ts"] == 1704067200000
+        assert other._pending == {}
+
+        hub.unsubscribe(slow)
+        hub.publish(make_tick("m1", ts, 53.0, 0.53, 10))
+        return hub.stats()
+
+    stats = asyncio.run(run())
+    # Ticks only reached m1/m2's subscriber; two m1 ticks were superseded
+    assert stats == {"markets": 1, "subscribers": 1, "published": 4, "coalesced": 2}
+
+
+def test_price_websocket_sends_latest_tick_on_subscribe(client):
+    get_price_hub().publish(make_tick("market-abc", datetime(2024, 1, 1, tzinfo=timezone.utc), 55.0, 0.55, 17500))
+
+    with client.websocket_connect("/api/ws/prices") as ws:
+        ws.send_text("not json")
+        assert ws.receive_json()["type"] == "error"
+
+        ws.send_json({"action": "subscribe", "market_ids": ["market-abc"]})
+        message = ws.receive_json()
+
+    assert message == {
+        "type": "ticks",
+        "ticks": [{"market_id": "market-abc", "ts": 1704067200000, "prob": 55.0, "price": 0.55, "volume": 17500}],
+    }
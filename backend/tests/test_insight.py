@@ -0,0 +1,135 @@
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(BACKEND_ROOT))
+
+import httpx
+from anthropic import AsyncAnthropic
+
+from services.insight import BATCH_SYSTEM_PROMPT, InsightService
+
+
+def make_service(handler, **kwargs) -> InsightService:
+    """InsightService whose async client talks to a fake Claude endpoint."""
+    service = InsightService(api_key="test-key", **kwargs)
+    service.async_client = AsyncAnthropic(
+        api_key="test-key",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        max_retries=0,
+    )
+    return service
+
+
+def message_response(text: str) -> httpx.Response:
+    return httpx.Response(200, json={
+        "id": "msg_test",
+        "type": "message",
+        "role": "assistant",
+        "model": "claude-3-haiku-20240307",
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 10, "output_tokens": 10},
+    })
+
+
+def test_generate_insight_async_limits_concurrency():
+    in_flight = 0
+    max_in_flight = 0
+
+    async def handler(request):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return message_response("Drivers, risks, not financial advice.")
+
+    service = make_service(handler, max_concurrency=2, timeout_sec=5)
+
+    async def run():
+        return await asyncio.gather(*(
+            service.generate_insight_async(f"Market {i}", 40.0, 55.0, 15.0, 60)
+            for i in range(6)
+        ))
+
+    results = asyncio.run(run())
+
+    assert results == ["Drivers, risks, not financial advice."] * 6
+    assert max_in_flight == 2
+
+
+def test_generate_insight_async_times_out():
+    async def handler(request):
+        await asyncio.sleep(1)
+        return message_response("too late")
+
+    service = make_service(handler, timeout_sec=0.1)
+
+    result = asyncio.run(service.generate_insight_from_history_async(
+        "Market", {"implied_prob": 40.0, "volume": 100}, {"implied_prob": 55.0, "volume": 150}, 60
+    ))
+
+    assert result is None
+
+
+def test_generate_insight_async_disabled_without_api_key(monkeypatch):
+    monkeypatch.delenv("CLAUDE_API_KEY", raising=False)
+    service = InsightService()
+
+    assert asyncio.run(service.generate_insight_async("Market", 40.0, 55.0, 15.0, 60)) is None
+
+
+def test_generate_insights_batch_async_sends_one_request_per_batch():
+    requests = []
+
+    async def handler(request):
+        body = json.loads(request.content)
+        requests.append(body)
+        ids = [int(line[1:line.index("]")]) for line in body["messages"][0]["content"].splitlines() if line.startswith("[")]
+        reply = {"insights": [{"id": i, "insight": f"Insight {i}"} for i in ids]}
+        return message_response(f"```json\n{json.dumps(reply)}\n```")
+
+    service = make_service(handler, max_concurrency=4, timeout_sec=5)
+    moves = [
+        service.history_args(
+            f"Market {i}", {"implied_prob": 40.0, "volume": 100}, {"implied_prob": 55.0, "volume": 150},
+            60, None, None, None, None
+        )
+        for i in range(10)
+    ]
+
+    results = asyncio.run(service.generate_insights_batch_async(moves, batch_size=4))
+
+    assert len(requests) == 3
+    assert results == [f"Insight {i % 4 + 1}" for i in range(8)] + ["Insight 1", "Insight 2"]
+    # The same system prompt on every request
+    assert all(r["system"] == BATCH_SYSTEM_PROMPT for r in requests)
+    assert 'Market: "Market 0"' in requests[0]["messages"][0]["content"]
+
+
+def test_generate_insights_batch_async_retries_left_out_moves_alone():
+    requests = []
+
+    async def handler(request):
+        body = json.loads(request.content)
+        requests.append(body)
+        if body["system"] == BATCH_SYSTEM_PROMPT:
+            return message_response(json.dumps({"insights": [{"id": 1, "insight": "Batched"}]}))
+        return message_response("Single")
+
+    service = make_service(handler, timeout_sec=5)
+    moves = [
+        service.history_args(
+            f"Market {i}", {"implied_prob": 40.0}, {"implied_prob": 55.0}, 60, None, None, None, None
+        )
+        for i in range(3)
+    ]
+
+    results = asyncio.run(service.generate_insights_batch_async(moves, batch_size=3))
+
+    assert results == ["Batched", "Single", "Single"]
+    assert len(requests) == 3
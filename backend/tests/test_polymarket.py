@@ -0,0 +1,312 @@
+import sys
+import asyncio
+from datetime import datetime, timezone
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(BACKEND_ROOT))
+
+import httpx
+import pytest
+
+from services.cache import FieldTTLCache
+from services.polymarket import PolymarketService
+
+
+def make_service(handler, **kwargs) -> PolymarketService:
+    """Build a PolymarketService whose HTTP client is served by handler."""
+    service = PolymarketService(**kwargs)
+    service.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return service
+
+
+def run_with_service(handler, scenario, **kwargs):
+    """Run the coroutine function scenario(service) against make_service(handler), then close it."""
+    async def run():
+        service = make_service(handler, **kwargs)
+        try:
+            return await scenario(service)
+        finally:
+            await service.close()
+
+    return asyncio.run(run())
+
+
+def test_get_markets_bulk_chunks_ids_into_multi_id_queries():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        ids = request.url.params.get_list("id")
+        return httpx.Response(200, json=[{"id": market_id, "question": f"Q{market_id}"} for market_id in ids])
+
+    markets = run_with_service(handler, lambda service: service.get_markets_bulk([str(i) for i in range(120)]))
+
+    assert len(markets) == 120
+    assert markets["7"]["question"] == "Q7"
+    assert len(requests) == 3  # ceil(120 / 50)
+
+
+def test_snapshot_uses_gamma_prices_without_calling_clob():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=[{
+            "id": "42",
+            "question": "Will it rain?",
+            "outcomePrices": "[\"0.62\", \"0.38\"]",
+            "clobTokenIds": "[\"tok-yes\", \"tok-no\"]",
+            "volume24hrClob": 1234,
+        }])
+
+    snapshot = run_with_service(handler, lambda service: service.get_market_snapshot("42"))
+
+    assert snapshot["implied_prob"] == 62.0
+    assert snapshot["price_source"] == "gamma"
+    assert [r.url.host for r in requests] == ["gamma-api.polymarket.com"]
+
+
+def test_snapshot_falls_back_to_clob_when_gamma_price_is_stale():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.host == "clob.polymarket.com":
+            return httpx.Response(200, json={"tok-yes": "0.7"})
+        return httpx.Response(200, json=[{
+            "id": "42",
+            "question": "Will it rain?",
+            "outcomePrices": "[\"0.62\", \"0.38\"]",
+            "clobTokenIds": "[\"tok-yes\", \"tok-no\"]",
+            "updatedAt": "2020-01-01T00:00:00Z",
+        }])
+
+    snapshot = run_with_service(handler, lambda service: service.get_market_snapshot("42"))
+
+    assert snapshot["price"] == 0.7
+    assert snapshot["price_source"] == "clob"
+
+
+def test_get_prices_bulk_uses_midpoints_then_short_history_window():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path == "/midpoints":
+            return httpx.Response(200, json={"tok-1": "0.25", "tok-2": "0.5"})
+        return httpx.Response(200, json={"history": [{"t": 1, "p": 0.1}, {"t": 2, "p": 0.9}]})
+
+    prices = run_with_service(handler, lambda service: service.get_prices_bulk(["tok-1", "tok-2", "tok-3"]))
+
+    assert prices == {"tok-1": 0.25, "tok-2": 0.5, "tok-3": 0.9}
+    history_request = requests[-1]
+    assert history_request.url.path == "/prices-history"
+    assert "startTs" in history_request.url.params
+    assert "interval" not in history_request.url.params
+
+
+def test_market_cache_serves_repeat_snapshots_until_invalidated():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=[{
+            "id": "42",
+            "question": "Will it rain?",
+            "outcomePrices": "[\"0.62\", \"0.38\"]",
+        }])
+
+    async def scenario(service):
+        await service.get_market_snapshot("42")
+        await service.get_market_snapshot("42")
+        metadata = await service.get_market_metadata("42")
+        service.invalidate_market("42")
+        await service.get_market_snapshot("42")
+        return service, metadata
+
+    service, metadata = run_with_service(handler, scenario)
+
+    assert metadata["question"] == "Will it rain?"
+    assert len(requests) == 2
+    stats = service.cache_stats()["markets"]
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+
+
+def test_field_ttl_cache_expires_volatile_fields_first():
+    now = [0.0]
+    cache = FieldTTLCache({"question": 100, "price": 10}, maxsize=2, clock=lambda: now[0])
+    cache.set_fields("a", {"question": "Q", "price": 0.5})
+
+    now[0] = 20
+    assert cache.get_fields("a") is None
+    assert cache.get_fields("a", ["question"]) == {"question": "Q"}
+
+    cache.set_fields("b", {"question": "Q"})
+    cache.set_fields("c", {"question": "Q"})
+    assert "a" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_prices_are_refreshed_from_clob_without_refetching_gamma():
+    requests = []
+    volume = [1234]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        if request.url.path == "/midpoints":
+            return httpx.Response(200, json={"tok-yes": "0.7"})
+        return httpx.Response(200, json=[{
+            "id": "42",
+            "question": "Will it rain?",
+            "description": "Not cached",
+            "outcomePrices": "[\"0.62\", \"0.38\"]",
+            "clobTokenIds": "[\"tok-yes\", \"tok-no\"]",
+            "volume24hrClob": volume[0],
+            "closed": False,
+            "updatedAt": datetime.now(timezone.utc).isoformat(),
+        }])
+
+    now = [0.0]
+
+    async def scenario(service):
+        service.market_cache._clock = lambda: now[0]
+        fetched = (await service.get_markets_bulk(["42"]))["42"]
+        now[0] = 20  # prices expired, everything else fresh
+        refreshed = (await service.get_markets_bulk(["42"]))["42"]
+        snapshot = await service.get_market_snapshot("42")
+        volume[0] = 5678
+        now[0] = 55  # volume and status expired; the re-price didn't extend them
+        refetched = (await service.get_markets_bulk(["42"]))["42"]
+        return fetched, refreshed, snapshot, refetched, service.cache_stats()["markets"]
+
+    fetched, refreshed, snapshot, refetched, stats = run_with_service(
+        handler, scenario, metadata_ttl_sec=100, volatile_ttl_sec=50, price_ttl_sec=10
+    )
+
+    # Gamma, then CLOB alone, then Gamma again; the snapshot within the price TTL is a hit
+    assert requests == ["/markets", "/midpoints", "/markets"]
+    assert set(fetched) == set(refreshed)
+    assert "description" not in fetched
+    assert refreshed["outcomePrices"] == [0.7, pytest.approx(0.3)]
+    assert snapshot["implied_prob"] == pytest.approx(70.0)
+    assert refetched["volume24hrClob"] == 5678
+    assert stats["price_refreshes"] == 1
+
+
+def test_resolve_slug_is_cached_including_not_found():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        slug = request.url.params.get("slug")
+        if request.url.path == "/events" and slug == "election":
+            return httpx.Response(200, json=[{
+                "id": "900",
+                "title": "Election",
+                "markets": [{"id": "901", "active": True, "closed": False}],
+            }])
+        return httpx.Response(200, json=[])
+
+    async def scenario(service):
+        first = await service.resolve_market_input("election")
+        second = await service.resolve_market_input("election")
+        missing = await service.resolve_market_input("no-such-market")
+        missing_again = await service.resolve_market_input("no-such-market")
+        return first, second, missing, missing_again
+
+    first, second, missing, missing_again = run_with_service(handler, scenario)
+
+    assert first == ("901", "900", "Election", True)
+    assert second == first
+    assert missing == missing_again == (None, None, None, False)
+    # Market and event lookups once per distinct slug, nothing for repeats
+    assert len(requests) == 4
+
+
+def test_check_if_event_caches_the_resolution():
+    requests = []
+    election = {"id": "900", "title": "Election", "markets": []}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        if request.url.path == "/events/900":
+            return httpx.Response(200, json=election)
+        if request.url.params.get("slug") == "election":
+            return httpx.Response(200, json=[election])
+        if request.url.path.startswith("/events/"):
+            return httpx.Response(404)
+        return httpx.Response(200, json=[])
+
+    async def scenario(service):
+        first = await service.check_if_event("election")
+        requests.clear()
+        again = await service.check_if_event("election")
+        missing = await service.check_if_event("no-such-event")
+        return first, again, missing, service.resolution_cache.get(("event", "election"))
+
+    first, again, missing, cached = run_with_service(handler, scenario)
+
+    assert first == again == election
+    assert missing is None
+    assert cached == ("900", "Election", True)
+    # A repeat is one direct request for current data, not three lookups
+    assert requests[0] == "/events/900"
+    assert len(requests) == 4
+
+
+def test_failed_lookups_are_not_negatively_cached():
+    gamma_up = [False]
+    election = {"id": "900", "title": "Election", "markets": [{"id": "901", "active": True, "closed": False}]}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if not gamma_up[0]:
+            return httpx.Response(503)
+        if request.url.path == "/events/900":
+            return httpx.Response(200, json=election)
+        if request.url.path == "/events" and request.url.params.get("slug") == "election":
+            return httpx.Response(200, json=[election])
+        if request.url.path.startswith("/events/"):
+            return httpx.Response(404)
+        return httpx.Response(200, json=[])
+
+    async def scenario(service):
+        during = (await service.resolve_market_input("election"), await service.check_if_event("election"))
+        gamma_up[0] = True
+        after = (await service.resolve_market_input("election"), await service.check_if_event("election"))
+        return during, after
+
+    during, after = run_with_service(handler, scenario)
+
+    # An outage looks like "not found" to the caller but isn't remembered
+    assert during == ((None, None, None, False), None)
+    assert after == (("901", "900", "Election", True), election)
+
+
+def test_concurrent_identical_requests_share_one_upstream_call():
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        await asyncio.sleep(0.05)
+        ids = request.url.params.get_list("id")
+        return httpx.Response(200, json=[{"id": market_id, "outcomePrices": "[\"0.5\", \"0.5\"]"} for market_id in ids])
+
+    async def scenario(service):
+        snapshots = await asyncio.gather(*(service.get_market_snapshot("1") for _ in range(5)))
+        overlapping = await asyncio.gather(
+            service.get_markets_bulk(["2", "3"]),
+            service.get_markets_bulk(["3", "4"]),
+        )
+        return service, snapshots, overlapping
+
+    service, snapshots, overlapping = run_with_service(handler, scenario)
+
+    assert all(snapshot["implied_prob"] == 50.0 for snapshot in snapshots)
+    assert set(overlapping[1]) == {"3", "4"}
+    # One request for market 1, one for [2, 3] and one for just [4]
+    assert [r.url.params.get_list("id") for r in requests] == [["1"], ["2", "3"], ["4"]]
+    stats = service.singleflight_stats()
+    assert stats["requests"]["deduplicated"] == 4
+    assert stats["markets"]["deduplicated"] == 1
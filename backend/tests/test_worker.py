@@ -0,0 +1,656 @@
+import os
+import re
+import sys
+import asyncio
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(BACKEND_ROOT))
+
+os.environ["DATABASE_URL"] = "sqlite:///./test_api.db"
+os.environ["ENABLE_WORKER"] = "false"
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal, engine, init_db, drop_db
+from models import User, PinnedMarket, MarketHistory, MarketHistoryRollup, Alert, AlertCounter, Insight, MarketTrend
+from services import unread
+from services.data_versions import get_versions
+from services.hot_window import HotWindow
+from services.insight_cache import InsightCache
+from services.retention import RetentionEngine
+from services.trends import TREND_WINDOW, describe_trend, record_move
+from services.worker import MarketPollingWorker
+
+
+class FakePolymarketService:
+    """Returns a fixed snapshot after a simulated upstream delay."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_market_snapshot(self, market_id: str):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return {
+            "market_id": market_id,
+            "question": f"Market {market_id}",
+            "implied_prob": 50.0,
+            "price": 0.5,
+            "volume": 1000,
+        }
+
+    async def get_market_snapshots(self, market_ids, max_concurrency=None):
+        semaphore = asyncio.Semaphore(max_concurrency or len(market_ids))
+
+        async def fetch(market_id):
+            async with semaphore:
+                return await self.get_market_snapshot(market_id)
+
+        snapshots = await asyncio.gather(*(fetch(m) for m in market_ids))
+        return dict(zip(market_ids, snapshots))
+
+
+@pytest.fixture
+def pinned_market_ids():
+    """Reset the database with one user pinning twenty markets."""
+    drop_db()
+    init_db()
+    db = SessionLocal()
+
+    user = User(email="worker@example.com")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+
+    market_ids = [f"market-{i}" for i in range(20)]
+    db.add_all(PinnedMarket(user_id=user.id, market_id=m) for m in market_ids)
+    db.commit()
+    db.close()
+
+    return market_ids
+
+
+def test_poll_all_markets_runs_concurrently(pinned_market_ids):
+    worker = MarketPollingWorker(max_concurrency=5, cycle_deadline_sec=10)
+    worker.polymarket = FakePolymarketService(delay=0.05)
+
+    stats = asyncio.run(worker.poll_all_markets())
+
+    assert stats["markets"] == len(pinned_market_ids)
+    assert stats["succeeded"] == len(pinned_market_ids)
+    assert stats["skipped"] == 0
+    # Fetched five at a time, not one by one
+    assert worker.polymarket.max_in_flight == 5
+
+    db = SessionLocal()
+    assert db.query(MarketHistory).count() == len(pinned_market_ids)
+    rollups = db.query(MarketHistoryRollup).filter(MarketHistoryRollup.market_id == "market-0").all()
+    assert sorted(r.resolution for r in rollups) == ["1d", "1h", "1m"]
+    assert all(r.count == 1 and r.close == 50.0 for r in rollups)
+    db.close()
+
+    # Stored snapshots are pushed to the price hub
+    assert {m: t["prob"] for m, t in worker.price_hub._latest.items()} == {m: 50.0 for m in pinned_market_ids}
+
+
+def test_poll_all_markets_skips_markets_past_deadline(pinned_market_ids):
+    worker = MarketPollingWorker(max_concurrency=5, cycle_deadline_sec=0.1)
+    worker.polymarket = FakePolymarketService(delay=1.0)
+
+    stats = asyncio.run(worker.poll_all_markets())
+
+    assert stats["skipped"] == len(pinned_market_ids)
+    assert stats["succeeded"] == 0
+    assert worker.last_cycle_stats == stats
+
+
+def test_poll_all_markets_keeps_snapshots_fetched_before_deadline(pinned_market_ids):
+    slow = set(pinned_market_ids[15:])
+
+    class PartlySlowService(FakePolymarketService):
+        async def get_market_snapshot(self, market_id: str):
+            self.delay = 1.0 if market_id in slow else 0.01
+            return await super().get_market_snapshot(market_id)
+
+    worker = MarketPollingWorker(max_concurrency=20, cycle_deadline_sec=0.5)
+    worker.SNAPSHOT_CHUNK_SIZE = 1
+    worker.polymarket = PartlySlowService(delay=0.01)
+
+    stats = asyncio.run(worker.poll_all_markets())
+
+    # Only the slow markets missed the deadline
+    assert (stats["succeeded"], stats["failed"], stats["skipped"]) == (15, 0, 5)
+    db = SessionLocal()
+    assert {row.market_id for row in db.query(MarketHistory.market_id)} == set(pinned_market_ids[:15])
+    db.close()
+
+
+def test_poll_all_markets_writes_batch_and_alerts_from_baselines(pinned_market_ids):
+    db = SessionLocal()
+    db.add(MarketHistory(
+        market_id=pinned_market_ids[0],
+        ts=datetime.now(timezone.utc) - timedelta(minutes=10),
+        implied_prob=40.0,
+        price=0.4,
+        volume=900,
+        market_title="Market 0",
+    ))
+    db.commit()
+    db.close()
+
+    worker = MarketPollingWorker(alert_threshold_pct=5.0, max_concurrency=5, cycle_deadline_sec=10)
+    worker.polymarket = FakePolymarketService(delay=0)
+
+    stats = asyncio.run(worker.poll_all_markets())
+
+    assert stats["rows_written"] == len(pinned_market_ids)
+    assert stats["rows_per_sec"] > 0
+    assert stats["alerts_triggered"] == 1
+
+    db = SessionLocal()
+    alerts = db.query(Alert).all()
+    assert [(a.market_id, a.change_pct) for a in alerts] == [(pinned_market_ids[0], 10.0)]
+    db.close()
+
+    # Every written market's data version is bumped, once per cycle
+    asyncio.run(worker.poll_all_markets())
+    db = SessionLocal()
+    versions = get_versions(db, pinned_market_ids)
+    assert {version for version, _ in versions.values()} == {2}
+    db.close()
+
+
+def test_retention_purges_expired_rows_in_batches(pinned_market_ids):
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    user_id = db.query(User.id).scalar()
+    for days_ago in (1, 10, 11, 12):
+        db.add(MarketHistory(
+            market_id="market-0", ts=now - timedelta(days=days_ago),
+            implied_prob=50.0, price=0.5, volume=0,
+        ))
+    for resolution, days_ago in (("1m", 40), ("1m", 1), ("1d", 900)):
+        db.add(MarketHistoryRollup(
+            market_id="market-0", resolution=resolution,
+            bucket_start=(now - timedelta(days=days_ago)).replace(tzinfo=None),
+            open=50.0, high=50.0, low=50.0, close=50.0, price=0.5, count=1,
+        ))
+    for seen in (True, False):
+        db.add(Alert(
+            user_id=user_id, market_id="market-0", ts=now - timedelta(days=60),
+            change_pct=5.0, threshold=3.0, seen=seen,
+        ))
+    db.commit()
+
+    retention = RetentionEngine(batch_size=2)
+    deleted = asyncio.run(retention.run(db))
+
+    assert deleted["market_history"] == 3
+    assert deleted["rollups_1m"] == 1
+    assert deleted["seen_alerts"] == 1
+    assert db.query(MarketHistory).count() == 1
+    assert db.query(MarketHistoryRollup).count() == 2
+    assert [a.seen for a in db.query(Alert).all()] == [False]
+    db.close()
+
+
+def test_history_from_before_rollups_is_backfilled_once_at_startup(pinned_market_ids):
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    db.add_all(
+        MarketHistory(
+            market_id="market-0", ts=now - timedelta(minutes=i),
+            implied_prob=50.0, price=0.5, volume=0,
+        )
+        for i in range(3)
+    )
+    db.commit()
+
+    worker = MarketPollingWorker()
+    first = asyncio.run(worker.backfill_rollups())
+    second = asyncio.run(worker.backfill_rollups())
+
+    assert first == 3
+    assert second == 0
+    assert db.query(MarketHistoryRollup).filter_by(resolution="1d").count() >= 1
+    db.close()
+
+
+def test_hot_window_ring_buffer_grows_and_evicts():
+    window = HotWindow(window_minutes=10, initial_capacity=2)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for minute in range(12):
+        window.append("m", start + timedelta(minutes=minute), 40.0 + minute, minute)
+
+    # Minute 11 is the newest point, so minutes 0 and 1 fell out of the window
+    baseline = window.baseline("m", now=start + timedelta(minutes=11))
+    assert (baseline.implied_prob, baseline.volume) == (41.0, 1)
+    assert window.stats() == {"markets": 1, "points": 11}
+
+    baseline = window.baseline("m", now=start + timedelta(minutes=15))
+    assert baseline.implied_prob == 45.0
+    assert window.baseline("m", now=start + timedelta(hours=1)) is None
+    assert window.baseline("unknown") is None
+
+
+def test_alert_evaluation_uses_hot_window_without_history_queries(pinned_market_ids):
+    worker = MarketPollingWorker(alert_threshold_pct=5.0, max_concurrency=5, cycle_deadline_sec=10)
+    worker.polymarket = FakePolymarketService(delay=0)
+    asyncio.run(worker.load_hot_window())
+    assert worker.hot_window.stats()["markets"] == len(pinned_market_ids)
+
+    asyncio.run(worker.poll_all_markets())
+    assert worker.hot_window.stats()["points"] == len(pinned_market_ids)
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    original = worker.polymarket.get_market_snapshot
+
+    async def moved_snapshot(market_id):
+        snapshot = await original(market_id)
+        if market_id == pinned_market_ids[0]:
+            snapshot["implied_prob"] = 60.0
+        return snapshot
+
+    worker.polymarket.get_market_snapshot = moved_snapshot
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        stats = asyncio.run(worker.poll_all_markets())
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert stats["alerts_triggered"] == 1
+    history_reads = [s for s in statements if s.lstrip().upper().startswith("SELECT") and "market_history" in s]
+    assert history_reads == []
+
+    db = SessionLocal()
+    assert [(a.market_id, a.change_pct) for a in db.query(Alert).all()] == [(pinned_market_ids[0], 10.0)]
+    db.close()
+
+
+class SlowInsightService:
+    """Returns a fixed insight after a simulated Claude delay, or once released."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.release: Optional[asyncio.Event] = None
+        self.calls = []
+
+    async def generate_insight_from_history_async(self, market_title, **kwargs):
+        self.calls.append((market_title, kwargs["user_name"]))
+        if self.release:
+            await self.release.wait()
+        await asyncio.sleep(self.delay)
+        return f"Insight for {market_title}"
+
+
+def test_alerts_share_one_insight_filled_in_after_persisting(pinned_market_ids):
+    db = SessionLocal()
+    db.add(MarketHistory(
+        market_id=pinned_market_ids[0],
+        ts=datetime.now(timezone.utc) - timedelta(minutes=10),
+        implied_prob=40.0,
+        price=0.4,
+        volume=900,
+    ))
+    for i in range(2):
+        user = User(email=f"subscriber{i}@example.com")
+        db.add(user)
+        db.flush()
+        db.add(PinnedMarket(user_id=user.id, market_id=pinned_market_ids[0]))
+    db.commit()
+    db.close()
+
+    worker = MarketPollingWorker(alert_threshold_pct=5.0, cycle_deadline_sec=10)
+    worker.polymarket = FakePolymarketService(delay=0)
+    worker.insight_service = SlowInsightService(delay=0)
+
+    async def run():
+        # Claude doesn't answer until the cycle has returned
+        worker.insight_service.release = asyncio.Event()
+        await worker.poll_all_markets()
+        db = SessionLocal()
+        before = [(a.insight_id is not None, a.insight.text) for a in db.query(Alert).all()]
+        db.close()
+        worker.insight_service.release.set()
+        pending = await worker.drain_insights(timeout=5)
+        return before, pending
+
+    before, pending = asyncio.run(run())
+
+    # The cycle doesn't wait for Claude; the alerts exist before the insight
+    assert before == [(True, None)] * 3
+    assert pending == 0
+
+    # Three subscribers, one user-agnostic Claude call
+    assert worker.insight_service.calls == [("Market market-0", None)]
+
+    db = SessionLocal()
+    alerts = db.query(Alert).all()
+    assert len(alerts) == 3
+    assert len({a.insight_id for a in alerts}) == 1
+    assert alerts[0].insight.text == "Insight for Market market-0"
+    db.close()
+
+
+def test_insight_cache_quantizes_moves_and_evicts(pinned_market_ids):
+    cache = InsightCache(ttl_sec=60, maxsize=2)
+    db = SessionLocal()
+
+    assert cache.key("m", 40.0, 51.0) == cache.key("m", 41.0, 52.5) == "m:up:5:10"
+    assert cache.key("m", 51.0, 40.0) == "m:down:5:8"
+
+    assert cache.get(db, "m:up:5:10") is None
+    cache.set(db, "m:up:5:10", "m", "first")
+    cache.set(db, "m:down:5:8", "m", "second")
+    assert cache.get(db, "m:up:5:10") == "first"
+
+    cache.set(db, "n:up:1:1", "n", "third")  # evicts the least recently used
+    assert cache.get(db, "m:up:5:10") == "first"
+    assert cache.get(db, "m:down:5:8") is None
+
+    stats = cache.stats(db, {"calls": 1, "insights": 2, "input_tokens": 2000, "output_tokens": 400})
+    assert (stats["size"], stats["hits"], stats["misses"], stats["evictions"]) == (2, 2, 2, 1)
+    assert stats["hit_rate"] == 0.5
+    assert stats["tokens_avoided"] == 2400
+    assert stats["cost_avoided_usd"] == round((2 * 1000 * 0.25 + 2 * 200 * 1.25) / 1_000_000, 4)
+
+    expired = InsightCache(ttl_sec=-1)
+    expired.set(db, "x:up:1:1", "x", "stale")
+    assert expired.get(db, "x:up:1:1") is None
+    db.close()
+
+
+def test_similar_moves_reuse_cached_insight(pinned_market_ids):
+    db = SessionLocal()
+    db.add(MarketHistory(
+        market_id=pinned_market_ids[0],
+        ts=datetime.now(timezone.utc) - timedelta(minutes=10),
+        implied_prob=40.0,
+        price=0.4,
+        volume=900,
+    ))
+    db.commit()
+    db.close()
+
+    worker = MarketPollingWorker(alert_threshold_pct=5.0, cycle_deadline_sec=10)
+    worker.polymarket = FakePolymarketService(delay=0)
+    worker.insight_service = SlowInsightService(delay=0)
+
+    async def run():
+        for _ in range(2):
+            await worker.poll_all_markets()
+            await worker.drain_insights(timeout=5)
+
+    asyncio.run(run())
+
+    # Two 40% -> 50% moves, one Claude call
+    db = SessionLocal()
+    assert [i.text for i in db.query(Insight).all()] == ["Insight for Market market-0"] * 2
+    db.close()
+    assert len(worker.insight_service.calls) == 1
+    assert (worker.insight_cache.hits, worker.insight_cache.misses) == (1, 1)
+
+
+def test_insight_cache_write_failure_keeps_texts(pinned_market_ids):
+    class FailingInsightCache(InsightCache):
+        def set_many(self, db, entries):
+            raise IntegrityError("INSERT INTO insight_cache", {}, Exception("UNIQUE constraint failed"))
+
+    worker = MarketPollingWorker(alert_threshold_pct=5.0)
+    worker.polymarket = FakePolymarketService(delay=0)
+    worker.insight_service = SlowInsightService(delay=0)
+    worker.insight_cache = FailingInsightCache()
+
+    db = SessionLocal()
+    db.add(MarketHistory(
+        market_id=pinned_market_ids[0],
+        ts=datetime.now(timezone.utc) - timedelta(minutes=10),
+        implied_prob=40.0,
+        price=0.4,
+        volume=900,
+    ))
+    db.commit()
+    db.close()
+
+    async def run():
+        await worker.poll_all_markets()
+        await worker.drain_insights(timeout=5)
+
+    asyncio.run(run())
+
+    db = SessionLocal()
+    assert [i.text for i in db.query(Insight).all()] == ["Insight for Market market-0"]
+    db.close()
+
+
+def test_insight_generation_holds_no_db_connection(pinned_market_ids):
+    class PoolCheckingInsightService(SlowInsightService):
+        def __init__(self):
+            super().__init__(delay=0)
+            self.checked_out = []
+
+        async def generate_insight_from_history_async(self, market_title, **kwargs):
+            self.checked_out.append(engine.pool.checkedout())
+            return await super().generate_insight_from_history_async(market_title, **kwargs)
+
+    worker = MarketPollingWorker(alert_threshold_pct=5.0)
+    worker.insight_service = PoolCheckingInsightService()
+
+    async def run():
+        db = SessionLocal()
+        await worker.create_alerts(
+            market_id=pinned_market_ids[0],
+            market_title="Market 0",
+            old_prob=40.0,
+            new_prob=50.0,
+            change_pct=10.0,
+            old_snapshot={"implied_prob": 40.0, "volume": 900},
+            new_snapshot={"implied_prob": 50.0, "volume": 1000},
+            db=db,
+        )
+        db.close()
+        await worker.drain_insights(timeout=5)
+
+    asyncio.run(run())
+
+    # The cache lookup's connection is back in the pool before Claude is awaited
+    assert worker.insight_service.checked_out == [0]
+    db = SessionLocal()
+    assert [i.text for i in db.query(Insight).all()] == ["Insight for Market 0"]
+    db.close()
+
+
+class BatchingInsightService(SlowInsightService):
+    """Records how triggered moves are grouped into Claude requests."""
+
+    def __init__(self):
+        super().__init__(delay=0)
+        self.batches = []
+
+    def history_args(self, market_title, old_snapshot, new_snapshot, window_minutes, **kwargs):
+        return {"market_title": market_title}
+
+    async def generate_insights_batch_async(self, moves, batch_size=8):
+        self.batches.extend(
+            [m["market_title"] for m in moves[i:i + batch_size]] for i in range(0, len(moves), batch_size)
+        )
+        return [f"Insight for {m['market_title']}" for m in moves]
+
+
+def test_cycle_insights_are_batched(pinned_market_ids):
+    db = SessionLocal()
+    db.add_all(
+        MarketHistory(
+            market_id=market_id,
+            ts=datetime.now(timezone.utc) - timedelta(minutes=10),
+            implied_prob=40.0,
+            price=0.4,
+            volume=900,
+        )
+        for market_id in pinned_market_ids
+    )
+    db.commit()
+    db.close()
+
+    worker = MarketPollingWorker(alert_threshold_pct=5.0, cycle_deadline_sec=10, insight_batch_size=8)
+    worker.polymarket = FakePolymarketService(delay=0)
+    worker.insight_service = BatchingInsightService()
+
+    async def run():
+        stats = await worker.poll_all_markets()
+        await worker.drain_insights(timeout=5)
+        return stats
+
+    stats = asyncio.run(run())
+
+    # 20 triggered markets in requests of 8, 8 and 4; no single-move requests
+    assert stats["alerts_triggered"] == 20
+    assert [len(batch) for batch in worker.insight_service.batches] == [8, 8, 4]
+    assert worker.insight_service.calls == []
+
+    db = SessionLocal()
+    assert all(i.text == f"Insight for {i.market_title}" for i in db.query(Insight).all())
+    assert db.query(Insight).count() == 20
+    db.close()
+
+
+def test_alert_fan_out_is_set_based(pinned_market_ids):
+    db = SessionLocal()
+    users = [User(email=f"fan{i}@example.com") for i in range(2000)]
+    db.add_all(users)
+    db.flush()
+    db.add_all(PinnedMarket(user_id=u.id, market_id=pinned_market_ids[0]) for u in users)
+    db.commit()
+    user_ids = [u.id for u in users]
+    assert set(unread.get_unread_counts(db, user_ids).values()) == {0}
+
+    # The fixture user has an earlier unread alert and no counter row yet
+    fixture_user_id = db.query(User.id).filter(User.email == "worker@example.com").scalar()
+    db.add(Alert(user_id=fixture_user_id, market_id=pinned_market_ids[1], change_pct=6.0, threshold=5.0))
+    db.commit()
+
+    worker = MarketPollingWorker(alert_threshold_pct=5.0)
+    worker.insight_service = SlowInsightService(delay=0)
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        # (verb, first table) of each statement
+        statements.append((statement.split()[0], re.search(r"(?:FROM|INTO|UPDATE) (\w+)", statement).group(1)))
+
+    async def run():
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            created = await worker.create_alerts(
+                market_id=pinned_market_ids[0],
+                market_title="Market 0",
+                old_prob=40.0,
+                new_prob=50.0,
+                change_pct=10.0,
+                old_snapshot={"implied_prob": 40.0, "volume": 900},
+                new_snapshot={"implied_prob": 50.0, "volume": 1000},
+                db=db,
+            )
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        await worker.drain_insights(timeout=5)
+        return created
+
+    created = asyncio.run(run())
+
+    # 2001 subscribers (fixture user included), a handful of statements
+    assert created == 2001
+    assert db.query(Alert).filter(Alert.market_id == pinned_market_ids[0]).count() == 2001
+    assert statements == [
+        # Trend: read for the insight prompt, then looked up to record the move
+        # (new, so seeded from past alerts)
+        ("SELECT", "market_trends"),
+        ("SELECT", "market_trends"),
+        ("SELECT", "alerts"),
+        ("INSERT", "market_trends"),
+        ("INSERT", "insights"),
+        # One statement for the alerts, two for the unread counters of all
+        # subscribers: increment existing ones, create missing ones
+        ("INSERT", "alerts"),
+        ("UPDATE", "alert_counters"),
+        ("INSERT", "alert_counters"),
+        # Insight ID reloaded after the commit, to publish and schedule it
+        ("SELECT", "insights"),
+    ]
+    db.expire_all()
+    assert set(unread.get_unread_counts(db, user_ids).values()) == {1}
+    assert db.get(AlertCounter, fixture_user_id).unread_count == 2
+    db.close()
+
+
+def test_market_trend_is_updated_once_per_move(pinned_market_ids):
+    db = SessionLocal()
+    assert describe_trend(db.get(MarketTrend, "m")) == "Insufficient history (< 3 moves)"
+
+    for change in [5.0, 6.0, -2.0] + [4.0] * TREND_WINDOW:
+        record_move(db, "m", change)
+    db.commit()
+
+    trend = db.get(MarketTrend, "m")
+    assert trend.moves == TREND_WINDOW + 3
+    assert (trend.up_count, trend.down_count) == (TREND_WINDOW, 0)
+    assert (trend.min_change, trend.max_change) == (4.0, 4.0)
+    assert describe_trend(trend) == f"Consistently rising trend ({TREND_WINDOW}/{TREND_WINDOW} bullish moves)"
+
+    record_move(db, "m", -40.0)
+    db.commit()
+    trend = db.get(MarketTrend, "m")
+    assert (trend.up_count, trend.down_count) == (TREND_WINDOW - 1, 1)
+    assert (trend.min_change, trend.max_change) == (-40.0, 4.0)
+    assert describe_trend(trend) == f"Consistently rising trend ({TREND_WINDOW - 1}/{TREND_WINDOW} bullish moves)"
+    db.close()
+
+
+def test_trend_counts_moves_not_subscribers(pinned_market_ids):
+    db = SessionLocal()
+    for i in range(3):
+        user = User(email=f"trend{i}@example.com")
+        db.add(user)
+        db.flush()
+        db.add(PinnedMarket(user_id=user.id, market_id=pinned_market_ids[0]))
+    db.commit()
+
+    worker = MarketPollingWorker(alert_threshold_pct=5.0)
+    worker.insight_service = SlowInsightService(delay=0)
+
+    async def run():
+        for change in (10.0, 8.0, 7.0):
+            await worker.create_alerts(
+                market_id=pinned_market_ids[0],
+                market_title="Market 0",
+                old_prob=40.0,
+                new_prob=40.0 + change,
+                change_pct=change,
+                old_snapshot={"implied_prob": 40.0},
+                new_snapshot={"implied_prob": 40.0 + change},
+                db=db,
+            )
+        await worker.drain_insights(timeout=5)
+
+    asyncio.run(run())
+
+    # Four subscribers, three moves
+    trend = db.get(MarketTrend, pinned_market_ids[0])
+    assert (trend.moves, trend.up_count) == (3, 3)
+    assert worker.calculate_long_term_trend(pinned_market_ids[0], db) == "Consistently rising trend (3/3 bullish moves)"
+    db.close()